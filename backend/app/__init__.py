@@ -7,22 +7,13 @@ from flask import Flask, jsonify
 from marshmallow import ValidationError
 from app.extensions import init_extensions
 from app.schemas.base import ErrorSchema
+from app.utils.log import configure_logging, init_request_id
+from app.utils.metrics import init_metrics
+from app.utils.profiler import init_profiler
+from app.utils.query_counter import init_query_counter
 from config import config
 from app.commands import register_commands
 
-# Создаем директорию для логов, если она не существует
-os.makedirs('logs', exist_ok=True)
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/app.log'),
-        logging.StreamHandler()
-    ]
-)
-
 logger = logging.getLogger('app')
 
 # Глобальный экземпляр приложения
@@ -52,7 +43,18 @@ class YourApp:
             return
         
         self.app = Flask(__name__)
-        self.app.config.from_object(config[config_name])
+        self.app.config.from_object(config[config_name or os.environ.get('FLASK_CONFIG', 'default')])
+        
+        # Логирование через очередь: запись в файл и stderr выполняет отдельный поток
+        configure_logging(self.app.config)
+        init_request_id(self.app)
+        
+        # Метрики Prometheus: время и коды ответов, SQL-запросы за запрос, /metrics
+        init_metrics(self.app)
+        # Профилирование выбранных запросов (PROFILER_SAMPLE_RATE, X-Profile-Token)
+        init_profiler(self.app)
+        # Количество SQL-запросов за запрос и поиск N+1 (заголовки в development, лог в production)
+        init_query_counter(self.app)
         
         # Устанавливаем глобальный экземпляр приложения
         global app
@@ -76,15 +78,18 @@ class YourApp:
         # Регистрация команд Flask CLI
         register_commands(self.app)
         
-        # Создание всех таблиц после инициализации всех компонентов и импорта моделей
-        with self.app.app_context():
-            from app.extensions import db
-            # from app.helpers.create_default_roles import create_default_roles
-            
-            db.create_all()
-            # Автоматически создаем роли (отключите, если не нужно)
-            # create_default_roles()
-            logger.info("База данных успешно инициализирована")
+        # Схема БД управляется миграциями (flask db upgrade); create_all оставлен как опция для разработки
+        if self.app.config.get('DB_CREATE_ALL'):
+            with self.app.app_context():
+                from app.extensions import db
+                
+                db.create_all()
+                logger.info("База данных успешно инициализирована (create_all)")
+        
+        # Необязательная проверка, что схема БД соответствует последней миграции
+        if self.app.config.get('DB_SCHEMA_CHECK', 'off') != 'off':
+            from app.utils.schema import check_schema_revision
+            check_schema_revision(self.app)
         
         # Устанавливаем флаг инициализации
         self._initialized = True
@@ -158,9 +163,13 @@ class YourApp:
         
         # Импорт API namespaces после инициализации api
         from app.api.auth import api as auth_api
+        from app.api.metrics import api as metrics_api
+        from app.api.audit import api as audit_api
 
         # Регистрация namespaces без префикса /api, так как он уже добавлен в Api
         api.add_namespace(auth_api, path='/auth')
+        api.add_namespace(metrics_api, path='/metrics')
+        api.add_namespace(audit_api, path='/audit')
 
     
     def get_app(self):
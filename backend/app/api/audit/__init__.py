@@ -0,0 +1,9 @@
+"""
+Пакет API для просмотра истории изменений
+"""
+from flask_restx import Namespace
+
+api = Namespace('audit', description='История изменений пользователей и ролей (только для администраторов)', security='jwt')
+
+# Импортируем все ресурсы
+from app.api.audit.history import *
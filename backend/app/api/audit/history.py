@@ -0,0 +1,104 @@
+"""
+API для просмотра и выгрузки истории изменений
+"""
+from flask import request, Response, stream_with_context
+from flask_restx import Resource
+from marshmallow import ValidationError
+from app.models.auth import UserHistory, RoleHistory
+from app.schemas.audit import UserAuditQuerySchema, RoleAuditQuerySchema
+from app.utils.audit import paginate_history, iter_history, iter_jsonl
+from app.utils.pagination import InvalidCursor
+from app.utils.auth import role_required
+from app.api.audit import api
+
+# Параметры фильтрации для Swagger документации
+filter_params = {
+    'changed_by_id': 'ID пользователя, внесшего изменение',
+    'action': 'Тип действия (create/update/delete)',
+    'since': 'Начало периода (ISO 8601, включительно)',
+    'until': 'Конец периода (ISO 8601, не включительно)',
+}
+page_params = {
+    'limit': 'Размер страницы (1-1000, по умолчанию 100)',
+    'cursor': 'Курсор следующей страницы из next_cursor',
+}
+
+def _history_page(model, query_schema):
+    """Страница истории от новых изменений к старым"""
+    try:
+        filters = query_schema.load(request.args)
+        rows, next_cursor = paginate_history(model, filters)
+    except ValidationError as e:
+        return {'message': 'Ошибка валидации', 'errors': e.messages}, 400
+    except InvalidCursor:
+        return {'message': 'Недействительный курсор'}, 400
+    return {
+        'items': model.to_dicts(rows),
+        'next_cursor': next_cursor
+    }
+
+def _history_export(model, query_schema, filename):
+    """Выгрузка истории в формате JSON Lines"""
+    try:
+        filters = query_schema.load(request.args)
+    except ValidationError as e:
+        return {'message': 'Ошибка валидации', 'errors': e.messages}, 400
+    return Response(
+        stream_with_context(iter_jsonl(model, iter_history(model, filters))),
+        mimetype='application/x-ndjson',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@api.route('/users')
+class UserHistoryList(Resource):
+    """История изменений пользователей"""
+    
+    @role_required('admin')
+    @api.doc(security='jwt', params={'user_id': 'ID пользователя', **filter_params, **page_params})
+    @api.response(200, 'Страница истории и курсор следующей страницы')
+    @api.response(400, 'Ошибка валидации параметров')
+    @api.response(403, 'Недостаточно прав для выполнения операции')
+    def get(self):
+        """Поиск по истории изменений пользователей (keyset-пагинация)"""
+        return _history_page(UserHistory, UserAuditQuerySchema())
+
+@api.route('/users/export')
+class UserHistoryExport(Resource):
+    """Выгрузка истории изменений пользователей"""
+    
+    @role_required('admin')
+    @api.doc(security='jwt', params={'user_id': 'ID пользователя', **filter_params})
+    @api.produces(['application/x-ndjson'])
+    @api.response(200, 'История в формате JSON Lines в хронологическом порядке')
+    @api.response(403, 'Недостаточно прав для выполнения операции')
+    def get(self):
+        """Потоковая выгрузка истории изменений пользователей (JSON Lines)"""
+        return _history_export(UserHistory, UserAuditQuerySchema(exclude=['limit', 'cursor']),
+                               'user_history.jsonl')
+
+@api.route('/roles')
+class RoleHistoryList(Resource):
+    """История изменений ролей"""
+    
+    @role_required('admin')
+    @api.doc(security='jwt', params={'role_id': 'ID роли', **filter_params, **page_params})
+    @api.response(200, 'Страница истории и курсор следующей страницы')
+    @api.response(400, 'Ошибка валидации параметров')
+    @api.response(403, 'Недостаточно прав для выполнения операции')
+    def get(self):
+        """Поиск по истории изменений ролей (keyset-пагинация)"""
+        return _history_page(RoleHistory, RoleAuditQuerySchema())
+
+@api.route('/roles/export')
+class RoleHistoryExport(Resource):
+    """Выгрузка истории изменений ролей"""
+    
+    @role_required('admin')
+    @api.doc(security='jwt', params={'role_id': 'ID роли', **filter_params})
+    @api.produces(['application/x-ndjson'])
+    @api.response(200, 'История в формате JSON Lines в хронологическом порядке')
+    @api.response(403, 'Недостаточно прав для выполнения операции')
+    def get(self):
+        """Потоковая выгрузка истории изменений ролей (JSON Lines)"""
+        return _history_export(RoleHistory, RoleAuditQuerySchema(exclude=['limit', 'cursor']),
+                               'role_history.jsonl')
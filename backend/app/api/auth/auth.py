@@ -1,8 +1,7 @@
 """
 API для аутентификации пользователей (вход, выход, обновление токенов)
 """
-from datetime import datetime, timedelta
-import flask
+from datetime import datetime
 from flask import request, jsonify
 from flask_restx import Resource, fields
 from flask_jwt_extended import (
@@ -10,16 +9,18 @@ from flask_jwt_extended import (
     create_access_token, create_refresh_token
 )
 from marshmallow import ValidationError
-from app.models.auth import User, UserSession, Role  # Добавляем импорт Role
+from app.models.auth import User, Role  # Добавляем импорт Role
 from app.schemas.auth import (
     LoginSchema, UserCreateSchema
 )
 from app.utils.auth import (
-    clear_auth_cookies
+    clear_auth_cookies, get_user_by_identity
 )
+from app.utils.sqlite import begin_write
+from app.repositories.auth import get_user_by_email
+from app.services.sessions import new_user_session, revoke_user_sessions, revoke_session_by_refresh_token
 from app.extensions import db
 from app.api.auth import api
-import user_agents
 
 # Модели для Swagger документации
 login_model = api.model('Login', {
@@ -57,7 +58,7 @@ class Register(Resource):
                 return {'message': 'Ошибка валидации', 'errors': ve.messages}, 400
             
             # Проверяем, существует ли пользователь с таким email
-            existing_email = User.query.filter_by(email=register_data['email']).first()
+            existing_email = get_user_by_email(register_data['email'])
             if existing_email:
                 return {'message': 'Пользователь с таким email уже существует'}, 409
                 
@@ -75,7 +76,8 @@ class Register(Resource):
             )
             
             user.set_password(register_data['password'])
-            print(f"Registering user: {register_data}, with username: {user.username}")
+            # Хеш пароля уже вычислен - дальше запись пользователя и сессии одной транзакцией
+            begin_write(db.session)
             db.session.add(user)
 
             # Создание роли user по умолчанию (если нужно)
@@ -86,40 +88,15 @@ class Register(Resource):
             
             # user.roles.append(user_role)            
 
-            db.session.commit()
+            # ID пользователя нужен для токенов; commit - вместе с сессией
+            db.session.flush()
             
             # Создание токенов
             access_token = create_access_token(identity=str(user.id))
             refresh_token = create_refresh_token(identity=str(user.id))
             
-            # Получение информации о браузере и устройстве
-            user_agent_string = request.user_agent.string
-            user_agent = user_agents.parse(user_agent_string)
-            
             # Создание записи о сессии
-            session = UserSession(
-                user_id=user.id,
-                refresh_token=refresh_token,
-                user_agent=user_agent_string,
-                ip_address=request.remote_addr,
-                browser_family=user_agent.browser.family,
-                browser_version=user_agent.browser.version_string,
-                os_family=user_agent.os.family,
-                os_version=user_agent.os.version_string,
-                device_family=user_agent.device.family,
-                device_brand=getattr(user_agent.device, 'brand', None),
-                device_model=getattr(user_agent.device, 'model', None),
-                is_mobile=user_agent.is_mobile,
-                is_tablet=user_agent.is_tablet,
-                is_pc=user_agent.is_pc,
-                is_bot=user_agent.is_bot,
-                expires_at=datetime.utcnow() + (
-                    flask.current_app.config['JWT_REFRESH_TOKEN_EXPIRES'] 
-                    if isinstance(flask.current_app.config['JWT_REFRESH_TOKEN_EXPIRES'], timedelta)
-                    else timedelta(seconds=flask.current_app.config['JWT_REFRESH_TOKEN_EXPIRES'])
-                ),
-                is_active=True
-            )
+            session = new_user_session(user.id, refresh_token)
             
             db.session.add(session)
             db.session.commit()
@@ -151,52 +128,27 @@ class Login(Resource):
         try:
             login_data = LoginSchema().load(request.json)
             
-            user = User.query.filter_by(email=login_data['email']).first()
+            # Удаленные учетные записи не находятся запросом, поэтому хеш пароля для них не вычисляется
+            user = get_user_by_email(login_data['email'])
             
             if not user or not user.check_password(login_data['password']):
                 return {'message': 'Неверный email или пароль'}, 401
             
             if not user.is_active:
                 return {'message': 'Пользователь деактивирован'}, 401
-                
-            if user.deleted:
-                return {'message': 'Учетная запись удалена'}, 401
+            
+            # Пароль проверен - дальше только запись
+            begin_write(db.session)
             
             # Обновление времени последнего входа
             user.last_login = datetime.utcnow()
             
-            # Получение информации о браузере и устройстве
-            user_agent_string = request.user_agent.string
-            user_agent = user_agents.parse(user_agent_string)
-            
             # Создание токенов
             access_token = create_access_token(identity=str(user.id))
             refresh_token = create_refresh_token(identity=str(user.id))
             
             # Создание записи о сессии с расширенной информацией
-            session = UserSession(
-                user_id=user.id,
-                refresh_token=refresh_token,
-                user_agent=user_agent_string,
-                ip_address=request.remote_addr,
-                browser_family=user_agent.browser.family,
-                browser_version=user_agent.browser.version_string,
-                os_family=user_agent.os.family,
-                os_version=user_agent.os.version_string,
-                device_family=user_agent.device.family,
-                device_brand=getattr(user_agent.device, 'brand', None),
-                device_model=getattr(user_agent.device, 'model', None),
-                is_mobile=user_agent.is_mobile,
-                is_tablet=user_agent.is_tablet,
-                is_pc=user_agent.is_pc,
-                is_bot=user_agent.is_bot,
-                expires_at=datetime.utcnow() + (
-                    flask.current_app.config['JWT_REFRESH_TOKEN_EXPIRES'] 
-                    if isinstance(flask.current_app.config['JWT_REFRESH_TOKEN_EXPIRES'], timedelta)
-                    else timedelta(seconds=flask.current_app.config['JWT_REFRESH_TOKEN_EXPIRES'])
-                ),
-                is_active=True
-            )
+            session = new_user_session(user.id, refresh_token)
             
             db.session.add(session)
             db.session.commit()
@@ -226,30 +178,14 @@ class Logout(Resource):
             # Получаем ID пользователя из JWT токена
             user_id = get_jwt_identity()
             
-            # Находим активную сессию пользователя
-            # Если есть refresh_token в запросе, используем его для поиска конкретной сессии
+            # Если есть refresh_token в запросе, завершаем только эту сессию
             if request.is_json and request.json and 'refresh_token' in request.json:
                 refresh_token = request.json.get('refresh_token')
-                session = UserSession.query.filter_by(
-                    user_id=user_id,
-                    refresh_token=refresh_token,
-                    is_active=True
-                ).first()
-                
-                if session:
-                    session.is_active = False
-                    db.session.commit()
+                revoke_session_by_refresh_token(user_id, refresh_token)
             else:
-                # Если refresh_token не предоставлен, деактивируем все сессии пользователя
-                sessions = UserSession.query.filter_by(
-                    user_id=user_id,
-                    is_active=True
-                ).all()
-                
-                for session in sessions:
-                    session.is_active = False
-                
-                db.session.commit()
+                # Если refresh_token не предоставлен, деактивируем все сессии пользователя одним UPDATE
+                revoke_user_sessions(user_id)
+            db.session.commit()
             
             # Создаем ответ
             response = jsonify({'message': 'Успешный выход из системы'})
@@ -269,11 +205,12 @@ class RefreshToken(Resource):
     def post(self):
         """Обновление access токена"""
         user_id = get_jwt_identity()
-        user = User.query.get_or_404(user_id)
-        
-        # Проверяем, не удалена ли учетная запись
-        if user.deleted:
+        # Удаленные учетные записи отсекаются фильтром мягкого удаления
+        user = get_user_by_identity(user_id)
+        if not user:
             return {'message': 'Учетная запись удалена'}, 401
+        
+        begin_write(db.session)
             
         access_token = create_access_token(identity=str(user_id))
         refresh_token = create_refresh_token(identity=str(user_id))
@@ -281,38 +218,11 @@ class RefreshToken(Resource):
         # Обновляем информацию о сессии
         old_refresh_token = request.json.get('refresh_token')
         if old_refresh_token:
-            old_session = UserSession.query.filter_by(refresh_token=old_refresh_token).first()
-            if old_session:
-                old_session.is_active = False
-                db.session.commit()
+            # Сохраняется одним коммитом вместе с новой сессией
+            revoke_session_by_refresh_token(user.id, old_refresh_token)
         
         # Создаем новую сессию
-        user_agent_string = request.user_agent.string
-        user_agent = user_agents.parse(user_agent_string)
-        
-        session = UserSession(
-            user_id=user.id,
-            refresh_token=refresh_token,
-            user_agent=user_agent_string,
-            ip_address=request.remote_addr,
-            browser_family=user_agent.browser.family,
-            browser_version=user_agent.browser.version_string,
-            os_family=user_agent.os.family,
-            os_version=user_agent.os.version_string,
-            device_family=user_agent.device.family,
-            device_brand=getattr(user_agent.device, 'brand', None),
-            device_model=getattr(user_agent.device, 'model', None),
-            is_mobile=user_agent.is_mobile,
-            is_tablet=user_agent.is_tablet,
-            is_pc=user_agent.is_pc,
-            is_bot=user_agent.is_bot,
-            expires_at=datetime.utcnow() + (
-                flask.current_app.config['JWT_REFRESH_TOKEN_EXPIRES'] 
-                if isinstance(flask.current_app.config['JWT_REFRESH_TOKEN_EXPIRES'], timedelta)
-                else timedelta(seconds=flask.current_app.config['JWT_REFRESH_TOKEN_EXPIRES'])
-            ),
-            is_active=True
-        )
+        session = new_user_session(user.id, refresh_token)
         
         db.session.add(session)
         db.session.commit()
@@ -5,9 +5,10 @@ import logging
 from flask import request, current_app
 from flask_restx import Resource, fields
 from marshmallow import ValidationError, Schema, fields as ma_fields
-from app.models.auth import User
+from app.repositories.auth import get_user_by_email, get_user_by_id
 from app.utils.email import decode_token, send_password_set_email
-from app.extensions import db
+from app.utils.password_tokens import is_token_used, consume_token
+from app.utils.coalesce import acquire_reset_window, release_reset_window
 from app.api.auth import api
 
 logger = logging.getLogger(__name__)
@@ -45,6 +46,26 @@ class SendEmailSchema(Schema):
     email = ma_fields.Email(required=True)
     email_type = ma_fields.String(required=True)
 
+def _decode_password_token(token, action):
+    """
+    Декодирование токена установки/сброса пароля с проверкой действия и того, что он не был использован
+    :param token: токен из ссылки
+    :param action: действие эндпоинта (set_password/reset_password)
+    :return: кортеж (данные токена, None) или (None, ответ с ошибкой)
+    """
+    token_data = decode_token(token)
+    if not token_data:
+        return None, ({'message': 'Недействительный токен'}, 400)
+    
+    # Токен установки пароля не принимается при сбросе и наоборот
+    if token_data['action'] != action:
+        return None, ({'message': 'Токен не предназначен для этого действия'}, 400)
+    
+    if is_token_used(token_data):
+        return None, ({'message': 'Токен уже использован'}, 400)
+    
+    return token_data, None
+
 @api.route('/set-password')
 class SetPassword(Resource):
     """Установка пароля пользователя по токену"""
@@ -57,12 +78,12 @@ class SetPassword(Resource):
             return {'message': 'Токен не предоставлен'}, 400
         
         # Декодируем токен
-        token_data = decode_token(token)
-        if not token_data or 'id' not in token_data or 'key' not in token_data:
-            return {'message': 'Недействительный токен'}, 400
+        token_data, error = _decode_password_token(token, 'set_password')
+        if error:
+            return error
         
         # Проверяем существование пользователя
-        user = User.query.get(token_data['id'])
+        user = get_user_by_id(token_data['id'])
         if not user:
             return {'message': 'Пользователь не найден'}, 404
         
@@ -86,18 +107,19 @@ class SetPassword(Resource):
                 return {'message': 'Пароли не совпадают'}, 400
             
             # Декодируем токен
-            token_data = decode_token(data['token'])
-            if not token_data or 'id' not in token_data or 'key' not in token_data:
-                return {'message': 'Недействительный токен'}, 400
+            token_data, error = _decode_password_token(data['token'], 'set_password')
+            if error:
+                return error
             
             # Находим пользователя
-            user = User.query.get(token_data['id'])
+            user = get_user_by_id(token_data['id'])
             if not user:
                 return {'message': 'Пользователь не найден'}, 404
             
-            # Устанавливаем новый пароль
+            # Устанавливаем новый пароль и погашаем токен в одной транзакции
             user.set_password(data['password'])
-            db.session.commit()
+            if not consume_token(token_data):
+                return {'message': 'Токен уже использован'}, 400
             
             return {'message': 'Пароль успешно установлен'}
             
@@ -119,8 +141,12 @@ class SendPasswordEmail(Resource):
             if email_type != 'reset_password':
                 return {'message': 'Неподдерживаемый тип письма. Поддерживается только reset_password'}, 400
             
+            # Повторный запрос в пределах окна получает тот же ответ без поиска пользователя и отправки письма
+            if not acquire_reset_window(data['email']):
+                return {'message': 'Если указанный email зарегистрирован в системе, на него будет отправлена инструкция по сбросу пароля'}, 200
+            
             # Находим пользователя по email
-            user = User.query.filter_by(email=data['email']).first()
+            user = get_user_by_email(data['email'])
             if not user:
                 # Для безопасности не сообщаем, что пользователь не найден
                 return {'message': 'Если указанный email зарегистрирован в системе, на него будет отправлена инструкция по сбросу пароля'}, 200
@@ -141,6 +167,7 @@ class SendPasswordEmail(Resource):
             if success:
                 return {'message': 'Если указанный email зарегистрирован в системе, на него будет отправлена инструкция по сбросу пароля'}, 200
             else:
+                release_reset_window(data['email'])
                 return {
                     'message': 'Ошибка отправки письма. Проверьте настройки SMTP сервера.',
                     'success': False
@@ -161,12 +188,12 @@ class ResetPassword(Resource):
             return {'message': 'Токен не предоставлен'}, 400
         
         # Декодируем токен
-        token_data = decode_token(token)
-        if not token_data or 'id' not in token_data or 'key' not in token_data:
-            return {'message': 'Недействительный токен'}, 400
+        token_data, error = _decode_password_token(token, 'reset_password')
+        if error:
+            return error
         
         # Проверяем существование пользователя
-        user = User.query.get(token_data['id'])
+        user = get_user_by_id(token_data['id'])
         if not user:
             return {'message': 'Пользователь не найден'}, 404
         
@@ -185,8 +212,12 @@ class ResetPassword(Resource):
         try:
             data = PasswordResetRequestSchema().load(request.json)
             
+            # Повторный запрос в пределах окна получает тот же ответ без поиска пользователя и отправки письма
+            if not acquire_reset_window(data['email']):
+                return {'message': 'Если указанный email зарегистрирован в системе, на него будет отправлена инструкция по сбросу пароля'}, 200
+            
             # Находим пользователя по email
-            user = User.query.filter_by(email=data['email']).first()
+            user = get_user_by_email(data['email'])
             if not user:
                 # Для безопасности не сообщаем, что пользователь не найден
                 return {'message': 'Если указанный email зарегистрирован в системе, на него будет отправлена инструкция по сбросу пароля'}, 200
@@ -207,6 +238,7 @@ class ResetPassword(Resource):
             
             if not email_sent:
                 logger.warning(f"Не удалось отправить письмо для сброса пароля пользователю {user.id} ({user.email})")
+                release_reset_window(data['email'])
             
             return {'message': 'Если указанный email зарегистрирован в системе, на него будет отправлена инструкция по сбросу пароля'}, 200
             
@@ -224,18 +256,19 @@ class ResetPassword(Resource):
                 return {'message': 'Пароли не совпадают'}, 400
             
             # Декодируем токен
-            token_data = decode_token(data['token'])
-            if not token_data or 'id' not in token_data or 'key' not in token_data:
-                return {'message': 'Недействительный токен'}, 400
+            token_data, error = _decode_password_token(data['token'], 'reset_password')
+            if error:
+                return error
             
             # Находим пользователя
-            user = User.query.get(token_data['id'])
+            user = get_user_by_id(token_data['id'])
             if not user:
                 return {'message': 'Пользователь не найден'}, 404
             
-            # Устанавливаем новый пароль
+            # Устанавливаем новый пароль и погашаем токен в одной транзакции
             user.set_password(data['password'])
-            db.session.commit()
+            if not consume_token(token_data):
+                return {'message': 'Токен уже использован'}, 400
             
             return {'message': 'Пароль успешно изменен'}
             
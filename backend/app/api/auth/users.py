@@ -5,11 +5,18 @@ from flask import request
 from flask_restx import Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
-from app.models.auth import User
-from app.schemas.auth import UserUpdateSchema, UserCreateSchema
+from app.models.auth import UserSession
+from app.schemas.auth import UserUpdateSchema, UserCreateSchema, UserSessionSchema, SessionListQuerySchema
+from app.utils.auth import get_user_by_identity
+from app.utils.sqlite import begin_write
+from app.services.sessions import revoke_user_sessions, revoke_session, list_active_sessions
+from app.utils.pagination import InvalidCursor
 from app.extensions import db
 from app.api.auth import api
 
+# Поля сессии, отдаваемые клиенту
+SESSION_FIELDS = tuple(UserSessionSchema().fields)
+
 # Модели для Swagger документации
 user_model = api.model('User', {
     'username': fields.String(required=False, description='Имя пользователя (опционально)'),
@@ -41,10 +48,9 @@ class UserProfile(Resource):
     def get(self):
         """Получение данных текущего пользователя"""
         user_id = get_jwt_identity()
-        user = User.query.get_or_404(user_id)
-        
-        # Проверяем, не удалена ли учетная запись
-        if user.deleted:
+        # Удаленные учетные записи отсекаются фильтром мягкого удаления
+        user = get_user_by_identity(user_id)
+        if not user:
             return {'message': 'Учетная запись удалена'}, 401
         
         return UserCreateSchema(exclude=['password']).dump(user)
@@ -56,10 +62,9 @@ class UserProfile(Resource):
         """Обновление данных пользователя"""
         try:
             user_id = get_jwt_identity()
-            user = User.query.get_or_404(user_id)
-            
-            # Проверяем, не удалена ли учетная запись
-            if user.deleted:
+            # Удаленные учетные записи отсекаются фильтром мягкого удаления
+            user = get_user_by_identity(user_id)
+            if not user:
                 return {'message': 'Учетная запись удалена'}, 401
             
             user_data = UserUpdateSchema().load(request.json)
@@ -90,24 +95,35 @@ class UserSessions(Resource):
     """Управление сессиями пользователя"""
     
     @jwt_required()
-    @api.doc(security='jwt')
+    @api.doc(security='jwt', params={
+        'limit': 'Размер страницы (1-200, по умолчанию 50)',
+        'cursor': 'Курсор следующей страницы из next_cursor',
+        'fields': 'Поля сессии через запятую (по умолчанию все)',
+    })
     def get(self):
-        """Получение списка активных сессий пользователя"""
+        """Получение списка активных сессий пользователя (keyset-пагинация)"""
         user_id = get_jwt_identity()
-        user = User.query.get_or_404(user_id)
-        
-        # Проверяем, не удалена ли учетная запись
-        if user.deleted:
+        # Удаленные учетные записи отсекаются фильтром мягкого удаления
+        user = get_user_by_identity(user_id)
+        if not user:
             return {'message': 'Учетная запись удалена'}, 401
         
-        # Получаем активные сессии пользователя
-        from app.schemas.auth import UserSessionSchema
-        sessions = user.sessions
-        active_sessions = [s for s in sessions if s.is_active]
+        try:
+            params = SessionListQuerySchema().load(request.args)
+            sessions, next_cursor = list_active_sessions(
+                user.id, params['limit'], cursor=params.get('cursor'), only=params.get('only')
+            )
+        except ValidationError as e:
+            return {'message': 'Ошибка валидации', 'errors': e.messages}, 400
+        except InvalidCursor:
+            return {'message': 'Недействительный курсор'}, 400
         
+        # Набор полей совпадает с UserSessionSchema (refresh_token не отдается)
+        columns = params.get('only') or SESSION_FIELDS
         return {
             'message': 'Список активных сессий',
-            'sessions': UserSessionSchema(many=True).dump(active_sessions)
+            'sessions': UserSession.to_dicts(sessions, include=columns),
+            'next_cursor': next_cursor
         }
     
     @jwt_required()
@@ -115,23 +131,20 @@ class UserSessions(Resource):
     def delete(self):
         """Завершение всех сессий пользователя, кроме текущей"""
         user_id = get_jwt_identity()
-        user = User.query.get_or_404(user_id)
-        
-        # Проверяем, не удалена ли учетная запись
-        if user.deleted:
+        # Удаленные учетные записи отсекаются фильтром мягкого удаления
+        user = get_user_by_identity(user_id)
+        if not user:
             return {'message': 'Учетная запись удалена'}, 401
         
         # Получаем текущий refresh_token
-        current_refresh_token = request.json.get('refresh_token')
-        
-        # Деактивируем все сессии, кроме текущей
-        for session in user.sessions:
-            if session.refresh_token != current_refresh_token:
-                session.is_active = False
+        current_refresh_token = (request.get_json(silent=True) or {}).get('refresh_token')
         
+        # Деактивируем все сессии, кроме текущей, одним UPDATE
+        begin_write(db.session)
+        revoked = revoke_user_sessions(user.id, except_refresh_token=current_refresh_token)
         db.session.commit()
         
-        return {'message': 'Все другие сессии успешно завершены'}
+        return {'message': 'Все другие сессии успешно завершены', 'revoked': revoked}
 
 @api.route('/sessions/<int:session_id>')
 class UserSessionDetail(Resource):
@@ -142,24 +155,22 @@ class UserSessionDetail(Resource):
     def delete(self, session_id):
         """Завершение конкретной сессии пользователя"""
         user_id = get_jwt_identity()
-        user = User.query.get_or_404(user_id)
-        
-        # Проверяем, не удалена ли учетная запись
-        if user.deleted:
+        # Удаленные учетные записи отсекаются фильтром мягкого удаления
+        user = get_user_by_identity(user_id)
+        if not user:
             return {'message': 'Учетная запись удалена'}, 401
         
-        # Находим сессию
-        from app.models.auth import UserSession
-        session = UserSession.query.get_or_404(session_id)
-        
-        # Проверяем, принадлежит ли сессия пользователю
-        if session.user_id != user.id:
-            return {'message': 'Доступ запрещен'}, 403
-        
-        # Деактивируем сессию
-        session.is_active = False
+        # Деактивируем сессию, если она активна и принадлежит пользователю
+        begin_write(db.session)
+        revoked = revoke_session(user.id, session_id)
         db.session.commit()
         
+        if not revoked:
+            # Сессия не найдена, чужая или уже завершена
+            session = UserSession.query.get_or_404(session_id)
+            if session.user_id != user.id:
+                return {'message': 'Доступ запрещен'}, 403
+        
         return {'message': 'Сессия успешно завершена'}
 
 
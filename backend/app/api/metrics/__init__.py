@@ -0,0 +1,9 @@
+"""
+Пакет API для служебных метрик сервиса
+"""
+from flask_restx import Namespace
+
+api = Namespace('metrics', description='Служебные метрики сервиса (только для администраторов)', security='jwt')
+
+# Импортируем все ресурсы
+from app.api.metrics.db_pool import *
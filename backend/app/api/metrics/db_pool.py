@@ -0,0 +1,19 @@
+"""
+API для просмотра состояния пула соединений с БД
+"""
+from flask_restx import Resource
+from app.utils.auth import role_required
+from app.utils.db_pool import get_pool_stats
+from app.api.metrics import api
+
+@api.route('/db-pool')
+class DatabasePoolStats(Resource):
+    """Состояние пула соединений с БД"""
+    
+    @role_required('admin')
+    @api.doc(security='jwt')
+    @api.response(200, 'Статистика пула соединений текущего воркера')
+    @api.response(403, 'Недостаточно прав для выполнения операции')
+    def get(self):
+        """Статистика пула соединений (checked out, overflow, время ожидания) текущего процесса"""
+        return get_pool_stats()
@@ -0,0 +1,118 @@
+"""
+ASGI-приложение: нативные асинхронные обработчики горячих маршрутов и Flask для остальных.
+
+Синхронные маршруты выполняются в пуле потоков (a2wsgi), поэтому медленный клиент
+занимает корутину, а не воркер. Нативные обработчики (см. app.asgi.auth) выполняются
+в контексте запроса Flask: хуки before/after_request, CORS, обработчики ошибок JWT
+и flask-restx работают так же, как для WSGI.
+"""
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from app import create_app
+
+logger = logging.getLogger(__name__)
+
+
+async def _read_body(receive):
+    """Тело HTTP-запроса целиком"""
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        more_body = message.get('more_body', False)
+    return b''.join(chunks)
+
+
+class AsgiApplication:
+    """ASGI-приложение поверх Flask приложения"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=flask_app.config.get('ASGI_WSGI_THREADS', 20))
+        self.routes = {}
+        self.engine = None
+        self.hash_executor = None
+        if flask_app.config.get('ASGI_NATIVE_ROUTES', True):
+            from app.asgi.auth import ROUTES
+            from app.asgi.db import create_async_db
+            self.engine, self.session_factory = create_async_db(flask_app)
+            self.hash_executor = ThreadPoolExecutor(
+                max_workers=flask_app.config.get('ASGI_HASH_WORKERS', 1), thread_name_prefix='password-hash'
+            )
+            self.routes = dict(ROUTES)
+            logger.info(f"ASGI: нативные маршруты {', '.join(path for _, path in self.routes)}")
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        handler = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if handler is None:
+            return await self.wsgi(scope, receive, send)
+
+        body = await _read_body(receive)
+        response = await self._dispatch(handler, build_environ(scope, io.BytesIO(body)))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in response.headers.items()],
+        })
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+
+    async def _dispatch(self, handler, environ):
+        """
+        Выполнение обработчика по схеме Flask.full_dispatch_request
+        :param handler: корутина-обработчик из app.asgi.auth.ROUTES
+        :param environ: WSGI environ запроса
+        :return: объект Response
+        """
+        from app.extensions import api
+
+        app = self.flask_app
+        ctx = app.request_context(environ)
+        error = None
+        ctx.push()
+        try:
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    async with self.session_factory() as session:
+                        data, code = await handler(session, self.hash_executor)
+                    # Сериализация ответа - как у ресурсов flask-restx
+                    rv = api.make_response(data, code)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            return app.finalize_request(rv)
+        except Exception as e:
+            error = e
+            return app.handle_exception(e)
+        finally:
+            ctx.pop(error)
+
+    async def _lifespan(self, receive, send):
+        """Запуск и остановка процесса: при остановке закрываются пул БД и пул хеширования"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.engine is not None:
+                    await self.engine.dispose()
+                if self.hash_executor is not None:
+                    self.hash_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_asgi_app(config_name=None):
+    """
+    Фабрика ASGI-приложения
+    :param config_name: имя конфигурации (development/production)
+    :return: экземпляр AsgiApplication
+    """
+    return AsgiApplication(create_app(config_name))
@@ -0,0 +1,105 @@
+"""
+Асинхронные версии горячих маршрутов авторизации.
+
+Ответы и коды совпадают с Login.post, RefreshToken.post и UserProfile.get: обработчики
+выполняются в контексте запроса Flask, используют те же схемы, создание токенов и записи
+сессии, но ждут БД через асинхронный драйвер, а хеш пароля считают в пуле потоков.
+"""
+import asyncio
+from datetime import datetime
+from flask import request
+from flask_jwt_extended import (
+    verify_jwt_in_request, get_jwt_identity,
+    create_access_token, create_refresh_token
+)
+from marshmallow import ValidationError
+from app.schemas.auth import LoginSchema, UserCreateSchema
+from app.repositories.auth import get_user_by_email_async, get_user_by_id_async
+from app.services.sessions import new_user_session, revoke_session_by_refresh_token_async
+from app.utils.sqlite import begin_write
+
+
+async def login(session, hash_executor):
+    """Аутентификация пользователя (POST /api/auth/login)"""
+    try:
+        login_data = LoginSchema().load(request.json)
+
+        # Удаленные учетные записи не находятся запросом, поэтому хеш пароля для них не вычисляется
+        user = await get_user_by_email_async(session, login_data['email'])
+
+        if not user or not await asyncio.get_running_loop().run_in_executor(
+            hash_executor, user.check_password, login_data['password']
+        ):
+            return {'message': 'Неверный email или пароль'}, 401
+
+        if not user.is_active:
+            return {'message': 'Пользователь деактивирован'}, 401
+
+        # Пароль проверен - дальше только запись
+        await session.run_sync(begin_write)
+
+        user.last_login = datetime.utcnow()
+
+        access_token = create_access_token(identity=str(user.id))
+        refresh_token = create_refresh_token(identity=str(user.id))
+
+        session.add(new_user_session(user.id, refresh_token))
+        await session.commit()
+
+        return {
+            'message': 'Успешный вход в систему',
+            'user': UserCreateSchema(exclude=['password']).dump(user),
+            'access_token': access_token,
+            'refresh_token': refresh_token
+        }, 200
+
+    except ValidationError as e:
+        return {'message': 'Ошибка валидации', 'errors': e.messages}, 400
+
+
+async def refresh(session, hash_executor):
+    """Обновление access токена (POST /api/auth/refresh)"""
+    verify_jwt_in_request(refresh=True)
+    user_id = get_jwt_identity()
+    # Удаленные учетные записи отсекаются фильтром мягкого удаления
+    user = await get_user_by_id_async(session, user_id)
+    if not user:
+        return {'message': 'Учетная запись удалена'}, 401
+
+    await session.run_sync(begin_write)
+
+    access_token = create_access_token(identity=str(user_id))
+    refresh_token = create_refresh_token(identity=str(user_id))
+
+    old_refresh_token = request.json.get('refresh_token')
+    if old_refresh_token:
+        # Сохраняется одним коммитом вместе с новой сессией
+        await revoke_session_by_refresh_token_async(session, user.id, old_refresh_token)
+
+    session.add(new_user_session(user.id, refresh_token))
+    await session.commit()
+
+    return {
+        'message': 'Токен успешно обновлен',
+        'user': UserCreateSchema(exclude=['password']).dump(user),
+        'access_token': access_token,
+        'refresh_token': refresh_token
+    }, 200
+
+
+async def me(session, hash_executor):
+    """Данные текущего пользователя (GET /api/auth/me)"""
+    verify_jwt_in_request()
+    user = await get_user_by_id_async(session, get_jwt_identity())
+    if not user:
+        return {'message': 'Учетная запись удалена'}, 401
+
+    return UserCreateSchema(exclude=['password']).dump(user), 200
+
+
+# Маршруты, обслуживаемые без WSGI: (метод, путь) -> обработчик
+ROUTES = {
+    ('POST', '/api/auth/login'): login,
+    ('POST', '/api/auth/refresh'): refresh,
+    ('GET', '/api/auth/me'): me,
+}
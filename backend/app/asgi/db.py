@@ -0,0 +1,52 @@
+"""
+Асинхронный engine SQLAlchemy для нативных ASGI-обработчиков
+"""
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.utils.db_pool import instrument_engine
+from app.utils.sqlite import configure_sqlite_engine
+
+# Асинхронный драйвер по диалекту основной БД
+ASYNC_DRIVERS = {
+    'sqlite': 'aiosqlite',
+    'postgresql': 'psycopg',
+    'mysql': 'aiomysql',
+}
+
+# Параметры SQLALCHEMY_ENGINE_OPTIONS, применимые к асинхронному engine
+# (poolclass не переносится: асинхронному драйверу нужен AsyncAdaptedQueuePool)
+ASYNC_ENGINE_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping', 'connect_args')
+
+
+def async_database_url(config):
+    """
+    URL асинхронного драйвера: ASYNC_DATABASE_URL или URL основной БД с заменой драйвера
+    :param config: конфигурация Flask приложения
+    :return: объект URL
+    """
+    if config.get('ASYNC_DATABASE_URL'):
+        return make_url(config['ASYNC_DATABASE_URL'])
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Нет асинхронного драйвера для {backend}, задайте ASYNC_DATABASE_URL")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def create_async_db(app):
+    """
+    Асинхронный engine и фабрика сессий с теми же параметрами пула и профилем SQLite,
+    что и у основного engine
+    :param app: экземпляр Flask приложения
+    :return: кортеж (AsyncEngine, async_sessionmaker)
+    """
+    options = {
+        name: value for name, value in (app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}).items()
+        if name in ASYNC_ENGINE_OPTIONS
+    }
+    engine = create_async_engine(async_database_url(app.config), **options)
+    # События пула и соединений подключаются к синхронному ядру асинхронного engine
+    instrument_engine(engine.sync_engine, 'async')
+    configure_sqlite_engine(engine.sync_engine, app.config)
+    # Объекты не истекают после commit: ленивая загрузка вне await невозможна
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
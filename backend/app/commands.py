@@ -24,7 +24,108 @@ def make_admin_command(email, username):
     _, message = make_user_admin(email, username)
     click.echo(message)
 
+
+@click.command('smtp-sink')
+@click.option('--host', default='127.0.0.1', show_default=True, help='Адрес для прослушивания')
+@click.option('--port', default=1025, show_default=True, help='Порт для прослушивания')
+@click.option('--latency', default=0.0, show_default=True, help='Задержка ответа на DATA, секунд')
+@click.option('--jitter', default=0.0, show_default=True, help='Случайная добавка к задержке, секунд')
+@click.option('--failure-rate', default=0.0, show_default=True, help='Доля писем, отклоняемых с кодом 451 (0..1)')
+def smtp_sink_command(host, port, latency, jitter, failure_rate):
+    """Запуск локального SMTP-приемника, сохраняющего письма в памяти."""
+    from app.utils.smtp_sink import SMTPSink
+
+    sink = SMTPSink(host=host, port=port, latency=latency, jitter=jitter,
+                    failure_rate=failure_rate, max_messages=1000)
+    sink.on_message = lambda received: click.echo(
+        f"[{sink.stats.accepted}] {received.mail_from} -> {', '.join(received.rcpt_tos)} "
+        f"({len(received.data)} байт)"
+    )
+    click.echo(f'SMTP-приемник слушает {host}:{port} (Ctrl+C для остановки). '
+               f'Для приложения: SMTP_SERVER={host} SMTP_PORT={port} SMTP_USE_TLS=False')
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    click.echo(f'Принято писем: {sink.stats.accepted}, отклонено: {sink.stats.rejected}')
+
+@click.command('sweep-tokens')
+@with_appcontext
+def sweep_tokens_command():
+    """Удаление истекших записей об использованных токенах и окнах сброса пароля."""
+    from app.utils.password_tokens import sweep_used_tokens
+    from app.utils.coalesce import sweep_reset_windows
+
+    deleted = sweep_used_tokens()
+    click.echo(f'Удалено записей об использованных токенах: {deleted}')
+    deleted = sweep_reset_windows()
+    click.echo(f'Удалено истекших окон сброса пароля: {deleted}')
+
+@click.command('export-swagger')
+@click.option('--output', '-o', default='swagger.json', show_default=True, help='Файл для сохранения (- для вывода в консоль)')
+@click.option('--indent', default=2, show_default=True, help='Отступ JSON (0 - компактно)')
+@with_appcontext
+def export_swagger_command(output, indent):
+    """Выгрузка спецификации OpenAPI в файл для статического хостинга документации."""
+    from flask import current_app
+    from app.extensions import api
+    from app.utils.swagger import get_spec_schema, render_spec
+
+    schema = get_spec_schema(current_app, api)
+    if 'error' in schema:
+        raise click.ClickException('Не удалось собрать спецификацию API (подробности в логе)')
+    body = render_spec(schema, indent=indent or None)
+    if output == '-':
+        click.echo(body.decode('utf-8'))
+        return
+    with open(output, 'wb') as f:
+        f.write(body)
+    click.echo(f'Спецификация сохранена в {output} ({len(body)} байт)')
+
+@click.command('profile-report')
+@click.option('--dir', 'directory', default=None, help='Каталог профилей (по умолчанию PROFILER_DIR)')
+@click.option('--route', default=None, help='Подстрока имени каталога маршрута, например POST_api_auth_refresh')
+@click.option('--since', default=None, type=float, help='Только профили за последние N часов')
+@click.option('--output', '-o', default='profile.collapsed', show_default=True,
+              help='Свернутые стеки для flamegraph.pl, inferno или speedscope')
+@click.option('--pstats-output', default=None, help='Объединенный pstats профилей cProfile')
+@click.option('--top', default=20, show_default=True, help='Сколько кадров с наибольшим собственным временем показать')
+@with_appcontext
+def profile_report_command(directory, route, since, output, pstats_output, top):
+    """Объединение профилей запросов в отчет для построения flamegraph."""
+    import time
+    from flask import current_app
+    from app.utils.profiler import collect_profiles, merge_profiles, self_time_by_frame
+
+    directory = directory or current_app.config['PROFILER_DIR']
+    profiles = collect_profiles(directory, route, time.time() - since * 3600 if since else None)
+    if not profiles:
+        raise click.ClickException(f'Профили не найдены в {directory}')
+    for route_name, paths in sorted(profiles.items()):
+        click.echo(f'{route_name}: {len(paths)}')
+
+    stacks, merged_stats = merge_profiles([path for paths in profiles.values() for path in paths])
+    with open(output, 'w', encoding='utf-8') as f:
+        for stack, value in sorted(stacks.items()):
+            f.write(f'{stack} {value}\n')
+    click.echo(f'Свернутые стеки сохранены в {output} (flamegraph.pl {output} > profile.svg)')
+    if pstats_output:
+        if merged_stats is None:
+            click.echo('Профилей cProfile нет - pstats не сохранен')
+        else:
+            merged_stats.dump_stats(pstats_output)
+            click.echo(f'Объединенный pstats сохранен в {pstats_output}')
+
+    total = sum(stacks.values()) or 1
+    click.echo(f'{"собственное время, мс":>22}  {"доля":>6}  кадр')
+    for frame, value in self_time_by_frame(stacks)[:top]:
+        click.echo(f'{value / 1000:>22.1f}  {value / total:>6.1%}  {frame}')
+
 def register_commands(app):
     """Регистрация команд Flask CLI"""
     app.cli.add_command(init_roles_command)
-    app.cli.add_command(make_admin_command)
\ No newline at end of file
+    app.cli.add_command(make_admin_command)
+    app.cli.add_command(smtp_sink_command)
+    app.cli.add_command(sweep_tokens_command)
+    app.cli.add_command(export_swagger_command)
+    app.cli.add_command(profile_report_command)
\ No newline at end of file
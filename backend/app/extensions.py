@@ -1,20 +1,56 @@
 """
 Расширения Flask приложения
 """
+import os
+import click
 from flask_sqlalchemy import SQLAlchemy
 from flask_marshmallow import Marshmallow
 from flask_jwt_extended import JWTManager
 from flask_restx import Api
 from flask_cors import CORS
+from app.utils.db_routing import RoutingSession
 
 # Инициализация расширений
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 ma = Marshmallow()
 jwt = JWTManager()
+# Миграции хранятся в backend/migrations независимо от текущей директории
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
 
 # API будет инициализирован позже
 api = None
 
+def init_migrate(app):
+    """
+    Подключение Flask-Migrate
+    :param app: экземпляр Flask приложения
+    """
+    from flask_migrate import Migrate
+
+    Migrate(
+        app, db,
+        directory=MIGRATIONS_DIRECTORY,
+        render_as_batch=True  # ALTER для SQLite выполняется через пересоздание таблицы
+    )
+
+
+class LazyMigrateGroup(click.Group):
+    """
+    Группа flask db. Импорт alembic занимает заметную часть старта, поэтому Flask-Migrate
+    подключается при первом обращении к командам группы, а не в create_app
+    """
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        # Контекст приложения уже создан FlaskGroup; разбор аргументов и вызов
+        # выполняет группа Flask-Migrate (ее обработчик задает каталог миграций)
+        from flask import current_app
+        from flask_migrate.cli import db as migrate_group
+
+        if 'migrate' not in current_app.extensions:
+            init_migrate(current_app)
+        return migrate_group.make_context(info_name, args, parent=parent, **extra)
+
+
 def init_extensions(app):
     """
     Инициализация всех расширений Flask
@@ -34,7 +70,21 @@ def init_extensions(app):
         }
     })
     
+    # Настройка и инструментирование пула соединений
+    from app.utils.db_pool import prepare_engine_options, instrument_engine
+    from app.utils.sqlite import configure_sqlite_engine
+    prepare_engine_options(app)
     db.init_app(app)
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            instrument_engine(engine, bind_key)
+            configure_sqlite_engine(engine, app.config)
+    
+    app.cli.add_command(LazyMigrateGroup('db', help='Миграции базы данных (Flask-Migrate)'))
+    
+    # Реплики для чтения (если настроены)
+    from app.utils.db_routing import init_replica_routing
+    init_replica_routing(app, db)
     ma.init_app(app)
     jwt.init_app(app)
     
@@ -87,12 +137,12 @@ def init_extensions(app):
 
     # Инициализация API
     api = Api(
-        app,
         title='Your Application API',
         version='1.0',
         description='Your Application API \n\n\n **Все модели основаны на BaseModel, с.м раздел Models** \n\n Любые данные о формате времени, структуре ошибок, ответов, пагинации, поиске и прочем представлены в `/base`',
         prefix='/api',
-        doc='/api/docs',
+        # Без документации не регистрируются Swagger UI и /api/swagger.json
+        doc='/api/docs' if app.config.get('API_DOCS', True) else False,
         authorizations={
             'jwt': {
                 'type': 'apiKey',
@@ -102,3 +152,9 @@ def init_extensions(app):
             }
         }
     )
+    # add_specs учитывается только в init_app: конструктор Api(app) вызывает его без параметров
+    api.init_app(app, add_specs=app.config.get('API_DOCS', True))
+    
+    # /api/swagger.json сериализуется один раз и отдается с ETag и gzip
+    from app.utils.swagger import init_spec_cache
+    init_spec_cache(app)
@@ -3,10 +3,11 @@
 """
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Table, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Table, JSON, Index, text
 from sqlalchemy.orm import relationship
 from app.extensions import db
 from app.models.base import BaseModel, HistoryModel
+from app.utils import metrics
 
 class Role(BaseModel):
     """Модель ролей"""
@@ -18,16 +19,17 @@ class Role(BaseModel):
 class RoleHistory(HistoryModel):
     """История изменений ролей"""
     __tablename__ = 'role_history'
+    __history_of__ = 'Role'
     
-    role_id = Column(Integer, ForeignKey('role.id'), nullable=False)
+    role_id = Column(Integer, ForeignKey('role.id'), nullable=False)  # индекс (role_id, timestamp) в HistoryModel
     role = relationship('Role')
 
 class User(BaseModel):
     """Модель пользователя"""
     __tablename__ = 'user'
 
-    username = Column(String(50), unique=True, nullable=True)  # Добавлено поле username
-    email = Column(String(120), unique=True, nullable=False)
+    username = Column(String(50), nullable=True)  # Добавлено поле username
+    email = Column(String(120), nullable=False)
     password_hash = Column(String(128))
     first_name = Column(String(64))
     last_name = Column(String(64))
@@ -36,21 +38,35 @@ class User(BaseModel):
     last_login = Column(DateTime)
     roles = relationship('Role', secondary='user_role', backref='users')
 
+    __table_args__ = (
+        Index('ix_user_deleted', 'deleted'),
+        # Уникальность только среди неудаленных записей; СУБД без частичных индексов получают обычный уникальный индекс
+        Index('uq_user_email_live', 'email', unique=True, postgresql_where=text('deleted = false'),
+              sqlite_where=text('deleted = 0'), mssql_where=text('deleted = 0')),
+        Index('uq_user_username_live', 'username', unique=True, postgresql_where=text('deleted = false'),
+              sqlite_where=text('deleted = 0'), mssql_where=text('deleted = 0')),
+    )
+
     def set_password(self, password):
         """Установка хэша пароля"""
-        self.password_hash = generate_password_hash(password)
+        with metrics.timer('password_hash', operation='generate'):
+            self.password_hash = generate_password_hash(password)
 
     def check_password(self, password):
         """Проверка пароля"""
-        return check_password_hash(self.password_hash, password)
+        with metrics.timer('password_hash', operation='check'):
+            return check_password_hash(self.password_hash, password)
 
     
 
 class UserHistory(HistoryModel):
     """История изменений пользователя"""
     __tablename__ = 'user_history'
+    __history_of__ = 'User'
+    # Время последнего входа меняется при каждом входе и не является изменением данных
+    __history_exclude__ = HistoryModel.__history_exclude__ | {'last_login'}
     
-    user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('user.id'), nullable=False)  # индекс (user_id, timestamp) в HistoryModel
     user = relationship('User', foreign_keys=[user_id])
 
 class UserRole(BaseModel):
@@ -58,7 +74,7 @@ class UserRole(BaseModel):
     __tablename__ = 'user_role'
     
     user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
-    role_id = Column(Integer, ForeignKey('role.id'), nullable=False)
+    role_id = Column(Integer, ForeignKey('role.id'), nullable=False, index=True)  # user_id покрыт uq_user_role
     
     user = relationship('User', viewonly=True, overlaps="roles,users")
     role = relationship('Role', viewonly=True, overlaps="roles,users")
@@ -86,7 +102,28 @@ class UserSession(BaseModel):
     is_tablet = Column(Boolean, default=False)
     is_pc = Column(Boolean, default=False)
     is_bot = Column(Boolean, default=False)
-    expires_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
     is_active = Column(Boolean, default=True)
     
     user = relationship('User', backref='sessions')
+
+    __table_args__ = (
+        # Список активных сессий: равенство по user_id/is_active и диапазон/сортировка по expires_at.
+        # Покрывает и поиск по одному user_id (ведущая колонка)
+        Index('ix_user_session_user_id_is_active_expires_at', 'user_id', 'is_active', 'expires_at'),
+    )
+
+class UsedPasswordToken(BaseModel):
+    """Использованные одноразовые токены установки/сброса пароля"""
+    __tablename__ = 'used_password_token'
+
+    nonce = Column(String(16), unique=True, nullable=False)
+    user_id = Column(Integer, ForeignKey('user.id'), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)  # После истечения запись можно удалить
+
+class PasswordResetThrottle(BaseModel):
+    """Окна схлопывания повторных запросов сброса пароля (общие для всех воркеров)"""
+    __tablename__ = 'password_reset_throttle'
+
+    key = Column(String(64), unique=True, nullable=False)  # SHA-256 нормализованного email
+    expires_at = Column(DateTime, nullable=False, index=True)
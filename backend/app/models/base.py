@@ -1,11 +1,177 @@
 """
 Базовая модель с поддержкой истории изменений и soft delete
 """
-from datetime import datetime
-from sqlalchemy import JSON, Column, Integer, DateTime, Boolean, String
+import enum
+import logging
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from operator import attrgetter, itemgetter
+from flask import has_request_context
+from sqlalchemy import JSON, Column, Integer, DateTime, Boolean, String, Index, event, inspect
 from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.orm import Session, with_loader_criteria
 from app.extensions import db
 
+logger = logging.getLogger(__name__)
+
+# Модели истории по имени отслеживаемой модели: 'User' -> UserHistory
+_history_models = {}
+
+# Значение, которым заменяются скрытые поля в истории
+MASKED_VALUE = '***'
+
+# Скомпилированные сериализаторы: (класс, include, exclude, связи) -> ModelSerializer
+_serializers = {}
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def _enum_value(value):
+    return value.value
+
+
+# Преобразования значений колонок к JSON-совместимому виду по python-типу колонки
+_JSON_CONVERTERS = (
+    ((datetime, date, time), _isoformat),
+    ((Decimal, uuid.UUID), str),
+    ((bytes,), bytes.hex),
+    ((enum.Enum,), _enum_value),
+)
+
+
+def _column_converter(column):
+    """Функция преобразования значения колонки или None, если значение уже JSON-совместимо"""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        # JSON и пользовательские типы отдаются как есть
+        return None
+    for types, converter in _JSON_CONVERTERS:
+        if issubclass(python_type, types):
+            return converter
+    return None
+
+
+class ModelSerializer:
+    """
+    Сериализатор модели, собранный один раз для набора колонок: значения читаются
+    одним вызовом itemgetter, преобразуются только колонки, которым это нужно
+    """
+
+    def __init__(self, model, include=None, exclude=None, relationships=None):
+        mapper = inspect(model)
+        columns = [
+            attr for attr in mapper.column_attrs
+            if (include is None or attr.key in include) and (exclude is None or attr.key not in exclude)
+        ]
+        self.keys = tuple(attr.key for attr in columns)
+        self._single = len(self.keys) == 1
+        if self.keys:
+            # Загруженные значения берутся прямо из __dict__ объекта, минуя дескрипторы атрибутов
+            self._dict_getter = itemgetter(*self.keys)
+            self._attr_getter = attrgetter(*self.keys)
+        else:
+            self._dict_getter = self._attr_getter = lambda obj: ()
+        self._converters = tuple(
+            (index, converter)
+            for index, attr in enumerate(columns)
+            for converter in (_column_converter(attr.columns[0]),)
+            if converter is not None
+        )
+
+        # Связи: имя -> (сериализатор связанной модели, коллекция ли это)
+        self._relationships = []
+        for name, options in (relationships or {}).items():
+            prop = mapper.relationships[name]
+            nested = get_serializer(prop.mapper.class_, **(options or {}))
+            self._relationships.append((name, nested, prop.uselist))
+
+    def values(self, obj):
+        """Кортеж JSON-совместимых значений колонок в порядке self.keys"""
+        try:
+            values = self._dict_getter(obj.__dict__)
+        except KeyError:
+            # Истекшие или отложенные атрибуты загружаются через ORM
+            values = self._attr_getter(obj)
+        if self._single:
+            values = (values,)
+        if not self._converters:
+            return values
+        values = list(values)
+        for index, converter in self._converters:
+            value = values[index]
+            if value is not None:
+                values[index] = converter(value)
+        return tuple(values)
+
+    def to_dict(self, obj):
+        """Словарь колонок (и развернутых связей) объекта"""
+        result = dict(zip(self.keys, self.values(obj)))
+        for name, nested, uselist in self._relationships:
+            related = getattr(obj, name)
+            if uselist:
+                result[name] = [nested.to_dict(item) for item in related]
+            else:
+                result[name] = nested.to_dict(related) if related is not None else None
+        return result
+
+    def to_dicts(self, objects):
+        """Список словарей для набора объектов"""
+        if self._relationships:
+            return [self.to_dict(obj) for obj in objects]
+        keys = self.keys
+        values = self.values
+        return [dict(zip(keys, values(obj))) for obj in objects]
+
+    def to_tuples(self, objects):
+        """Список кортежей значений в порядке self.keys (связи не разворачиваются)"""
+        values = self.values
+        return [values(obj) for obj in objects]
+
+
+def _normalize_relationships(relationships):
+    """Связи в виде {имя: параметры вложенного сериализатора или None}"""
+    if not relationships:
+        return {}
+    if isinstance(relationships, dict):
+        return relationships
+    return {name: None for name in relationships}
+
+
+def _options_key(include=None, exclude=None, relationships=None):
+    """Хешируемое представление параметров сериализатора для ключа кэша"""
+    return (
+        frozenset(include) if include is not None else None,
+        frozenset(exclude) if exclude is not None else None,
+        tuple(sorted(
+            (name, _options_key(**(options or {})))
+            for name, options in _normalize_relationships(relationships).items()
+        )),
+    )
+
+
+def get_serializer(model, include=None, exclude=None, relationships=None):
+    """
+    Сериализатор модели из кэша (собирается при первом обращении)
+    :param model: класс модели
+    :param include: колонки, которые нужно включить (по умолчанию все)
+    :param exclude: колонки, которые нужно исключить
+    :param relationships: связи для разворачивания - список имен или
+        словарь {имя: {'include': ..., 'exclude': ..., 'relationships': ...}}
+    :return: экземпляр ModelSerializer
+    """
+    key = (model,) + _options_key(include, exclude, relationships)
+    serializer = _serializers.get(key)
+    if serializer is None:
+        # Параллельная сборка в нескольких потоках безвредна - в кэше останется первый экземпляр
+        serializer = _serializers.setdefault(
+            key, ModelSerializer(model, key[1], key[2], _normalize_relationships(relationships))
+        )
+    return serializer
+
 class BaseModel(db.Model):
     """
     Базовый класс для всех моделей с поддержкой истории изменений
@@ -32,21 +198,90 @@ class BaseModel(db.Model):
         self.deleted = True
         db.session.commit()
 
-    def to_dict(self):
-        """Преобразование модели в словарь"""
-        return {c.name: getattr(self, c.name) for c in self.__table__.columns}
+    def to_dict(self, include=None, exclude=None, relationships=None):
+        """
+        Преобразование модели в словарь с JSON-совместимыми значениями
+        :param include: колонки, которые нужно включить (по умолчанию все)
+        :param exclude: колонки, которые нужно исключить
+        :param relationships: связи для разворачивания (см. get_serializer)
+        :return: словарь {колонка: значение}
+        """
+        return get_serializer(type(self), include, exclude, relationships).to_dict(self)
+
+    @classmethod
+    def to_dicts(cls, objects, include=None, exclude=None, relationships=None):
+        """
+        Пакетное преобразование объектов модели в словари
+        :param objects: итерируемый набор объектов
+        :return: список словарей
+        """
+        return get_serializer(cls, include, exclude, relationships).to_dicts(objects)
+
+    @classmethod
+    def to_tuples(cls, objects, include=None, exclude=None):
+        """
+        Пакетное преобразование объектов модели в кортежи значений
+        :param objects: итерируемый набор объектов
+        :return: кортеж (имена колонок, список кортежей значений)
+        """
+        serializer = get_serializer(cls, include, exclude)
+        return serializer.keys, serializer.to_tuples(objects)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _exclude_soft_deleted(execute_state):
+    """
+    Исключение мягко удаленных записей из всех ORM-запросов (включая ленивые загрузки связей).
+    Для выборки с удаленными записями: query.execution_options(include_deleted=True)
+    """
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get('include_deleted', False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(BaseModel, lambda cls: cls.deleted == False, include_aliases=True)
+        )
 
 class HistoryModel(BaseModel):
     """
-    Базовый класс для моделей истории изменений
+    Базовый класс для моделей истории изменений.
+
+    Подкласс с `__history_of__ = 'Model'` автоматически получает записи обо всех
+    изменениях Model (см. _capture_history). Внешний ключ на отслеживаемую запись
+    называется `<model>_id`.
     """
     __abstract__ = True
 
+    # Имя отслеживаемой модели
+    __history_of__ = None
+    # Колонки, изменения которых не записываются
+    __history_exclude__ = frozenset({'id', 'created_at', 'updated_at'})
+    # Колонки, значения которых не попадают в историю
+    __history_masked__ = frozenset({'password_hash'})
+
     action = Column(String(50), nullable=False)  # create, update, delete
-    changed_by_id = Column(Integer, db.ForeignKey('user.id'), nullable=False)
+    changed_by_id = Column(Integer, db.ForeignKey('user.id'), nullable=True)  # NULL - системное изменение
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
     changes = Column(JSON)  # Хранит изменения в формате JSON
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        tracked = cls.__dict__.get('__history_of__')
+        if tracked:
+            _history_models[tracked] = cls
+
+    @declared_attr
+    def __table_args__(cls):
+        """Индексы под выборки истории по субъекту, автору и периоду с сортировкой по времени"""
+        table = cls.__tablename__
+        subject = f"{cls.__history_of__.lower()}_id"
+        return (
+            Index(f'ix_{table}_{subject}_timestamp', subject, 'timestamp'),
+            Index(f'ix_{table}_changed_by_id_timestamp', 'changed_by_id', 'timestamp'),
+            Index(f'ix_{table}_timestamp', 'timestamp'),
+        )
+
     @declared_attr
     def changed_by(cls):
         """Связь с пользователем, который внес изменения"""
@@ -55,7 +290,8 @@ class HistoryModel(BaseModel):
     @classmethod
     def log_change(cls, item, action, changed_by_id, changes=None):
         """
-        Логирование изменений
+        Ручное логирование изменений (запись сохраняется вместе с текущей транзакцией,
+        commit выполняет вызывающий код)
         :param item: измененный объект
         :param action: тип действия (create/update/delete)
         :param changed_by_id: ID пользователя
@@ -68,4 +304,124 @@ class HistoryModel(BaseModel):
             **{f"{item.__class__.__name__.lower()}_id": item.id}
         )
         db.session.add(history)
-        db.session.commit()
+        return history
+
+
+def _json_value(value):
+    """Приведение значения колонки к JSON-совместимому виду"""
+    for types, converter in _JSON_CONVERTERS:
+        if isinstance(value, types):
+            return converter(value)
+    return value
+
+
+def _current_actor_id():
+    """ID пользователя из JWT текущего запроса или None"""
+    if not has_request_context():
+        return None
+    from flask_jwt_extended import get_jwt_identity
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        # JWT в этом запросе не проверялся (регистрация, сброс пароля по токену)
+        return None
+    try:
+        return int(identity) if identity is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _object_changes(obj, history_cls, created):
+    """
+    Изменения колонок объекта по истории атрибутов
+    :return: словарь {колонка: значение} для новых объектов, {колонка: {'old', 'new'}} для измененных
+    """
+    state = inspect(obj)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        key = attr.key
+        if key in history_cls.__history_exclude__:
+            continue
+        masked = key in history_cls.__history_masked__
+        if created:
+            value = state.dict.get(key)
+            if value is not None:
+                changes[key] = MASKED_VALUE if masked else _json_value(value)
+            continue
+        hist = state.attrs[key].load_history()
+        if not hist.has_changes():
+            continue
+        old = hist.deleted[0] if hist.deleted else None
+        new = hist.added[0] if hist.added else None
+        if old == new:
+            continue
+        if masked:
+            changes[key] = {'old': MASKED_VALUE, 'new': MASKED_VALUE}
+        else:
+            changes[key] = {'old': _json_value(old), 'new': _json_value(new)}
+    return changes
+
+
+@event.listens_for(Session, 'after_flush')
+def _capture_history(session, flush_context):
+    """
+    Запись истории изменений отслеживаемых моделей.
+
+    В after_flush первичные ключи новых записей уже известны, а коллекции new/dirty
+    и история атрибутов еще отражают состояние до flush. Все записи истории одного
+    flush вставляются одним executemany на каждую таблицу истории в той же транзакции.
+    """
+    if not _history_models:
+        return
+
+    actor_id = None
+    in_request = False
+    actor_resolved = False
+    rows = {}
+    now = datetime.utcnow()
+
+    candidates = [(obj, True) for obj in session.new] + [(obj, False) for obj in session.dirty]
+    for obj, created in candidates:
+        history_cls = _history_models.get(type(obj).__name__)
+        if history_cls is None:
+            continue
+        if not created and not session.is_modified(obj, include_collections=False):
+            continue
+
+        changes = _object_changes(obj, history_cls, created)
+        if not created and not changes:
+            continue
+
+        if created:
+            action = 'create'
+        elif changes.get('deleted', {}).get('new') is True:
+            action = 'delete'
+        else:
+            action = 'update'
+
+        if not actor_resolved:
+            actor_id = _current_actor_id()
+            in_request = has_request_context()
+            actor_resolved = True
+        # Без JWT изменения собственной учетной записи в запросе (регистрация, сброс пароля)
+        # записываются на нее саму; вне запроса (CLI, скрипты) автор неизвестен
+        changed_by_id = actor_id
+        if changed_by_id is None and in_request and history_cls.__history_of__ == 'User':
+            changed_by_id = obj.id
+
+        rows.setdefault(history_cls, []).append({
+            f"{history_cls.__history_of__.lower()}_id": obj.id,
+            'action': action,
+            'changed_by_id': changed_by_id,
+            'changes': changes,
+            'timestamp': now,
+            'created_at': now,
+            'updated_at': now,
+            'deleted': False,
+        })
+    # Жесткое удаление (session.deleted) не записывается: запись истории ссылалась бы на удаленную строку
+
+    for history_cls, history_rows in rows.items():
+        connection = session.connection(bind_arguments={'mapper': history_cls.__mapper__})
+        connection.execute(history_cls.__table__.insert(), history_rows)
+        logger.debug(f"Записано изменений в {history_cls.__tablename__}: {len(history_rows)}")
@@ -0,0 +1,3 @@
+"""
+Пакет репозиториев: заранее построенные запросы для горячих путей
+"""
@@ -0,0 +1,107 @@
+"""
+Запросы авторизации, выполняемые на каждый запрос к API
+
+Операторы строятся один раз при импорте модуля и выполняются с параметрами,
+поэтому на вызов не тратится построение Query, а скомпилированный SQL берется
+из кэша компиляции SQLAlchemy. Фильтр мягкого удаления добавляется общим
+обработчиком do_orm_execute (см. app.models.base).
+"""
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm.util import identity_key
+from app.extensions import db
+from app.models.auth import User, UserSession
+
+_user_by_email = select(User).where(User.email == bindparam('email')).limit(1)
+
+_user_by_id = select(User).where(User.id == bindparam('user_id'))
+
+_session_by_refresh_token = (
+    select(UserSession)
+    .where(UserSession.refresh_token == bindparam('refresh_token'))
+    .limit(1)
+)
+
+_active_session_by_refresh_token = (
+    select(UserSession)
+    .where(
+        UserSession.user_id == bindparam('user_id'),
+        UserSession.refresh_token == bindparam('refresh_token'),
+        UserSession.is_active == True,
+    )
+    .limit(1)
+)
+
+
+def get_user_by_email(email):
+    """
+    Пользователь по email
+    :param email: email пользователя
+    :return: объект пользователя или None
+    """
+    return db.session.execute(_user_by_email, {'email': email}).scalar_one_or_none()
+
+
+def get_user_by_id(user_id):
+    """
+    Пользователь по ID (сначала проверяется identity map сессии)
+    :param user_id: ID пользователя (в том числе строкой из JWT)
+    :return: объект пользователя или None
+    """
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    # Пользователь, уже загруженный в этом запросе (например, в role_required), не запрашивается повторно
+    user = db.session.identity_map.get(identity_key(User, user_id))
+    if user is not None:
+        return None if user.deleted else user
+    return db.session.execute(_user_by_id, {'user_id': user_id}).scalar_one_or_none()
+
+
+async def get_user_by_email_async(session, email):
+    """
+    Пользователь по email через AsyncSession (ASGI-обработчики)
+    :param session: экземпляр AsyncSession
+    :param email: email пользователя
+    :return: объект пользователя или None
+    """
+    result = await session.execute(_user_by_email, {'email': email})
+    return result.scalar_one_or_none()
+
+
+async def get_user_by_id_async(session, user_id):
+    """
+    Пользователь по ID через AsyncSession (ASGI-обработчики)
+    :param session: экземпляр AsyncSession
+    :param user_id: ID пользователя (в том числе строкой из JWT)
+    :return: объект пользователя или None
+    """
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    result = await session.execute(_user_by_id, {'user_id': user_id})
+    return result.scalar_one_or_none()
+
+
+def get_session_by_refresh_token(refresh_token):
+    """
+    Сессия по refresh токену
+    :param refresh_token: refresh токен
+    :return: объект сессии или None
+    """
+    return db.session.execute(
+        _session_by_refresh_token, {'refresh_token': refresh_token}
+    ).scalar_one_or_none()
+
+
+def get_active_session(user_id, refresh_token):
+    """
+    Активная сессия пользователя по refresh токену
+    :param user_id: ID пользователя
+    :param refresh_token: refresh токен
+    :return: объект сессии или None
+    """
+    return db.session.execute(
+        _active_session_by_refresh_token, {'user_id': int(user_id), 'refresh_token': refresh_token}
+    ).scalar_one_or_none()
@@ -0,0 +1,33 @@
+"""
+Схемы параметров запросов к истории изменений
+"""
+from datetime import timezone
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+
+# Размер страницы истории по умолчанию и максимальный
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+class AuditQuerySchema(Schema):
+    """Фильтры истории изменений"""
+    changed_by_id = fields.Integer()
+    action = fields.String(validate=validate.OneOf(['create', 'update', 'delete']))
+    # Метки времени истории хранятся в UTC без часового пояса: значения со смещением
+    # приводятся к UTC, чтобы их можно было сравнивать между собой и с колонкой timestamp
+    since = fields.NaiveDateTime(timezone=timezone.utc)
+    until = fields.NaiveDateTime(timezone=timezone.utc)
+    limit = fields.Integer(load_default=DEFAULT_PAGE_SIZE, validate=validate.Range(min=1, max=MAX_PAGE_SIZE))
+    cursor = fields.String()
+
+    @validates_schema
+    def validate_range(self, data, **kwargs):
+        if 'since' in data and 'until' in data and data['since'] > data['until']:
+            raise ValidationError('Начало периода позже его окончания', 'since')
+
+class UserAuditQuerySchema(AuditQuerySchema):
+    """Фильтры истории изменений пользователей"""
+    user_id = fields.Integer()
+
+class RoleAuditQuerySchema(AuditQuerySchema):
+    """Фильтры истории изменений ролей"""
+    role_id = fields.Integer()
@@ -1,7 +1,7 @@
 """
 Схемы для аутентификации и управления пользователями
 """
-from marshmallow import Schema, fields, validates, ValidationError, validates_schema, post_load
+from marshmallow import Schema, fields, validate, validates, ValidationError, validates_schema, post_load
 from app.extensions import ma
 from app.models.auth import User, Role, UserSession, UserRole
 from app.schemas.base import BaseSchema, HistorySchema
@@ -114,6 +114,24 @@ class UserSessionSchema(BaseSchema):
     expires_at = fields.DateTime(dump_only=True)
     is_active = fields.Boolean(dump_only=True)
 
+class SessionListQuerySchema(Schema):
+    """Параметры списка активных сессий"""
+    limit = fields.Integer(load_default=50, validate=validate.Range(min=1, max=200))
+    cursor = fields.String()
+    # Поля ответа через запятую (по умолчанию все поля UserSessionSchema); имя `fields` занято в Schema
+    only = fields.String(data_key='fields')
+
+    @post_load
+    def split_fields(self, data, **kwargs):
+        if 'only' in data:
+            allowed = set(UserSessionSchema().fields)
+            requested = [name.strip() for name in data['only'].split(',') if name.strip()]
+            unknown = sorted(set(requested) - allowed)
+            if unknown:
+                raise ValidationError(f"Неизвестные поля: {', '.join(unknown)}", 'fields')
+            data['only'] = requested
+        return data
+
 class RoleHistorySchema(HistorySchema):
     """Схема для истории изменений ролей"""
     role_id = fields.Integer(required=True)
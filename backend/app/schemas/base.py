@@ -16,7 +16,7 @@ class HistorySchema(BaseSchema):
     """Базовая схема для истории изменений"""
     
     action = fields.String(required=True)
-    changed_by_id = fields.Integer(required=True)
+    changed_by_id = fields.Integer(allow_none=True)  # None - системное изменение
     timestamp = fields.DateTime(dump_only=True)
     changes = fields.Dict(keys=fields.String(), values=fields.Raw())
 
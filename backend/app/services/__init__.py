@@ -0,0 +1,3 @@
+"""
+Пакет сервисов: операции над данными, общие для нескольких API
+"""
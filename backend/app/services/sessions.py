@@ -0,0 +1,151 @@
+"""
+Операции над сессиями пользователя: создание записи сессии, отзыв одним UPDATE
+и постраничный список активных сессий
+"""
+from datetime import datetime, timedelta
+from flask import current_app, request
+from sqlalchemy import or_, tuple_, update
+from sqlalchemy.orm import load_only
+from app.extensions import db
+from app.models.auth import UserSession
+from app.utils import metrics
+from app.utils.pagination import encode_cursor, decode_cursor
+
+
+def new_user_session(user_id, refresh_token):
+    """
+    Запись о сессии для выданного refresh токена с данными о браузере и устройстве
+    из текущего запроса (в сессию БД не добавляется)
+    :param user_id: ID пользователя
+    :param refresh_token: refresh токен сессии
+    :return: объект UserSession
+    """
+    # Парсер загружает и компилирует ~1300 регулярных выражений (сотни мс), поэтому
+    # импортируется при первом входе, а не при старте воркера или CLI-команды
+    import user_agents
+
+    user_agent_string = request.user_agent.string
+    with metrics.timer('user_agent_parse'):
+        user_agent = user_agents.parse(user_agent_string)
+    lifetime = current_app.config['JWT_REFRESH_TOKEN_EXPIRES']
+    return UserSession(
+        user_id=user_id,
+        refresh_token=refresh_token,
+        user_agent=user_agent_string,
+        ip_address=request.remote_addr,
+        browser_family=user_agent.browser.family,
+        browser_version=user_agent.browser.version_string,
+        os_family=user_agent.os.family,
+        os_version=user_agent.os.version_string,
+        device_family=user_agent.device.family,
+        device_brand=getattr(user_agent.device, 'brand', None),
+        device_model=getattr(user_agent.device, 'model', None),
+        is_mobile=user_agent.is_mobile,
+        is_tablet=user_agent.is_tablet,
+        is_pc=user_agent.is_pc,
+        is_bot=user_agent.is_bot,
+        expires_at=datetime.utcnow() + (
+            lifetime if isinstance(lifetime, timedelta) else timedelta(seconds=lifetime)
+        ),
+        is_active=True
+    )
+
+
+def _revoke_statement(*criteria):
+    """UPDATE, деактивирующий активные сессии по условиям"""
+    return (
+        update(UserSession)
+        .where(UserSession.is_active == True, *criteria)
+        .values(is_active=False)
+    )
+
+
+def _revoke(*criteria):
+    """
+    Деактивация активных сессий по условиям (commit выполняет вызывающий код)
+    :return: количество деактивированных сессий
+    """
+    return db.session.execute(_revoke_statement(*criteria)).rowcount
+
+
+def revoke_user_sessions(user_id, except_refresh_token=None, except_session_id=None):
+    """
+    Отзыв всех активных сессий пользователя
+    :param user_id: ID пользователя
+    :param except_refresh_token: refresh токен сессии, которую нужно оставить
+    :param except_session_id: ID сессии, которую нужно оставить
+    :return: количество отозванных сессий
+    """
+    criteria = [UserSession.user_id == int(user_id)]
+    if except_refresh_token:
+        criteria.append(or_(UserSession.refresh_token.is_(None), UserSession.refresh_token != except_refresh_token))
+    if except_session_id is not None:
+        criteria.append(UserSession.id != except_session_id)
+    return _revoke(*criteria)
+
+
+def revoke_session(user_id, session_id):
+    """
+    Отзыв сессии пользователя по ID
+    :param user_id: ID владельца сессии
+    :param session_id: ID сессии
+    :return: 1, если сессия была активна и отозвана, иначе 0
+    """
+    return _revoke(UserSession.id == session_id, UserSession.user_id == int(user_id))
+
+
+def revoke_session_by_refresh_token(user_id, refresh_token):
+    """
+    Отзыв сессии пользователя по refresh токену
+    :param user_id: ID владельца сессии
+    :param refresh_token: refresh токен сессии
+    :return: 1, если сессия была активна и отозвана, иначе 0
+    """
+    return _revoke(UserSession.refresh_token == refresh_token, UserSession.user_id == int(user_id))
+
+
+async def revoke_session_by_refresh_token_async(session, user_id, refresh_token):
+    """
+    Отзыв сессии пользователя по refresh токену через AsyncSession (ASGI-обработчики)
+    :param session: экземпляр AsyncSession
+    :param user_id: ID владельца сессии
+    :param refresh_token: refresh токен сессии
+    :return: 1, если сессия была активна и отозвана, иначе 0
+    """
+    result = await session.execute(
+        _revoke_statement(UserSession.refresh_token == refresh_token, UserSession.user_id == int(user_id))
+    )
+    return result.rowcount
+
+
+def list_active_sessions(user_id, limit, cursor=None, only=None):
+    """
+    Страница активных и неистекших сессий пользователя, от новых к старым.
+
+    Сортировка по (expires_at, id) совпадает с индексом (user_id, is_active, expires_at),
+    поэтому страница читается по индексу без сортировки всей истории сессий.
+    :param user_id: ID пользователя
+    :param limit: размер страницы
+    :param cursor: курсор следующей страницы из предыдущего ответа
+    :param only: колонки, которые нужно загрузить (None - все)
+    :return: кортеж (сессии, курсор следующей страницы или None)
+    """
+    query = UserSession.query.filter(
+        UserSession.user_id == int(user_id),
+        UserSession.is_active == True,
+        UserSession.expires_at > datetime.utcnow(),
+    )
+    if cursor:
+        expires_at, session_id = decode_cursor(cursor)
+        query = query.filter(tuple_(UserSession.expires_at, UserSession.id) < tuple_(expires_at, session_id))
+    if only is not None:
+        # id и expires_at нужны для курсора
+        columns = {'id', 'expires_at', *only}
+        query = query.options(load_only(*(getattr(UserSession, name) for name in columns)))
+
+    sessions = query.order_by(UserSession.expires_at.desc(), UserSession.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        next_cursor = encode_cursor(sessions[-1].expires_at, sessions[-1].id)
+    return sessions, next_cursor
@@ -0,0 +1,78 @@
+"""
+Выборка истории изменений с keyset-пагинацией по (timestamp, id)
+"""
+import json
+from sqlalchemy import tuple_
+from app.models.base import get_serializer
+from app.utils.pagination import encode_cursor, decode_cursor
+
+# Размер пачки строк при потоковой выгрузке
+EXPORT_BATCH_SIZE = 1000
+
+
+def build_history_query(model, filters):
+    """
+    Запрос к таблице истории с фильтрами
+    :param model: модель истории (UserHistory, RoleHistory)
+    :param filters: словарь из AuditQuerySchema (ключ субъекта - `<model>_id`)
+    :return: Query без сортировки
+    """
+    query = model.query
+    subject_column = f"{model.__history_of__.lower()}_id"
+    if filters.get(subject_column) is not None:
+        query = query.filter(getattr(model, subject_column) == filters[subject_column])
+    if filters.get('changed_by_id') is not None:
+        query = query.filter(model.changed_by_id == filters['changed_by_id'])
+    if filters.get('action'):
+        query = query.filter(model.action == filters['action'])
+    if filters.get('since'):
+        query = query.filter(model.timestamp >= filters['since'])
+    if filters.get('until'):
+        query = query.filter(model.timestamp < filters['until'])
+    return query
+
+
+def paginate_history(model, filters):
+    """
+    Страница истории от новых записей к старым
+    :param model: модель истории
+    :param filters: словарь из AuditQuerySchema
+    :return: кортеж (записи, курсор следующей страницы или None)
+    """
+    query = build_history_query(model, filters)
+    if filters.get('cursor'):
+        timestamp, row_id = decode_cursor(filters['cursor'])
+        # Сравнение кортежей идет по индексу (..., timestamp) без OFFSET
+        query = query.filter(tuple_(model.timestamp, model.id) < tuple_(timestamp, row_id))
+
+    limit = filters['limit']
+    rows = query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    return rows, next_cursor
+
+
+def iter_history(model, filters):
+    """
+    Потоковый обход истории в хронологическом порядке без загрузки всей выборки в память
+    :param model: модель истории
+    :param filters: словарь из AuditQuerySchema (limit и cursor игнорируются)
+    :return: генератор записей
+    """
+    query = build_history_query(model, filters).order_by(model.timestamp, model.id)
+    yield from query.yield_per(EXPORT_BATCH_SIZE)
+
+
+def iter_jsonl(model, rows):
+    """
+    Построчная сериализация записей в JSON Lines
+    :param model: модель записей
+    :param rows: итерируемый набор записей
+    :return: генератор строк
+    """
+    to_dict = get_serializer(model).to_dict
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    for row in rows:
+        yield dumps(to_dict(row)) + '\n'
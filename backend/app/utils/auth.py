@@ -10,16 +10,17 @@ from flask_jwt_extended import (
     set_access_cookies, set_refresh_cookies,
     unset_jwt_cookies
 )
-from app.models.auth import User, UserSession
+from app.models.auth import UserSession
+from app.repositories.auth import get_user_by_id
 from app.extensions import db
 
 def get_user_by_identity(identity):
     """
     Получение пользователя по идентификатору из JWT
     :param identity: идентификатор пользователя
-    :return: объект пользователя или None
+    :return: объект пользователя или None (в том числе для мягко удаленной учетной записи)
     """
-    return User.query.get(identity)
+    return get_user_by_id(identity)
 
 
 def clear_auth_cookies(response):
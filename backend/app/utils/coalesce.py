@@ -0,0 +1,104 @@
+"""
+Схлопывание повторных запросов сброса пароля по email
+"""
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models.auth import PasswordResetThrottle
+
+logger = logging.getLogger(__name__)
+
+# Кэш процесса: ключ -> время закрытия окна (unix time), позволяет не ходить в БД при частых повторах
+_windows = {}
+_windows_lock = threading.Lock()
+# Максимальный размер кэша на процесс
+WINDOW_CACHE_SIZE = 10000
+
+
+def normalize_email(email):
+    """Нормализация email для сравнения запросов"""
+    return (email or '').strip().lower()
+
+
+def _make_key(email):
+    return hashlib.sha256(normalize_email(email).encode('utf-8')).hexdigest()
+
+
+def _remember(key, until):
+    with _windows_lock:
+        if len(_windows) >= WINDOW_CACHE_SIZE:
+            now = time.time()
+            for stale in [k for k, v in _windows.items() if v <= now]:
+                del _windows[stale]
+            if len(_windows) >= WINDOW_CACHE_SIZE:
+                _windows.clear()
+        _windows[key] = until
+
+
+def acquire_reset_window(email):
+    """
+    Попытка открыть окно отправки письма сброса пароля для email
+    :param email: email из запроса
+    :return: True, если запрос нужно обработать; False, если в окне уже был такой запрос
+    """
+    window = current_app.config.get('PASSWORD_RESET_COALESCE_WINDOW', 0)
+    if not window:
+        return True
+
+    key = _make_key(email)
+    now = time.time()
+    with _windows_lock:
+        cached_until = _windows.get(key)
+    if cached_until and cached_until > now:
+        return False
+
+    now_dt = datetime.utcnow()
+    expires_at = now_dt + timedelta(seconds=window)
+    try:
+        # Продлеваем истекшее окно; условие в WHERE делает захват атомарным между воркерами
+        updated = PasswordResetThrottle.query.filter(
+            PasswordResetThrottle.key == key,
+            PasswordResetThrottle.expires_at <= now_dt
+        ).update({'expires_at': expires_at}, synchronize_session=False)
+        if not updated:
+            db.session.add(PasswordResetThrottle(key=key, expires_at=expires_at))
+        db.session.commit()
+    except IntegrityError:
+        # Окно уже открыто другим запросом
+        db.session.rollback()
+        existing = db.session.query(PasswordResetThrottle.expires_at).filter_by(key=key).scalar()
+        if existing:
+            _remember(key, now + (existing - now_dt).total_seconds())
+        return False
+
+    _remember(key, now + window)
+    return True
+
+
+def release_reset_window(email):
+    """
+    Закрытие окна (например, если письмо не удалось поставить в отправку)
+    :param email: email из запроса
+    """
+    key = _make_key(email)
+    with _windows_lock:
+        _windows.pop(key, None)
+    PasswordResetThrottle.query.filter_by(key=key).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def sweep_reset_windows(now=None):
+    """
+    Удаление истекших окон
+    :param now: момент времени (UTC), по умолчанию текущий
+    :return: количество удаленных записей
+    """
+    now = now or datetime.utcnow()
+    deleted = PasswordResetThrottle.query.filter(PasswordResetThrottle.expires_at < now).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
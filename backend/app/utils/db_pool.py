@@ -0,0 +1,191 @@
+"""
+Настройка и инструментирование пула соединений SQLAlchemy
+"""
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Опции, которые принимает только QueuePool
+QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_use_lifo')
+
+# Границы гистограммы ожидания соединения, миллисекунд
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolStats:
+    """Счетчики пула соединений одного engine (в пределах процесса)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.wait_count = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def record_wait(self, seconds, timed_out=False):
+        elapsed_ms = seconds * 1000
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+            for index, bound in enumerate(WAIT_BUCKETS_MS):
+                if elapsed_ms <= bound:
+                    self.wait_buckets[index] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+
+    def increment(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {f"le_{bound}ms": count for bound, count in zip(WAIT_BUCKETS_MS, self.wait_buckets)}
+            buckets['gt_{}ms'.format(WAIT_BUCKETS_MS[-1])] = self.wait_buckets[-1]
+            return {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'timeouts': self.timeouts,
+                'wait': {
+                    'count': self.wait_count,
+                    'total_ms': round(self.wait_total * 1000, 3),
+                    'avg_ms': round(self.wait_total * 1000 / self.wait_count, 3) if self.wait_count else 0.0,
+                    'max_ms': round(self.wait_max * 1000, 3),
+                    'buckets': buckets,
+                },
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, измеряющий время ожидания свободного соединения"""
+
+    stats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if self.stats is not None:
+                self.stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        if self.stats is not None:
+            self.stats.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() пересоздает пул - переносим статистику в новый экземпляр
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+# Статистика по engine: имя bind-а (None - основной) -> (engine, PoolStats)
+_engines = {}
+
+
+def prepare_engine_options(app):
+    """
+    Подготовка SQLALCHEMY_ENGINE_OPTIONS перед инициализацией Flask-SQLAlchemy:
+    опции QueuePool убираются для SQLite в памяти, для остальных БД включается
+    инструментированный пул; для psycopg 3 задается порог prepared statements
+    :param app: экземпляр Flask приложения
+    """
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI')
+    if uri:
+        url = make_url(uri)
+        if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+            for name in QUEUE_POOL_OPTIONS:
+                options.pop(name, None)
+        else:
+            options.setdefault('poolclass', InstrumentedQueuePool)
+        if url.get_backend_name() == 'postgresql' and url.get_driver_name() == 'psycopg':
+            # Серверные prepared statements psycopg 3: после N выполнений запрос готовится на сервере
+            threshold = app.config.get('SQLALCHEMY_PREPARE_THRESHOLD', '')
+            if threshold != '':
+                connect_args = dict(options.get('connect_args') or {})
+                connect_args.setdefault('prepare_threshold', None if threshold == 'off' else int(threshold))
+                options['connect_args'] = connect_args
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def instrument_engine(engine, name=None):
+    """
+    Подписка на события пула соединений engine
+    :param engine: экземпляр Engine
+    :param name: имя bind-а (None для основной БД)
+    """
+    stats = PoolStats()
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.stats = stats
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        stats.increment('connects')
+
+    @event.listens_for(engine, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.increment('checkouts')
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        stats.increment('checkins')
+
+    @event.listens_for(engine, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.increment('invalidations')
+
+    _engines[name] = (engine, stats)
+    return stats
+
+
+def get_pool_stats():
+    """
+    Текущее состояние пулов соединений процесса
+    :return: словарь со статистикой по каждому engine
+    """
+    result = {}
+    for name, (engine, stats) in _engines.items():
+        pool = engine.pool
+        state = {'pool_class': type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            state.update({
+                'size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+                'timeout': pool.timeout(),
+            })
+        state.update(stats.snapshot())
+        result[name or 'default'] = state
+    return {'pid': os.getpid(), 'engines': result}
+
+
+def dispose_engines(close=False):
+    """
+    Сброс пулов соединений всех engine-ов процесса (основная БД и реплики).
+    Вызывается в воркере после fork: соединения, открытые мастером при preload_app,
+    не должны использоваться сразу несколькими процессами
+    :param close: закрыть унаследованные соединения (False - только забыть их, не трогая сокеты родителя)
+    """
+    for engine, _ in _engines.values():
+        engine.dispose(close=close)
@@ -0,0 +1,143 @@
+"""
+Маршрутизация чтения на реплики БД
+"""
+import logging
+import random
+import threading
+import time
+from flask import current_app, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+
+logger = logging.getLogger(__name__)
+
+# HTTP-методы, запросы которых считаются только читающими
+READ_ONLY_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+# Отставание реплики PostgreSQL в секундах (0, если все полученное WAL уже применено)
+POSTGRES_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class ReplicaRouter:
+    """Набор engine-ов реплик с проверкой отставания"""
+
+    def __init__(self, uris, engine_options=None, max_lag=5.0, check_interval=5.0):
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.engines = [create_engine(uri, **(engine_options or {})) for uri in uris]
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def _measure_lag(self, engine):
+        if engine.dialect.name != 'postgresql':
+            # Для остальных СУБД (например, копия SQLite в тестах) отставание не измеряется
+            return 0.0
+        with engine.connect() as connection:
+            return float(connection.execute(POSTGRES_LAG_QUERY).scalar() or 0.0)
+
+    def is_healthy(self, engine):
+        """
+        Проверка отставания реплики (результат кэшируется на check_interval секунд)
+        :param engine: engine реплики
+        :return: True, если реплику можно использовать для чтения
+        """
+        now = time.monotonic()
+        checked_at, healthy = self._health.get(engine, (None, False))
+        if checked_at is not None and now - checked_at < self.check_interval:
+            return healthy
+
+        # Проверку выполняет один поток, остальные пользуются предыдущим результатом
+        if not self._lock.acquire(blocking=False):
+            return healthy
+        try:
+            try:
+                lag = self._measure_lag(engine)
+                healthy = lag <= self.max_lag
+                if not healthy:
+                    logger.warning(f"Реплика {engine.url.render_as_string(hide_password=True)} отстает на {lag:.1f} с")
+            except Exception as e:
+                healthy = False
+                logger.warning(f"Реплика {engine.url.render_as_string(hide_password=True)} недоступна: {str(e)}")
+            self._health[engine] = (now, healthy)
+            return healthy
+        finally:
+            self._lock.release()
+
+    def pick(self):
+        """
+        Выбор реплики для чтения
+        :return: engine реплики или None, если подходящих реплик нет
+        """
+        healthy = [engine for engine in self.engines if self.is_healthy(engine)]
+        return random.choice(healthy) if healthy else None
+
+    def dispose(self, close=True):
+        """Закрытие соединений всех реплик (например, после fork)"""
+        for engine in self.engines:
+            engine.dispose(close=close)
+
+
+class RoutingSession(Session):
+    """
+    Сессия, отправляющая чтение в запросах без побочных эффектов на реплику.
+
+    Запись, а также любое чтение после записи в рамках той же сессии
+    (read-your-writes), выполняются на основной БД.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get('read_only') and not self.info.get('wrote') and not self._flushing:
+            if clause is not None and getattr(clause, 'is_dml', False):
+                self.info['wrote'] = True
+            else:
+                engine = self.info.get('replica')
+                if engine is None:
+                    router = current_app.extensions.get('replica_router')
+                    engine = router.pick() if router else None
+                    # Все чтение запроса идет на одну реплику, чтобы видеть согласованные данные
+                    self.info['replica'] = engine or False
+                if engine:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_session_wrote(session, flush_context):
+    """После записи сессия до конца запроса читает только с основной БД"""
+    session.info['wrote'] = True
+
+
+def init_replica_routing(app, db):
+    """
+    Подключение реплик из SQLALCHEMY_REPLICA_URIS
+    :param app: экземпляр Flask приложения
+    :param db: экземпляр SQLAlchemy
+    """
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    if not uris:
+        return None
+
+    from app.utils.db_pool import instrument_engine
+
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    router = ReplicaRouter(
+        uris,
+        engine_options=options,
+        max_lag=app.config.get('REPLICA_MAX_LAG', 5.0),
+        check_interval=app.config.get('REPLICA_LAG_CHECK_INTERVAL', 5.0),
+    )
+    for index, engine in enumerate(router.engines):
+        instrument_engine(engine, f"replica_{index}")
+    app.extensions['replica_router'] = router
+
+    @app.before_request
+    def route_reads_to_replica():
+        """Запросы без побочных эффектов читают с реплики"""
+        if request.method in READ_ONLY_METHODS:
+            db.session.info['read_only'] = True
+
+    logger.info(f"Подключено реплик для чтения: {len(router.engines)}")
+    return router
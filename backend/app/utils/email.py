@@ -2,14 +2,12 @@
 Утилиты для отправки электронных писем
 """
 import base64
-import json
-import smtplib
+import hmac
+import struct
 import logging
 import hashlib
 import time
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from flask import current_app, url_for
 
 logger = logging.getLogger(__name__)
@@ -19,96 +17,105 @@ DEFAULT_SALT = "Secret_Salt"
 # Время жизни токена в секундах (24 часа по умолчанию)
 TOKEN_LIFETIME = 86400
 
-def generate_secure_key(user_id, timestamp=None, salt=None):
+# Формат токена: версия, ID пользователя, время выпуска, действие, одноразовый nonce
+TOKEN_VERSION = 1
+TOKEN_PAYLOAD = struct.Struct('>BIIB8s')
+# Длина усеченной подписи HMAC-SHA256 в байтах
+TOKEN_SIGNATURE_SIZE = 16
+
+TOKEN_ACTIONS = {
+    'set_password': 1,
+    'reset_password': 2,
+}
+TOKEN_ACTION_NAMES = {code: name for name, code in TOKEN_ACTIONS.items()}
+
+_signing_keys = {}
+
+def _get_signing_key():
     """
-    Генерирует защищенный ключ на основе ID пользователя, временной метки и соли
+    Возвращает ключ подписи токенов, производный от SECRET_KEY и TOKEN_SALT
     
-    Args:
-        user_id (int): ID пользователя
-        timestamp (int, optional): Временная метка (если не указана, используется текущее время)
-        salt (str, optional): Соль для хеширования (если не указана, используется DEFAULT_SALT)
-        
     Returns:
-        str: Защищенный ключ
+        bytes: Ключ HMAC
     """
-    if timestamp is None:
-        timestamp = int(time.time())
-    
-    if salt is None:
-        salt = current_app.config.get('TOKEN_SALT', DEFAULT_SALT)
-    
-    # Создаем строку для хеширования
-    data_to_hash = f"{user_id}:{timestamp}:{salt}"
-    
-    # Хешируем с использованием SHA-256
-    hash_obj = hashlib.sha256(data_to_hash.encode('utf-8'))
-    return hash_obj.hexdigest()
+    salt = current_app.config.get('TOKEN_SALT') or DEFAULT_SALT
+    secret = current_app.config.get('SECRET_KEY') or ''
+    cache_key = (salt, secret)
+    key = _signing_keys.get(cache_key)
+    if key is None:
+        key = hmac.new(salt.encode('utf-8'), secret.encode('utf-8'), hashlib.sha256).digest()
+        _signing_keys[cache_key] = key
+    return key
 
-def encode_token(data, include_timestamp=True):
+def _sign(payload):
+    return hmac.new(_get_signing_key(), payload, hashlib.sha256).digest()[:TOKEN_SIGNATURE_SIZE]
+
+def encode_token(user_id, action='reset_password', issued_at=None, nonce=None):
     """
-    Кодирует данные в base64 токен с защитой от подделки
+    Кодирует компактный подписанный токен для установки/сброса пароля
     
     Args:
-        data (dict): Словарь с данными для кодирования
-        include_timestamp (bool): Включать ли временную метку в токен
+        user_id (int): ID пользователя
+        action (str): Действие (set_password/reset_password)
+        issued_at (int, optional): Время выпуска (если не указано, используется текущее время)
+        nonce (bytes, optional): Одноразовый идентификатор токена (8 байт, по умолчанию случайный)
         
     Returns:
-        str: Закодированный base64 токен
+        str: URL-безопасный токен (base64url без выравнивания)
     """
-    # Добавляем временную метку, если требуется
-    if include_timestamp:
-        data['timestamp'] = int(time.time())
+    if issued_at is None:
+        issued_at = int(time.time())
+    if nonce is None:
+        nonce = os.urandom(8)
     
-    # Если в данных есть ID пользователя, добавляем защищенный ключ
-    if 'id' in data:
-        salt = current_app.config.get('TOKEN_SALT', DEFAULT_SALT)
-        data['key'] = generate_secure_key(data['id'], data.get('timestamp'), salt)
-    
-    json_str = json.dumps(data)
-    return base64.b64encode(json_str.encode('utf-8')).decode('utf-8')
+    payload = TOKEN_PAYLOAD.pack(TOKEN_VERSION, int(user_id), int(issued_at), TOKEN_ACTIONS[action], nonce)
+    return base64.urlsafe_b64encode(payload + _sign(payload)).rstrip(b'=').decode('ascii')
 
 def decode_token(token, verify_timestamp=True):
     """
-    Декодирует base64 токен в данные и проверяет его валидность
+    Декодирует токен и проверяет подпись и срок действия
     
     Args:
-        token (str): Закодированный base64 токен
+        token (str): Токен, выпущенный encode_token
         verify_timestamp (bool): Проверять ли срок действия токена
         
     Returns:
-        dict: Декодированные данные или None, если токен недействителен
+        dict: Данные токена (id, timestamp, expires_at, action, nonce) или None, если токен недействителен
     """
     try:
-        # Декодируем токен
-        json_str = base64.b64decode(token).decode('utf-8')
-        data = json.loads(json_str)
-        
-        # Проверяем наличие необходимых полей
-        if 'id' not in data or 'key' not in data:
-            logger.error("Токен не содержит необходимых полей (id, key)")
-            return None
-        
-        # Проверяем временную метку, если требуется
-        if verify_timestamp and 'timestamp' in data:
-            current_time = int(time.time())
-            token_time = data['timestamp']
-            token_lifetime = current_app.config.get('TOKEN_LIFETIME', TOKEN_LIFETIME)
-            
-            if current_time - token_time > token_lifetime:
-                logger.error(f"Срок действия токена истек. Создан: {token_time}, текущее время: {current_time}")
-                return None
-        
-        # Проверяем валидность ключа
-        if 'id' in data and 'key' in data and 'timestamp' in data:
-            expected_key = generate_secure_key(data['id'], data['timestamp'])
-            if data['key'] != expected_key:
-                logger.error("Недействительный ключ в токене")
-                return None
-        
-        return data
-    except Exception as e:
-        logger.error(f"Ошибка декодирования токена: {str(e)}")
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    except (ValueError, TypeError):
+        logger.error("Ошибка декодирования токена: некорректная кодировка")
+        return None
+    
+    if len(raw) != TOKEN_PAYLOAD.size + TOKEN_SIGNATURE_SIZE:
+        logger.error("Ошибка декодирования токена: некорректная длина")
+        return None
+    
+    payload, signature = raw[:TOKEN_PAYLOAD.size], raw[TOKEN_PAYLOAD.size:]
+    if not hmac.compare_digest(signature, _sign(payload)):
+        logger.error("Недействительная подпись токена")
+        return None
+    
+    version, user_id, issued_at, action, nonce = TOKEN_PAYLOAD.unpack(payload)
+    if version != TOKEN_VERSION or action not in TOKEN_ACTION_NAMES:
+        logger.error(f"Неподдерживаемый формат токена (версия {version}, действие {action})")
         return None
+    
+    token_lifetime = current_app.config.get('TOKEN_LIFETIME', TOKEN_LIFETIME)
+    if verify_timestamp:
+        current_time = int(time.time())
+        if current_time - issued_at > token_lifetime:
+            logger.error(f"Срок действия токена истек. Создан: {issued_at}, текущее время: {current_time}")
+            return None
+    
+    return {
+        'id': user_id,
+        'timestamp': issued_at,
+        'expires_at': issued_at + token_lifetime,
+        'action': TOKEN_ACTION_NAMES[action],
+        'nonce': nonce.hex()
+    }
 
 def send_email(to_email, subject, html_content, text_content=None, max_retries=1):
     """
@@ -132,6 +139,7 @@ def send_email(to_email, subject, html_content, text_content=None, max_retries=1
         smtp_password = current_app.config.get('SMTP_PASSWORD')
         sender_email = current_app.config.get('SENDER_EMAIL', smtp_username)
         smtp_timeout = current_app.config.get('SMTP_TIMEOUT', 10)  # Увеличенный таймаут
+        smtp_use_tls = current_app.config.get('SMTP_USE_TLS', True)
         enable_email = current_app.config.get('ENABLE_EMAIL', True)
         
         # Проверяем наличие настроек SMTP
@@ -144,6 +152,11 @@ def send_email(to_email, subject, html_content, text_content=None, max_retries=1
             logger.info(f"Отправка писем отключена. Письмо на {to_email} не отправлено.")
             return True  # Возвращаем True, чтобы не блокировать процесс
         
+        # smtplib и email.mime нужны только при отправке - не загружаются при старте воркера
+        import smtplib
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+        
         # Создаем сообщение
         msg = MIMEMultipart('alternative')
         msg['Subject'] = subject
@@ -157,6 +170,11 @@ def send_email(to_email, subject, html_content, text_content=None, max_retries=1
         # Добавляем HTML версию
         msg.attach(MIMEText(html_content, 'html'))
         
+        # Асинхронный транспорт: общий цикл событий и пул SMTP-соединений процесса
+        if current_app.config.get('MAIL_TRANSPORT', 'thread') == 'asyncio':
+            from app.utils.mail_transport import get_mail_transport
+            return get_mail_transport(current_app.config).submit(msg, max_retries) is not None
+        
         # Для асинхронной отправки писем в фоновом режиме
         # Это предотвратит блокировку API запросов
         import threading
@@ -175,7 +193,8 @@ def send_email(to_email, subject, html_content, text_content=None, max_retries=1
                                 server.send_message(msg)
                         else:
                             with smtplib.SMTP(smtp_server, smtp_port, timeout=smtp_timeout) as server:
-                                server.starttls()
+                                if smtp_use_tls:
+                                    server.starttls()
                                 server.login(smtp_username, smtp_password)
                                 server.send_message(msg)
                         
@@ -223,25 +242,7 @@ def send_password_set_email(user_email, user_name, user_id, is_reset=False, cust
     """
     # Создаем токен, если он не предоставлен
     if not custom_token:
-        # Создаем временную метку
-        timestamp = int(time.time())
-        
-        # Получаем соль из конфигурации
-        salt = current_app.config.get('TOKEN_SALT', DEFAULT_SALT)
-        
-        # Генерируем защищенный ключ
-        secure_key = generate_secure_key(user_id, timestamp, salt)
-        
-        # Формируем данные токена
-        token_data = {
-            'id': int(user_id),
-            'timestamp': timestamp,
-            'key': secure_key,
-            'action': 'reset_password' if is_reset else 'set_password'
-        }
-        
-        # Кодируем токен без добавления timestamp, так как мы уже его добавили
-        token = encode_token(token_data, include_timestamp=False)
+        token = encode_token(user_id, 'reset_password' if is_reset else 'set_password')
     else:
         token = custom_token
     
@@ -0,0 +1,43 @@
+"""
+Поддержка кооперативной многозадачности gevent для драйверов БД
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def gevent_wait_callback(conn, timeout=None):
+    """
+    Ожидание готовности соединения psycopg2 через хаб gevent вместо блокирующего вызова
+    :param conn: соединение psycopg2
+    :param timeout: таймаут ожидания, секунд
+    """
+    from gevent.socket import wait_read, wait_write
+    from psycopg2 import extensions, OperationalError
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise OperationalError(f"Неожиданное состояние соединения: {state!r}")
+
+
+def install_green_drivers():
+    """
+    Подключение драйверов БД к циклу gevent (после monkey.patch_all()).
+    psycopg2 работает с сокетом из C-кода, поэтому ожидание переводится на wait callback;
+    psycopg 3 ждет ввода-вывода через пропатченные select/selectors и настройки не требует
+    :return: True, если wait callback psycopg2 установлен
+    """
+    try:
+        from psycopg2 import extensions
+    except ImportError:
+        return False
+    extensions.set_wait_callback(gevent_wait_callback)
+    logger.info("Для psycopg2 установлен wait callback gevent")
+    return True
@@ -0,0 +1,268 @@
+"""
+Логирование без ввода-вывода в потоке запроса: QueueHandler на корневом логгере
+и QueueListener (отдельный поток процесса), который пишет в файл и stderr.
+
+Записи получают ID запроса (заголовок X-Request-ID или сгенерированный), выводятся
+в JSON или текстом; для шумных логгеров действуют выборка и ограничение частоты
+(записи уровня WARNING и выше проходят всегда).
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+
+# Заголовок с ID запроса (принимается от прокси и возвращается клиенту)
+REQUEST_ID_HEADER = 'X-Request-ID'
+# Допустимый ID запроса от клиента; иначе генерируется новый
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+
+# Атрибуты LogRecord, не попадающие в JSON как дополнительные поля
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class RequestIdFilter(logging.Filter):
+    """Добавление ID текущего запроса в запись (выполняется в потоке, создавшем запись)"""
+
+    def filter(self, record):
+        record.request_id = (g.get('request_id') if has_request_context() else None) or '-'
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Выборка и ограничение частоты записей DEBUG/INFO по логгерам.
+
+    sample_rates - доля сохраняемых записей по префиксу имени логгера ({'sqlalchemy': 0.1});
+    rate/burst - token bucket на каждый логгер: не больше rate записей в секунду с запасом burst.
+    Количество отброшенных записей сообщается в поле suppressed следующей пропущенной записи.
+    """
+
+    def __init__(self, rate=0, burst=0, sample_rates=None):
+        super().__init__()
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.sample_rates = sample_rates or {}
+        self._rates_by_logger = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _sample_rate(self, name):
+        rate = self._rates_by_logger.get(name)
+        if rate is None:
+            rate = 1.0
+            # Самый длинный подходящий префикс по иерархии логгеров
+            for prefix in sorted(self.sample_rates, key=len, reverse=True):
+                if name == prefix or name.startswith(prefix + '.'):
+                    rate = self.sample_rates[prefix]
+                    break
+            self._rates_by_logger[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        sample_rate = self._sample_rate(record.name)
+        if sample_rate < 1.0 and random.random() >= sample_rate:
+            return False
+        if not self.rate:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                bucket = self._buckets[record.name] = [float(self.burst), now, 0]
+            tokens = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                bucket[2] += 1
+                return False
+            bucket[0] = tokens - 1
+            suppressed, bucket[2] = bucket[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - один JSON-объект в строке"""
+
+    def format(self, record):
+        data = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', '-'),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        # Поля из extra={...}
+        for name, value in record.__dict__.items():
+            if name not in _RECORD_ATTRIBUTES and name not in data and name != 'request_id':
+                data[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler, который не блокирует и не пишет в stderr при переполнении очереди"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Сообщение собирается в потоке запроса (аргументы могут измениться позже),
+        # трассировка сохраняется отдельно для форматтера слушателя
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+# Состояние логирования процесса
+_state = {'listener': None, 'handler': None, 'settings': None}
+_state_lock = threading.Lock()
+
+
+def _parse_sample_rates(value):
+    """LOG_SAMPLE_RATES: 'логгер:доля,...' -> словарь"""
+    rates = {}
+    for item in (value or '').split(','):
+        name, _, rate = item.strip().rpartition(':')
+        if name and rate:
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def _start(settings):
+    """Создание очереди, обработчиков и потока слушателя для текущего процесса"""
+    level = logging.getLevelName(str(settings['level']).upper())
+    if not isinstance(level, int):
+        level = logging.INFO
+
+    formatter = JsonFormatter() if settings['format'] == 'json' else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if settings['file']:
+        directory = os.path.dirname(settings['file'])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handlers.append(logging.FileHandler(settings['file'], encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(settings['queue_size'])
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(RateLimitFilter(settings['rate_limit'], settings['rate_burst'], settings['sample_rates']))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _state.update(listener=listener, handler=queue_handler, settings=settings)
+
+
+def _stop():
+    """Остановка слушателя с записью оставшихся в очереди сообщений"""
+    listener = _state['listener']
+    if listener is not None:
+        _state['listener'] = None
+        try:
+            listener.stop()
+        finally:
+            for handler in listener.handlers:
+                handler.close()
+
+
+def _restart_after_fork():
+    # Поток слушателя не переживает fork: воркер получает собственную очередь и поток.
+    # Унаследованные обработчики закрываются без stop(): join мертвого потока завис бы
+    if _state['settings'] is not None:
+        listener, _state['listener'] = _state['listener'], None
+        if listener is not None:
+            for handler in listener.handlers:
+                handler.close()
+        _start(_state['settings'])
+
+
+def configure_logging(config):
+    """
+    Настройка логирования процесса по конфигурации приложения
+    :param config: конфигурация Flask приложения (или словарь с LOG_*)
+    """
+    settings = {
+        'level': config.get('LOG_LEVEL', 'INFO'),
+        'file': config.get('LOG_FILE', 'logs/app.log'),
+        'format': str(config.get('LOG_FORMAT', 'json')).lower(),
+        'queue_size': int(config.get('LOG_QUEUE_SIZE', 10000)),
+        'rate_limit': float(config.get('LOG_RATE_LIMIT', 0) or 0),
+        'rate_burst': int(config.get('LOG_RATE_BURST', 0) or 0),
+        'sample_rates': _parse_sample_rates(config.get('LOG_SAMPLE_RATES', '')),
+    }
+    with _state_lock:
+        _stop()
+        _start(settings)
+
+
+def get_dropped_count():
+    """
+    Количество записей, отброшенных из-за переполнения очереди
+    :return: число записей
+    """
+    handler = _state['handler']
+    return handler.dropped if handler is not None else 0
+
+
+def init_request_id(app):
+    """
+    ID запроса: берется из X-Request-ID (если допустим) или генерируется,
+    сохраняется в g.request_id и возвращается в заголовке ответа
+    :param app: экземпляр Flask приложения
+    """
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+
+    @app.after_request
+    def expose_request_id(response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        return response
+
+
+atexit.register(_stop)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
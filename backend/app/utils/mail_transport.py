@@ -0,0 +1,389 @@
+"""
+Асинхронный SMTP-транспорт: один цикл событий asyncio на процесс и пул SMTP-соединений
+
+Синхронный код Flask ставит письма в очередь через `asyncio.run_coroutine_threadsafe`,
+поэтому каждое письмо в пути стоит корутину, а не поток ОС. Если установлен aiosmtplib,
+используется он, иначе - встроенный минимальный клиент (EHLO/STARTTLS/AUTH/MAIL/RCPT/DATA;
+STARTTLS в нем требует Python 3.11+).
+"""
+import asyncio
+import base64
+import logging
+import os
+import re
+import ssl
+import sys
+import threading
+import time
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+try:
+    import aiosmtplib
+except ImportError:  # pragma: no cover - зависит от окружения
+    aiosmtplib = None
+
+
+class SMTPReplyError(Exception):
+    """Неожиданный ответ SMTP-сервера"""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.message = message
+
+
+class MinimalAsyncSMTP:
+    """Минимальный асинхронный SMTP-клиент поверх asyncio streams"""
+
+    def __init__(self, hostname, port, use_ssl=False, start_tls=False, timeout=10, local_hostname=None):
+        self.hostname = hostname
+        self.port = port
+        self.use_ssl = use_ssl
+        self.start_tls = start_tls
+        self.timeout = timeout
+        self.local_hostname = local_hostname or 'localhost'
+        self.extensions = {}
+        self.reader = None
+        self.writer = None
+
+    @property
+    def is_connected(self):
+        return self.writer is not None and not self.writer.is_closing()
+
+    async def _read_reply(self):
+        lines = []
+        while True:
+            line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+            if not line:
+                raise ConnectionError('SMTP-сервер закрыл соединение')
+            line = line.decode('utf-8', errors='replace').rstrip('\r\n')
+            lines.append(line[4:])
+            if line[3:4] != '-':
+                return int(line[:3]), '\n'.join(lines)
+
+    async def _command(self, line, *expected):
+        self.writer.write(line.encode('utf-8') + b'\r\n')
+        await self.writer.drain()
+        code, message = await self._read_reply()
+        if expected and code not in expected:
+            raise SMTPReplyError(code, message)
+        return code, message
+
+    async def _ehlo(self):
+        _, message = await self._command(f"EHLO {self.local_hostname}", 250)
+        self.extensions = {}
+        for line in message.split('\n')[1:]:
+            name, _, params = line.partition(' ')
+            self.extensions[name.lower()] = params
+
+    async def connect(self):
+        ssl_context = ssl.create_default_context() if self.use_ssl else None
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.hostname, self.port, ssl=ssl_context),
+            self.timeout
+        )
+        code, message = await self._read_reply()
+        if code != 220:
+            raise SMTPReplyError(code, message)
+        await self._ehlo()
+        if self.start_tls:
+            if 'starttls' not in self.extensions:
+                raise SMTPReplyError(502, 'Сервер не поддерживает STARTTLS')
+            await self._command('STARTTLS', 220)
+            await self.writer.start_tls(ssl.create_default_context(), server_hostname=self.hostname)
+            await self._ehlo()
+
+    async def login(self, username, password):
+        mechanisms = self.extensions.get('auth', '').upper().split()
+        if 'PLAIN' in mechanisms or not mechanisms:
+            credentials = base64.b64encode(f"\0{username}\0{password}".encode('utf-8')).decode('ascii')
+            await self._command(f"AUTH PLAIN {credentials}", 235)
+        else:
+            await self._command('AUTH LOGIN', 334)
+            await self._command(base64.b64encode(username.encode('utf-8')).decode('ascii'), 334)
+            await self._command(base64.b64encode(password.encode('utf-8')).decode('ascii'), 235)
+
+    async def send_message(self, msg):
+        recipients = []
+        for header in ('To', 'Cc'):
+            for value in msg.get_all(header) or []:
+                recipients.extend(addr.strip() for addr in value.split(',') if addr.strip())
+        await self._command(f"MAIL FROM:<{msg['From']}>", 250)
+        for rcpt in recipients:
+            await self._command(f"RCPT TO:<{rcpt}>", 250, 251)
+        await self._command('DATA', 354)
+
+        data = msg.as_bytes(policy=msg.policy.clone(linesep='\r\n'))
+        data = re.sub(rb'(?m)^\.', b'..', data)
+        if not data.endswith(b'\r\n'):
+            data += b'\r\n'
+        self.writer.write(data + b'.\r\n')
+        await self.writer.drain()
+        code, message = await self._read_reply()
+        if code != 250:
+            raise SMTPReplyError(code, message)
+
+    async def reset(self):
+        await self._command('RSET', 250)
+
+    async def quit(self):
+        try:
+            if self.is_connected:
+                await self._command('QUIT')
+        except Exception:
+            pass
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+            self.writer = None
+
+
+class AioSMTPLibClient:
+    """Адаптер aiosmtplib к интерфейсу MinimalAsyncSMTP"""
+
+    def __init__(self, hostname, port, use_ssl=False, start_tls=False, timeout=10):
+        self._client = aiosmtplib.SMTP(
+            hostname=hostname, port=port, use_tls=use_ssl,
+            start_tls=start_tls, timeout=timeout
+        )
+
+    @property
+    def is_connected(self):
+        return self._client.is_connected
+
+    async def connect(self):
+        await self._client.connect()
+
+    async def login(self, username, password):
+        await self._client.login(username, password)
+
+    async def send_message(self, msg):
+        await self._client.send_message(msg)
+
+    async def reset(self):
+        await self._client.rset()
+
+    async def quit(self):
+        try:
+            await self._client.quit()
+        except Exception:
+            self._client.close()
+
+
+class AsyncMailTransport:
+    """
+    Транспорт писем с собственным циклом событий в фоновом потоке.
+
+    Одновременно ведется не более `pool_size` SMTP-сессий; соединения
+    переиспользуются между письмами и закрываются после `idle_timeout` простоя.
+    """
+
+    def __init__(self, hostname, port, username, password, use_ssl=False, start_tls=False,
+                 timeout=10, pool_size=4, idle_timeout=30, max_pending=10000):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.start_tls = start_tls
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.max_pending = max_pending
+        if start_tls and aiosmtplib is None and sys.version_info < (3, 11):
+            # StreamWriter.start_tls встроенного клиента появился в Python 3.11
+            raise ValueError(
+                "STARTTLS в MAIL_TRANSPORT=asyncio требует aiosmtplib или Python 3.11+: "
+                "установите aiosmtplib, используйте порт 465 или MAIL_TRANSPORT=thread"
+            )
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._loop = None
+        self._thread = None
+        self._idle = None
+        self._slots = None
+        self._pending = 0
+
+    @property
+    def pending(self):
+        """Число писем, поставленных в очередь и еще не обработанных"""
+        return self._pending
+
+    def _ensure_loop(self):
+        # После fork поток цикла событий не наследуется - создаем новый
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._pending = 0
+                self._idle = None
+                self._slots = None
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='mail-transport', daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    def _new_client(self):
+        if aiosmtplib is not None:
+            return AioSMTPLibClient(self.hostname, self.port, self.use_ssl, self.start_tls, self.timeout)
+        return MinimalAsyncSMTP(self.hostname, self.port, self.use_ssl, self.start_tls, self.timeout)
+
+    async def _acquire(self):
+        """Получение соединения из пула или установка нового"""
+        while self._idle:
+            client, released_at = self._idle.pop()
+            if client.is_connected and time.monotonic() - released_at < self.idle_timeout:
+                return client, True
+            await client.quit()
+        return await self._acquire_fresh()
+
+    async def _acquire_fresh(self):
+        client = self._new_client()
+        try:
+            await client.connect()
+            await client.login(self.username, self.password)
+        except Exception:
+            await client.quit()
+            raise
+        return client, False
+
+    async def _deliver(self, msg):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+            self._idle = []
+        async with self._slots:
+            client, reused = await self._acquire()
+            try:
+                await client.send_message(msg)
+            except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+                await client.quit()
+                if not reused:
+                    raise
+                # Соединение из пула могло быть закрыто сервером по простою
+                logger.debug(f"Повторная отправка через новое соединение: {str(e)}")
+                client, _ = await self._acquire_fresh()
+                try:
+                    await client.send_message(msg)
+                except Exception:
+                    await client.quit()
+                    raise
+            except Exception:
+                await client.quit()
+                raise
+            try:
+                await client.reset()
+                self._idle.append((client, time.monotonic()))
+            except Exception:
+                await client.quit()
+
+    async def _send(self, msg, max_retries):
+        to_email = msg['To']
+        try:
+            for attempt in range(max_retries):
+                try:
+                    await self._deliver(msg)
+                    logger.info(f"Письмо успешно отправлено на {to_email}")
+                    return True
+                except Exception as e:
+                    logger.warning(f"Попытка {attempt+1}/{max_retries} отправки письма не удалась: {str(e)}")
+                    if attempt == max_retries - 1:
+                        logger.error(f"Не удалось отправить письмо после {max_retries} попыток: {str(e)}")
+                        return False
+                    await asyncio.sleep(1)
+            return False
+        finally:
+            with self._lock:
+                self._pending -= 1
+                metrics.set_gauge('smtp_pending', self._pending)
+
+    async def _drain(self, timeout):
+        """Ожидание обработки писем из очереди и закрытие свободных соединений"""
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        while self._idle:
+            client, _ = self._idle.pop()
+            await client.quit()
+
+    def close(self, timeout=30):
+        """
+        Остановка транспорта: письма из очереди отправляются (не дольше timeout секунд),
+        соединения закрываются, поток цикла событий завершается
+        :param timeout: максимальное время ожидания очереди, секунд
+        """
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or self._pid != os.getpid():
+                return
+            self._loop = None
+        try:
+            asyncio.run_coroutine_threadsafe(self._drain(timeout), loop).result(timeout + 5)
+        except Exception as e:
+            logger.warning(f"Очередь писем не обработана до остановки транспорта: {str(e)}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        if not thread.is_alive():
+            loop.close()
+
+    def submit(self, msg, max_retries=1):
+        """
+        Постановка письма в очередь отправки
+        :param msg: email.message.Message с заполненными From/To
+        :param max_retries: максимальное количество попыток
+        :return: concurrent.futures.Future с результатом (True/False) или None при переполнении
+        """
+        loop = self._ensure_loop()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                logger.error(f"Очередь отправки писем переполнена ({self._pending}), письмо на {msg['To']} отброшено")
+                return None
+            self._pending += 1
+            metrics.set_gauge('smtp_pending', self._pending)
+        return asyncio.run_coroutine_threadsafe(self._send(msg, max_retries), loop)
+
+
+_transport = None
+_transport_key = None
+_transport_lock = threading.Lock()
+
+
+def get_mail_transport(config):
+    """
+    Получение асинхронного транспорта процесса для текущих настроек SMTP. При изменении
+    настроек прежний транспорт останавливается в фоне после отправки своей очереди
+    :param config: конфигурация Flask приложения
+    :return: экземпляр AsyncMailTransport
+    """
+    global _transport, _transport_key
+    port = config.get('SMTP_PORT')
+    key = (
+        config.get('SMTP_SERVER'), port, config.get('SMTP_USERNAME'), config.get('SMTP_PASSWORD'),
+        config.get('SMTP_USE_TLS', True), config.get('SMTP_TIMEOUT', 10), config.get('SMTP_POOL_SIZE', 4),
+        config.get('SMTP_POOL_IDLE_TIMEOUT', 30), config.get('SMTP_MAX_PENDING', 10000),
+    )
+    if _transport is not None and _transport_key == key:
+        return _transport
+    with _transport_lock:
+        if _transport is None or _transport_key != key:
+            if _transport is not None:
+                threading.Thread(target=_transport.close, name='mail-transport-close', daemon=True).start()
+            _transport = AsyncMailTransport(
+                hostname=config.get('SMTP_SERVER'),
+                port=port,
+                username=config.get('SMTP_USERNAME'),
+                password=config.get('SMTP_PASSWORD'),
+                use_ssl=port == 465,
+                start_tls=port != 465 and config.get('SMTP_USE_TLS', True),
+                timeout=config.get('SMTP_TIMEOUT', 10),
+                pool_size=config.get('SMTP_POOL_SIZE', 4),
+                idle_timeout=config.get('SMTP_POOL_IDLE_TIMEOUT', 30),
+                max_pending=config.get('SMTP_MAX_PENDING', 10000),
+            )
+            _transport_key = key
+    return _transport
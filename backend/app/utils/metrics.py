@@ -0,0 +1,509 @@
+"""
+Метрики Prometheus (/metrics), общие для всех воркеров сервера.
+
+Если установлен prometheus_client, используется его multiprocess-режим: каталог METRICS_DIR
+передается как PROMETHEUS_MULTIPROC_DIR. Без библиотеки работает встроенный формат: каждый
+процесс пишет значения в собственные mmap-файлы каталога, а /metrics суммирует файлы всех
+процессов. Без METRICS_DIR значения хранятся в памяти процесса (один процесс, разработка).
+
+Каталог очищается мастер-процессом при запуске сервера (clear_metrics_dir), значения
+датчиков завершившегося воркера удаляются хуком child_exit (mark_process_dead).
+"""
+import glob
+import hmac
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, g, request
+from app.utils.query_counter import get_request_stats, install_query_listeners
+
+# Тип содержимого текстового формата Prometheus
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+QUERY_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+UA_PARSE_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+# Метрики сервиса: ключ -> (тип, имя, описание, метки, параметры)
+METRICS = {
+    'http_duration': ('histogram', 'app_http_request_duration_seconds',
+                      'Время обработки HTTP-запроса', ('method', 'route'), {'buckets': LATENCY_BUCKETS}),
+    'http_requests': ('counter', 'app_http_requests',
+                      'HTTP-запросы по маршрутам и кодам ответа', ('method', 'route', 'status'), {}),
+    'db_queries': ('histogram', 'app_db_queries_per_request',
+                   'Количество SQL-запросов за HTTP-запрос', ('route',), {'buckets': QUERY_COUNT_BUCKETS}),
+    'db_time': ('histogram', 'app_db_time_per_request_seconds',
+                'Суммарное время SQL-запросов за HTTP-запрос', ('route',), {'buckets': QUERY_TIME_BUCKETS}),
+    'password_hash': ('histogram', 'app_password_hash_seconds',
+                      'Время вычисления хеша пароля', ('operation',), {'buckets': HASH_BUCKETS}),
+    'user_agent_parse': ('histogram', 'app_user_agent_parse_seconds',
+                         'Время разбора User-Agent при создании сессии', (), {'buckets': UA_PARSE_BUCKETS}),
+    'smtp_pending': ('gauge', 'app_smtp_queue_pending',
+                     'Писем в очереди асинхронной отправки', (), {}),
+    'sessions_created': ('counter', 'app_user_sessions_created',
+                         'Созданные записи сессий пользователей', (), {}),
+}
+
+# Маршрут для запросов, не сопоставленных ни с одним правилом (без URL в метке)
+UNMATCHED_ROUTE = 'unmatched'
+
+# Метрики процесса (None - метрики отключены или не инициализированы)
+_state = {'metrics': None, 'render': None, 'directory': None}
+_state_lock = threading.Lock()
+
+
+class _Store:
+    """Значения процесса в памяти"""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = float(value)
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+
+class _MmapStore(_Store):
+    """
+    Значения процесса в mmap-файле: заголовок [занято байт u32][резерв u32], затем записи
+    [длина ключа u32][ключ UTF-8 с выравниванием до 8 байт][значение f64]
+    """
+
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path):
+        super().__init__()
+        self._file = open(path, 'a+b')
+        size = os.fstat(self._file.fileno()).st_size
+        if size == 0:
+            size = self.INITIAL_SIZE
+            self._file.truncate(size)
+        self._capacity = size
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self._positions = {}
+        self._used = struct.unpack_from('i', self._map, 0)[0] or 8
+        for key, _, position in _parse_entries(self._map, self._used):
+            self._positions[key] = position
+
+    def _position(self, key):
+        position = self._positions.get(key)
+        if position is None:
+            encoded = key.encode('utf-8')
+            padded = encoded + b' ' * (8 - (len(encoded) + 4) % 8)
+            needed = 4 + len(padded) + 8
+            while self._used + needed > self._capacity:
+                self._capacity *= 2
+                self._file.truncate(self._capacity)
+                self._map = mmap.mmap(self._file.fileno(), self._capacity)
+            struct.pack_into(f'i{len(padded)}sd', self._map, self._used, len(encoded), padded, 0.0)
+            self._used += needed
+            # Читатели видят запись только после обновления заголовка
+            struct.pack_into('i', self._map, 0, self._used)
+            position = self._positions[key] = self._used - 8
+        return position
+
+    def inc(self, key, amount):
+        with self._lock:
+            position = self._position(key)
+            value = struct.unpack_from('d', self._map, position)[0]
+            struct.pack_into('d', self._map, position, value + amount)
+
+    def set(self, key, value):
+        with self._lock:
+            struct.pack_into('d', self._map, self._position(key), float(value))
+
+
+def _parse_entries(data, used):
+    """Записи mmap-файла: (ключ, значение, смещение значения)"""
+    position = 8
+    while position < used:
+        length = struct.unpack_from('i', data, position)[0]
+        key = bytes(data[position + 4:position + 4 + length]).decode('utf-8')
+        position += 4 + length + (8 - (length + 4) % 8)
+        yield key, struct.unpack_from('d', data, position)[0], position
+        position += 8
+
+
+def _read_file(path):
+    """Значения mmap-файла другого процесса"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < 8:
+        return []
+    used = min(struct.unpack_from('i', data, 0)[0], len(data))
+    return [(key, value) for key, value, _ in _parse_entries(data, used)]
+
+
+class _ProcessStores:
+    """Хранилища текущего процесса: счетчики и датчики (после fork создаются заново)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._stores = {}
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self, kind):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    self._stores = {}
+                    self._pid = pid
+        store = self._stores.get(kind)
+        if store is None:
+            with self._lock:
+                store = self._stores.get(kind)
+                if store is None:
+                    if self.directory:
+                        store = _MmapStore(os.path.join(self.directory, f'{kind}_{pid}.db'))
+                    else:
+                        store = _Store()
+                    self._stores[kind] = store
+        return store
+
+    def collect(self):
+        """Сумма значений всех процессов по ключам"""
+        totals = {}
+        if self.directory:
+            values = []
+            for path in glob.glob(os.path.join(self.directory, '*.db')):
+                try:
+                    values.extend(_read_file(path))
+                except (OSError, struct.error, UnicodeDecodeError):
+                    # Файл удален или дописывается в момент чтения
+                    continue
+        else:
+            values = [item for store in list(self._stores.values()) for item in store.items()]
+        for key, value in values:
+            totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+
+def _key(name, labels):
+    return json.dumps([name, labels], sort_keys=True, ensure_ascii=False)
+
+
+class _Metric:
+    """Метрика встроенного формата с интерфейсом prometheus_client (labels, inc, observe, set)"""
+
+    type = None
+    store_kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=(), stores=None, **options):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.options = options
+        self._stores = stores
+        self._labels = {}
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        values = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = type(self)(self.name, self.documentation, (), self._stores, **self.options)
+                    child._labels = dict(zip(self.labelnames, values))
+                    self._children[values] = child
+        return child
+
+    def _store(self):
+        return self._stores.get(self.store_kind)
+
+
+class _Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1):
+        self._store().inc(_key(self.name + '_total', self._labels), amount)
+
+
+class _Gauge(_Metric):
+    type = 'gauge'
+    store_kind = 'gauge'
+
+    def set(self, value):
+        self._store().set(_key(self.name, self._labels), value)
+
+
+class _Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), stores=None, buckets=LATENCY_BUCKETS, **options):
+        super().__init__(name, documentation, labelnames, stores, buckets=tuple(buckets), **options)
+        self._keys = None
+
+    def observe(self, value):
+        if self._keys is None:
+            bounds = [repr(float(bound)) for bound in self.options['buckets']] + ['+Inf']
+            self._keys = (
+                [_key(self.name + '_bucket', {**self._labels, 'le': bound}) for bound in bounds],
+                _key(self.name + '_sum', self._labels),
+                _key(self.name + '_count', self._labels),
+            )
+        bucket_keys, sum_key, count_key = self._keys
+        store = self._store()
+        # Хранится счетчик одного интервала; накопительные значения считаются при выводе
+        for bound, bucket_key in zip(self.options['buckets'], bucket_keys):
+            if value <= bound:
+                store.inc(bucket_key, 1)
+                break
+        else:
+            store.inc(bucket_keys[-1], 1)
+        store.inc(sum_key, value)
+        store.inc(count_key, 1)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_sample(name, labels, value):
+    if labels:
+        rendered = ','.join(f'{label}="{_escape(str(labels[label]))}"' for label in labels)
+        return f'{name}{{{rendered}}} {value!r}'
+    return f'{name} {value!r}'
+
+
+def _render_builtin(metrics, stores):
+    """Текстовый формат Prometheus по значениям всех процессов"""
+    samples = {}
+    for key, value in stores.collect().items():
+        name, labels = json.loads(key)
+        samples.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for metric in metrics.values():
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        if metric.type == 'counter':
+            for labels, value in sorted(samples.get(metric.name + '_total', []), key=lambda s: sorted(s[0].items())):
+                lines.append(_format_sample(metric.name + '_total', labels, value))
+        elif metric.type == 'gauge':
+            for labels, value in samples.get(metric.name, []):
+                lines.append(_format_sample(metric.name, labels, value))
+        else:
+            bounds = [repr(float(bound)) for bound in metric.options['buckets']] + ['+Inf']
+            series = {}
+            for labels, value in samples.get(metric.name + '_bucket', []):
+                le = labels.pop('le')
+                series.setdefault(tuple(sorted(labels.items())), {})[le] = value
+            sums = {tuple(sorted(labels.items())): value for labels, value in samples.get(metric.name + '_sum', [])}
+            counts = {tuple(sorted(labels.items())): value for labels, value in samples.get(metric.name + '_count', [])}
+            for label_items in sorted(series):
+                labels = dict(label_items)
+                cumulative = 0.0
+                for bound in bounds:
+                    cumulative += series[label_items].get(bound, 0.0)
+                    lines.append(_format_sample(metric.name + '_bucket', {**labels, 'le': bound}, cumulative))
+                lines.append(_format_sample(metric.name + '_sum', labels, sums.get(label_items, 0.0)))
+                lines.append(_format_sample(metric.name + '_count', labels, counts.get(label_items, 0.0)))
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _create_metrics(directory):
+    """
+    Создание метрик процесса
+    :param directory: каталог значений процессов (пусто - в памяти)
+    :return: (словарь метрик, функция вывода в текстовом формате)
+    """
+    try:
+        if directory:
+            # Значение читается при первом импорте prometheus_client
+            os.environ['PROMETHEUS_MULTIPROC_DIR'] = directory
+        import prometheus_client
+    except ImportError:
+        prometheus_client = None
+
+    metrics = {}
+    if prometheus_client is not None:
+        from prometheus_client import multiprocess
+
+        classes = {'counter': prometheus_client.Counter, 'histogram': prometheus_client.Histogram,
+                   'gauge': prometheus_client.Gauge}
+        for key, (kind, name, documentation, labelnames, options) in METRICS.items():
+            if kind == 'gauge':
+                # Сумма по работающим процессам; значения завершившихся удаляет mark_process_dead
+                options = {**options, 'multiprocess_mode': 'livesum'}
+            metrics[key] = classes[kind](name, documentation, labelnames, **options)
+
+        def render():
+            if directory:
+                registry = prometheus_client.CollectorRegistry()
+                multiprocess.MultiProcessCollector(registry, path=directory)
+            else:
+                registry = prometheus_client.REGISTRY
+            return prometheus_client.generate_latest(registry)
+        return metrics, render
+
+    stores = _ProcessStores(directory)
+    classes = {'counter': _Counter, 'histogram': _Histogram, 'gauge': _Gauge}
+    for key, (kind, name, documentation, labelnames, options) in METRICS.items():
+        metrics[key] = classes[kind](name, documentation, labelnames, stores, **options)
+    return metrics, lambda: _render_builtin(metrics, stores)
+
+
+def _metric(key, labels):
+    metrics = _state['metrics']
+    if metrics is None:
+        return None
+    metric = metrics[key]
+    return metric.labels(**labels) if labels else metric
+
+
+def observe(key, value, **labels):
+    """
+    Значение гистограммы (без инициализированных метрик ничего не делает)
+    :param key: ключ метрики из METRICS
+    :param value: наблюдаемое значение
+    :param labels: значения меток
+    """
+    metric = _metric(key, labels)
+    if metric is not None:
+        metric.observe(value)
+
+
+def inc(key, amount=1, **labels):
+    """
+    Увеличение счетчика
+    :param key: ключ метрики из METRICS
+    :param amount: приращение
+    :param labels: значения меток
+    """
+    metric = _metric(key, labels)
+    if metric is not None:
+        metric.inc(amount)
+
+
+def set_gauge(key, value, **labels):
+    """
+    Значение датчика текущего процесса
+    :param key: ключ метрики из METRICS
+    :param value: значение
+    :param labels: значения меток
+    """
+    metric = _metric(key, labels)
+    if metric is not None:
+        metric.set(value)
+
+
+@contextmanager
+def timer(key, **labels):
+    """
+    Измерение времени блока кода в гистограмму
+    :param key: ключ метрики из METRICS
+    :param labels: значения меток
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(key, time.perf_counter() - started, **labels)
+
+
+def clear_metrics_dir(directory):
+    """
+    Очистка каталога значений перед запуском воркеров (вызывается мастер-процессом)
+    :param directory: каталог METRICS_DIR
+    """
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, '*.db')):
+        os.remove(path)
+
+
+def mark_process_dead(pid, directory=None):
+    """
+    Удаление значений датчиков завершившегося процесса (хук Gunicorn child_exit);
+    счетчики и гистограммы остаются в сумме
+    :param pid: PID процесса
+    :param directory: каталог METRICS_DIR (по умолчанию - каталог текущих метрик)
+    """
+    directory = directory or _state['directory']
+    if not directory:
+        return
+    for pattern in (f'gauge_{pid}.db', f'gauge_live*_{pid}.db'):
+        for path in glob.glob(os.path.join(directory, pattern)):
+            os.remove(path)
+
+
+def _on_session_insert(mapper, connection, target):
+    inc('sessions_created')
+
+
+def _install_listeners():
+    """Подсчет SQL-запросов всех engine (app.utils.query_counter) и вставок сессий"""
+    from sqlalchemy import event
+    from app.models.auth import UserSession
+
+    install_query_listeners()
+    if not event.contains(UserSession, 'after_insert', _on_session_insert):
+        event.listen(UserSession, 'after_insert', _on_session_insert)
+
+
+def metrics_view():
+    """GET /metrics в текстовом формате Prometheus"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        header = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(header.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+            return {'message': 'Необходима авторизация', 'status_code': 401}, 401
+    return current_app.response_class(_state['render'](), content_type=CONTENT_TYPE)
+
+
+def init_metrics(app):
+    """
+    Метрики запросов, SQL и /metrics (METRICS_ENABLED, METRICS_DIR, METRICS_TOKEN)
+    :param app: экземпляр Flask приложения
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+
+    directory = app.config.get('METRICS_DIR') or ''
+    with _state_lock:
+        if _state['metrics'] is None:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            _state['metrics'], _state['render'] = _create_metrics(directory)
+            _state['directory'] = directory
+    _install_listeners()
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is None or request.endpoint == 'metrics':
+            return response
+        route = request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+        observe('http_duration', time.perf_counter() - started, method=request.method, route=route)
+        inc('http_requests', method=request.method, route=route, status=response.status_code)
+        stats = get_request_stats()
+        observe('db_queries', stats.count if stats else 0, route=route)
+        observe('db_time', stats.time if stats else 0.0, route=route)
+        return response
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,34 @@
+"""
+Курсоры keyset-пагинации по паре (время, id)
+"""
+import base64
+from datetime import datetime
+
+
+class InvalidCursor(ValueError):
+    """Курсор пагинации поврежден или подделан"""
+
+
+def encode_cursor(timestamp, row_id):
+    """
+    Курсор следующей страницы по последней выданной записи
+    :param timestamp: значение колонки времени последней записи страницы
+    :param row_id: ID последней записи страницы
+    :return: непрозрачная строка курсора
+    """
+    raw = f"{timestamp.isoformat()}|{row_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Разбор курсора
+    :param cursor: строка курсора из encode_cursor
+    :return: кортеж (timestamp, id)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        timestamp, row_id = raw.split('|', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e))
@@ -0,0 +1,99 @@
+"""
+Учет одноразовых токенов установки/сброса пароля
+"""
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models.auth import UsedPasswordToken
+
+logger = logging.getLogger(__name__)
+
+# Кэш процесса: nonce использованного токена -> время истечения токена (unix time)
+_used_nonces = OrderedDict()
+_cache_lock = threading.Lock()
+# Максимальный размер кэша на процесс
+USED_NONCE_CACHE_SIZE = 10000
+# Вероятность попутной очистки истекших записей при погашении токена
+SWEEP_PROBABILITY = 0.01
+
+
+def _remember(nonce, expires_at):
+    """Добавление nonce в кэш процесса с вытеснением самых старых записей"""
+    with _cache_lock:
+        _used_nonces[nonce] = expires_at
+        _used_nonces.move_to_end(nonce)
+        while len(_used_nonces) > USED_NONCE_CACHE_SIZE:
+            _used_nonces.popitem(last=False)
+
+
+def _is_cached(nonce):
+    with _cache_lock:
+        expires_at = _used_nonces.get(nonce)
+        if expires_at is None:
+            return False
+        if expires_at < time.time():
+            # Истекший токен отсекается проверкой срока действия, запись больше не нужна
+            del _used_nonces[nonce]
+        return True
+
+
+def is_token_used(token_data):
+    """
+    Проверка, был ли токен уже погашен
+    :param token_data: данные токена из decode_token
+    :return: True, если токен уже использован
+    """
+    nonce = token_data['nonce']
+    if _is_cached(nonce):
+        return True
+
+    used = db.session.query(UsedPasswordToken.id).filter_by(nonce=nonce).first() is not None
+    if used:
+        _remember(nonce, token_data['expires_at'])
+    return used
+
+
+def consume_token(token_data):
+    """
+    Погашение токена в той же транзакции, что и изменения вызывающего кода
+    :param token_data: данные токена из decode_token
+    :return: True, если токен погашен; False, если он уже был использован (транзакция откатывается)
+    """
+    db.session.add(UsedPasswordToken(
+        nonce=token_data['nonce'],
+        user_id=token_data['id'],
+        expires_at=datetime.utcfromtimestamp(token_data['expires_at'])
+    ))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        _remember(token_data['nonce'], token_data['expires_at'])
+        return False
+
+    _remember(token_data['nonce'], token_data['expires_at'])
+
+    if random.random() < SWEEP_PROBABILITY:
+        try:
+            sweep_used_tokens()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Не удалось очистить истекшие токены: {str(e)}")
+    return True
+
+
+def sweep_used_tokens(now=None):
+    """
+    Удаление записей об использованных токенах, срок действия которых истек
+    :param now: момент времени (UTC), по умолчанию текущий
+    :return: количество удаленных записей
+    """
+    now = now or datetime.utcnow()
+    deleted = UsedPasswordToken.query.filter(UsedPasswordToken.expires_at < now).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -0,0 +1,289 @@
+"""
+Профилирование запросов в рабочем трафике: доля случайных запросов (PROFILER_SAMPLE_RATE)
+и запросы с заголовком X-Profile-Token, совпадающим с PROFILER_TOKEN.
+
+Режимы (PROFILER_MODE):
+    sampler  - фоновый поток снимает стек потока запроса каждые PROFILER_INTERVAL секунд,
+               результат - свернутые стеки (.collapsed), накладные расходы малы
+    cprofile - cProfile на время запроса, результат - .pstats (точные счетчики вызовов)
+
+Файлы пишутся в PROFILER_DIR/<метод>_<маршрут>/, для каждого маршрута хранится не больше
+PROFILER_MAX_FILES последних профилей. В процессе одновременно профилируется один запрос.
+Под gevent сэмплер видит только стек активного гринлета - для него лучше режим cprofile.
+"""
+import cProfile
+import hmac
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# Заголовок запроса на профилирование (значение - PROFILER_TOKEN)
+PROFILE_HEADER = 'X-Profile-Token'
+# Заголовок ответа с путем к файлу профиля (только для запросов с токеном)
+PROFILE_FILE_HEADER = 'X-Profile-File'
+PROFILE_EXTENSIONS = ('.collapsed', '.pstats')
+
+# Один профилируемый запрос на процесс: cProfile не допускает параллельных сессий
+_busy = threading.Lock()
+
+
+def _frame_name(code):
+    """Имя кадра в свернутом стеке: функция (каталог/файл:строка)"""
+    path = code.co_filename.replace('\\', '/').rsplit('/', 2)
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Сэмплер стека одного потока: свернутые стеки и число попаданий"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if self._stop.is_set():
+                break  # снимок попал на остановку сэмплера
+            if names:
+                stack = ';'.join(reversed(names))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        """Запись в формате flamegraph.pl: стек и время в микросекундах"""
+        weight = int(self.interval * 1_000_000)
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.items():
+                f.write(f"{stack} {count * weight}\n")
+
+
+def route_slug(method, rule):
+    """
+    Имя каталога профилей маршрута
+    :param method: HTTP метод
+    :param rule: правило URL (/api/auth/refresh)
+    :return: POST_api_auth_refresh
+    """
+    return f"{method}_{re.sub(r'[^A-Za-z0-9]+', '_', rule).strip('_') or 'root'}"
+
+
+def _should_profile(config):
+    token = config.get('PROFILER_TOKEN')
+    header = request.headers.get(PROFILE_HEADER)
+    if token and header is not None:
+        return hmac.compare_digest(header.encode('utf-8'), token.encode('utf-8')), True
+    rate = config.get('PROFILER_SAMPLE_RATE', 0.0)
+    return rate > 0 and random.random() < rate, False
+
+
+def _enforce_retention(directory, max_files):
+    """Удаление самых старых профилей маршрута сверх max_files"""
+    files = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(PROFILE_EXTENSIONS)),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in files[:max(len(files) - max_files, 0)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def init_profiler(app):
+    """
+    Профилирование запросов (включается PROFILER_SAMPLE_RATE > 0 или PROFILER_TOKEN)
+    :param app: экземпляр Flask приложения
+    """
+    config = app.config
+    if not (config.get('PROFILER_SAMPLE_RATE', 0.0) > 0 or config.get('PROFILER_TOKEN')):
+        return
+
+    @app.before_request
+    def start_profiler():
+        if request.url_rule is None:
+            return
+        selected, requested = _should_profile(config)
+        if not selected or not _busy.acquire(blocking=False):
+            return
+        try:
+            if config.get('PROFILER_MODE', 'sampler') == 'cprofile':
+                profiler = cProfile.Profile()
+                profiler.enable()
+            else:
+                profiler = StackSampler(threading.get_ident(), config.get('PROFILER_INTERVAL', 0.005))
+                profiler.start()
+        except Exception as e:
+            _busy.release()
+            logger.warning(f"Не удалось запустить профилировщик: {e}")
+            return
+        g.profiler = (profiler, time.perf_counter(), requested)
+
+    @app.after_request
+    def expose_profile_file(response):
+        # Путь известен заранее, чтобы вернуть его в заголовке; файл пишется в teardown
+        if g.get('profiler') and g.profiler[2]:
+            g.profile_path = _profile_path(config)
+            response.headers[PROFILE_FILE_HEADER] = os.path.relpath(g.profile_path, config['PROFILER_DIR'])
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        state = g.pop('profiler', None)
+        if state is None:
+            return
+        profiler, started, _ = state
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+            else:
+                profiler.stop()
+            path = g.pop('profile_path', None) or _profile_path(config, time.perf_counter() - started)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if isinstance(profiler, cProfile.Profile):
+                profiler.dump_stats(path)
+            else:
+                profiler.dump(path)
+            _enforce_retention(os.path.dirname(path), config.get('PROFILER_MAX_FILES', 100))
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить профиль запроса: {e}")
+        finally:
+            _busy.release()
+
+
+def _profile_path(config, elapsed=None):
+    """Путь файла профиля: каталог маршрута, время, длительность, PID и ID запроса"""
+    if elapsed is None:
+        elapsed = time.perf_counter() - g.profiler[1]
+    extension = '.pstats' if config.get('PROFILER_MODE', 'sampler') == 'cprofile' else '.collapsed'
+    name = (
+        f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{int(elapsed * 1000)}ms-{os.getpid()}-"
+        f"{g.get('request_id') or 'request'}{extension}"
+    )
+    return os.path.join(config['PROFILER_DIR'], route_slug(request.method, request.url_rule.rule), name)
+
+
+def pstats_to_collapsed(stats, max_depth=64, min_fraction=0.001):
+    """
+    Свернутые стеки из pstats. cProfile хранит только пары вызывающий-вызываемый, поэтому время
+    функции делится между путями пропорционально времени вызовов с каждого из них (приближение).
+    Ветви меньше min_fraction общего времени не раскрываются - их время относится к вызывающему кадру
+    :param stats: объект pstats.Stats
+    :param max_depth: максимальная глубина стека
+    :param min_fraction: минимальная доля общего времени для отдельной ветви
+    :return: словарь стек -> микросекунды
+    """
+    entries = stats.stats
+    callees = {}
+    names = {}
+    for function, (_, _, _, _, callers) in entries.items():
+        filename, line, function_name = function
+        path = filename.replace('\\', '/').rsplit('/', 2)
+        names[function] = f"{function_name} ({'/'.join(path[-2:])}:{line})"
+        for caller in callers:
+            callees.setdefault(caller, []).append(function)
+    min_time = sum(entry[2] for entry in entries.values()) * min_fraction
+
+    stacks = {}
+
+    def walk(function, path, on_path, scale, depth):
+        _, _, total_time, cumulative_time, _ = entries[function]
+        stack = f"{path};{names[function]}" if path else names[function]
+        if depth >= max_depth:
+            own = cumulative_time * scale
+        else:
+            own = total_time * scale
+            for callee in callees.get(function, ()):
+                # Время вызываемой функции на этом пути
+                branch_time = entries[callee][4][function][3] * scale
+                if callee in on_path or not branch_time:
+                    continue  # рекурсия уже учтена во времени кадра выше
+                if branch_time < min_time:
+                    own += branch_time
+                    continue
+                on_path.add(callee)
+                walk(callee, stack, on_path, branch_time / entries[callee][3], depth + 1)
+                on_path.discard(callee)
+        if int(own * 1_000_000):
+            stacks[stack] = stacks.get(stack, 0) + int(own * 1_000_000)
+
+    for function, entry in entries.items():
+        if not entry[4]:
+            walk(function, '', {function}, 1.0, 0)
+    return stacks
+
+
+def collect_profiles(directory, route=None, since=None):
+    """
+    Список файлов профилей
+    :param directory: каталог PROFILER_DIR
+    :param route: подстрока имени каталога маршрута (POST_api_auth_refresh)
+    :param since: учитывать файлы не старше этого времени (timestamp)
+    :return: словарь каталог маршрута -> список путей
+    """
+    profiles = {}
+    if not os.path.isdir(directory):
+        return profiles
+    for entry in os.scandir(directory):
+        if not entry.is_dir() or (route and route not in entry.name):
+            continue
+        for file in os.scandir(entry.path):
+            if file.name.endswith(PROFILE_EXTENSIONS) and (since is None or file.stat().st_mtime >= since):
+                profiles.setdefault(entry.name, []).append(file.path)
+    return profiles
+
+
+def merge_profiles(paths):
+    """
+    Объединение профилей в свернутые стеки (микросекунды) и, для cProfile, в общий pstats
+    :param paths: пути к файлам .collapsed и .pstats
+    :return: (словарь стек -> микросекунды, pstats.Stats или None)
+    """
+    stacks = {}
+    merged_stats = None
+    for path in paths:
+        if path.endswith('.pstats'):
+            stats = pstats.Stats(path)
+            merged_stats = stats if merged_stats is None else merged_stats.add(path)
+            items = pstats_to_collapsed(stats).items()
+        else:
+            with open(path, encoding='utf-8') as f:
+                items = [line.rstrip('\n').rsplit(' ', 1) for line in f if line.strip()]
+        for stack, value in items:
+            stacks[stack] = stacks.get(stack, 0) + int(value)
+    return stacks, merged_stats
+
+
+def self_time_by_frame(stacks):
+    """
+    Собственное время по кадрам (последний кадр стека)
+    :param stacks: словарь стек -> микросекунды
+    :return: список (кадр, микросекунды) по убыванию
+    """
+    frames = {}
+    for stack, value in stacks.items():
+        frame = stack.rsplit(';', 1)[-1]
+        frames[frame] = frames.get(frame, 0) + value
+    return sorted(frames.items(), key=lambda item: -item[1])
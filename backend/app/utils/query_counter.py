@@ -0,0 +1,228 @@
+"""
+Подсчет SQL-запросов и их времени за HTTP-запрос, поиск N+1: запросы одной формы,
+повторенные в одном HTTP-запросе QUERY_REPEAT_THRESHOLD раз и более.
+
+Счетчики заполняет глобальный обработчик cursor execute всех engine (включая реплики
+и асинхронный engine ASGI-маршрутов). В development количество и время запросов
+возвращаются в заголовках ответа, в production превышения порогов пишутся в лог.
+Для тестов - assert_max_queries.
+"""
+import contextvars
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from flask import has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+# Заголовки ответа (QUERY_COUNTER_HEADERS)
+QUERY_COUNT_HEADER = 'X-DB-Query-Count'
+QUERY_TIME_HEADER = 'X-DB-Query-Time'
+REPEATED_QUERIES_HEADER = 'X-DB-Repeated-Queries'
+
+_PLACEHOLDER = r'(?:\?|%s|%\(\w+\)s|:\w+|\$\d+)'
+# Списки IN (?, ?, ?) разной длины - одна форма запроса
+_IN_LIST = re.compile(rf'\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+# Управление транзакциями повторяется в каждом запросе и не считается N+1
+_TRANSACTION_CONTROL = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b', re.IGNORECASE)
+
+# Ключ счетчика в WSGI environ: у каждого запроса свой, даже если контекст приложения
+# общий (запросы тестового клиента внутри контекста запроса pytest-flask)
+ENVIRON_KEY = 'app.query_stats'
+
+# Активные assert_max_queries/count_queries текущего контекста
+_captures = contextvars.ContextVar('query_captures', default=())
+
+# Время последней записи в лог по (маршрут, причина) - повторы не чаще QUERY_LOG_INTERVAL
+_last_logged = {}
+_last_logged_lock = threading.Lock()
+
+
+def statement_shape(statement):
+    """
+    Форма запроса: SQL без различий в длине списков IN и пробельных символах
+    :param statement: SQL с плейсхолдерами параметров
+    :return: нормализованный SQL
+    """
+    return _WHITESPACE.sub(' ', _IN_LIST.sub('(?...)', statement)).strip()
+
+
+class QueryStats:
+    """Запросы одного HTTP-запроса или блока assert_max_queries"""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        # SQL -> [количество, время]; форма вычисляется только при анализе
+        self.statements = {}
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.time += elapsed
+        entry = self.statements.get(statement)
+        if entry is None:
+            self.statements[statement] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def repeated(self, threshold):
+        """
+        Формы запросов, выполненные не меньше threshold раз
+        :param threshold: порог повторов (0 - не проверять)
+        :return: список (форма, количество, время) по убыванию количества
+        """
+        if not threshold:
+            return []
+        shapes = {}
+        for statement, (count, elapsed) in self.statements.items():
+            if _TRANSACTION_CONTROL.match(statement):
+                continue
+            entry = shapes.setdefault(statement_shape(statement), [0, 0.0])
+            entry[0] += count
+            entry[1] += elapsed
+        return sorted(
+            ((shape, count, elapsed) for shape, (count, elapsed) in shapes.items() if count >= threshold),
+            key=lambda item: -item[1],
+        )
+
+    def describe(self, limit=10):
+        """Список запросов для сообщений: количество, время и SQL"""
+        lines = []
+        for statement, (count, elapsed) in sorted(self.statements.items(), key=lambda item: -item[1][0])[:limit]:
+            lines.append(f"{count:>4} x {elapsed * 1000:8.2f} мс  {_WHITESPACE.sub(' ', statement)[:300]}")
+        return '\n'.join(lines)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    if has_request_context():
+        stats = request.environ.get(ENVIRON_KEY)
+        if stats is None:
+            stats = request.environ[ENVIRON_KEY] = QueryStats()
+        stats.record(statement, elapsed)
+    for capture in _captures.get():
+        capture.record(statement, elapsed)
+
+
+def _on_error(exception_context):
+    # after_cursor_execute не вызывается для упавшего запроса
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
+
+
+def install_query_listeners():
+    """Подключение счетчика к cursor execute всех engine (повторный вызов ничего не делает)"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _on_error)
+
+
+def get_request_stats():
+    """
+    Запросы текущего HTTP-запроса
+    :return: QueryStats или None, если запросов к БД не было
+    """
+    return request.environ.get(ENVIRON_KEY) if has_request_context() else None
+
+
+def _should_log(route, reason, interval):
+    now = time.monotonic()
+    with _last_logged_lock:
+        last = _last_logged.get((route, reason))
+        if last is not None and now - last < interval:
+            return False
+        _last_logged[(route, reason)] = now
+        return True
+
+
+def init_query_counter(app):
+    """
+    Заголовки с количеством запросов (QUERY_COUNTER_HEADERS) и запись в лог запросов
+    сверх QUERY_COUNT_WARN и повторов не меньше QUERY_REPEAT_THRESHOLD
+    :param app: экземпляр Flask приложения
+    """
+    install_query_listeners()
+    config = app.config
+
+    @app.after_request
+    def report_queries(response):
+        stats = get_request_stats() or QueryStats()
+        repeated = stats.repeated(config.get('QUERY_REPEAT_THRESHOLD', 5))
+
+        if config.get('QUERY_COUNTER_HEADERS'):
+            response.headers[QUERY_COUNT_HEADER] = str(stats.count)
+            response.headers[QUERY_TIME_HEADER] = f"{stats.time * 1000:.2f}ms"
+            if repeated:
+                response.headers[REPEATED_QUERIES_HEADER] = '; '.join(
+                    f"{count}x {shape[:120]}" for shape, count, _ in repeated[:3]
+                )
+
+        count_warn = config.get('QUERY_COUNT_WARN', 50)
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        interval = config.get('QUERY_LOG_INTERVAL', 300)
+        if count_warn and stats.count > count_warn and _should_log(route, 'count', interval):
+            logger.warning(
+                f"{request.method} {route}: {stats.count} SQL-запросов за {stats.time * 1000:.1f} мс "
+                f"(порог {count_warn})",
+                extra={'db_query_count': stats.count, 'db_query_time_ms': round(stats.time * 1000, 2)},
+            )
+        for shape, count, elapsed in repeated:
+            if _should_log(route, shape, interval):
+                logger.warning(
+                    f"{request.method} {route}: возможный N+1 - запрос выполнен {count} раз "
+                    f"({elapsed * 1000:.1f} мс): {shape[:500]}",
+                    extra={'db_query_count': stats.count, 'db_repeated_count': count},
+                )
+        return response
+
+
+@contextmanager
+def count_queries():
+    """
+    Подсчет запросов в блоке кода (в том числе внутри запросов тестового клиента)
+    :return: QueryStats, заполняемый до выхода из блока
+    """
+    stats = QueryStats()
+    install_query_listeners()
+    token = _captures.set(_captures.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _captures.reset(token)
+
+
+@contextmanager
+def assert_max_queries(max_count, repeat_threshold=None):
+    """
+    Проверка в тестах: блок выполняет не больше max_count SQL-запросов
+    и (при repeat_threshold) не повторяет один запрос repeat_threshold раз
+
+        with assert_max_queries(4):
+            client.post('/api/auth/login', json=credentials)
+
+    :param max_count: максимальное количество запросов
+    :param repeat_threshold: порог повторов одной формы запроса (None - не проверять)
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_count:
+        raise AssertionError(
+            f"Выполнено {stats.count} SQL-запросов при допустимых {max_count}:\n{stats.describe()}"
+        )
+    repeated = stats.repeated(repeat_threshold)
+    if repeated:
+        shape, count, _ = repeated[0]
+        raise AssertionError(f"Запрос выполнен {count} раз (порог {repeat_threshold}): {shape}")
@@ -0,0 +1,49 @@
+"""
+Проверка соответствия схемы БД миграциям
+"""
+import logging
+from alembic.config import Config as AlembicConfig
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+logger = logging.getLogger(__name__)
+
+
+def get_schema_revisions(app):
+    """
+    Текущие и последние ревизии миграций
+    :param app: экземпляр Flask приложения
+    :return: кортеж (ревизии в БД, ревизии в migrations/)
+    """
+    from app.extensions import db, MIGRATIONS_DIRECTORY
+
+    alembic_config = AlembicConfig()
+    alembic_config.set_main_option('script_location', MIGRATIONS_DIRECTORY)
+    heads = set(ScriptDirectory.from_config(alembic_config).get_heads())
+
+    with app.app_context():
+        with db.engine.connect() as connection:
+            current = set(MigrationContext.configure(connection).get_current_heads())
+    return current, heads
+
+
+def check_schema_revision(app):
+    """
+    Проверка при старте, что БД обновлена до последней миграции
+    (DB_SCHEMA_CHECK: warn - предупреждение в лог, error - отказ в запуске)
+    :param app: экземпляр Flask приложения
+    """
+    mode = app.config.get('DB_SCHEMA_CHECK', 'off')
+    current, heads = get_schema_revisions(app)
+    if current == heads:
+        logger.info(f"Схема БД актуальна (ревизия {', '.join(sorted(current))})")
+        return True
+
+    message = (
+        f"Схема БД не соответствует миграциям: в БД {', '.join(sorted(current)) or 'нет ревизии'}, "
+        f"последняя {', '.join(sorted(heads))}. Выполните 'flask db upgrade'"
+    )
+    if mode == 'error':
+        raise RuntimeError(message)
+    logger.warning(message)
+    return False
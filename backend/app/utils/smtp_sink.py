@@ -0,0 +1,271 @@
+"""
+Локальный SMTP-приемник для разработки, тестов и нагрузочных замеров почтового тракта
+"""
+import base64
+import logging
+import random
+import socketserver
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from email import message_from_bytes
+from email.policy import default as default_policy
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReceivedMessage:
+    """Письмо, принятое SMTP-приемником"""
+    mail_from: str
+    rcpt_tos: list
+    data: bytes
+    received_at: float
+    peer: str = None
+
+    @property
+    def message(self):
+        """Разобранное письмо (email.message.EmailMessage)"""
+        return message_from_bytes(self.data, policy=default_policy)
+
+
+@dataclass
+class SinkStats:
+    """Счетчики SMTP-приемника"""
+    connections: int = 0
+    accepted: int = 0
+    rejected: int = 0
+    started_at: float = field(default_factory=time.time)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Обработчик одного SMTP-соединения (минимальное подмножество RFC 5321)"""
+
+    def _reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+        self.wfile.flush()
+
+    def _read_line(self):
+        line = self.rfile.readline(65536)
+        if not line:
+            return None
+        return line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def _read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline(65536)
+            if not line:
+                return None
+            if line in (b'.\r\n', b'.\n'):
+                break
+            # Снимаем dot-stuffing
+            if line.startswith(b'..'):
+                line = line[1:]
+            lines.append(line)
+        return b''.join(lines)
+
+    def handle(self):
+        sink = self.server.sink
+        sink._on_connect()
+        peer = f"{self.client_address[0]}:{self.client_address[1]}"
+        mail_from, rcpt_tos = None, []
+
+        self._reply(f"220 {sink.hostname} ESMTP AuthTemplate sink")
+        while True:
+            line = self._read_line()
+            if line is None:
+                return
+            command, _, arg = line.partition(' ')
+            command = command.upper()
+
+            if command == 'EHLO':
+                self.wfile.write(
+                    f"250-{sink.hostname}\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 33554432\r\n".encode('ascii')
+                )
+                self.wfile.flush()
+            elif command == 'HELO':
+                self._reply(f"250 {sink.hostname}")
+            elif command == 'AUTH':
+                mechanism, _, initial = arg.partition(' ')
+                if mechanism.upper() == 'LOGIN':
+                    # Логин и пароль не проверяются, но протокол соблюдается
+                    self._reply('334 ' + base64.b64encode(b'Username:').decode('ascii'))
+                    if self._read_line() is None:
+                        return
+                    self._reply('334 ' + base64.b64encode(b'Password:').decode('ascii'))
+                    if self._read_line() is None:
+                        return
+                elif mechanism.upper() == 'PLAIN' and not initial:
+                    self._reply('334 ')
+                    if self._read_line() is None:
+                        return
+                self._reply('235 2.7.0 Authentication successful')
+            elif command == 'MAIL':
+                mail_from = arg.split(':', 1)[-1].strip().strip('<>').split(' ')[0].rstrip('>')
+                rcpt_tos = []
+                self._reply('250 OK')
+            elif command == 'RCPT':
+                rcpt_tos.append(arg.split(':', 1)[-1].strip().strip('<>').split(' ')[0].rstrip('>'))
+                self._reply('250 OK')
+            elif command == 'DATA':
+                if not rcpt_tos:
+                    self._reply('503 5.5.1 RCPT first')
+                    continue
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                data = self._read_data()
+                if data is None:
+                    return
+                code = sink._accept(mail_from, rcpt_tos, data, peer)
+                self._reply(code)
+                mail_from, rcpt_tos = None, []
+            elif command == 'RSET':
+                mail_from, rcpt_tos = None, []
+                self._reply('250 OK')
+            elif command == 'NOOP':
+                self._reply('250 OK')
+            elif command == 'QUIT':
+                self._reply('221 Bye')
+                return
+            elif command == 'STARTTLS':
+                self._reply('454 4.7.0 TLS not available')
+            else:
+                self._reply('502 5.5.2 Command not recognized')
+
+
+class _ThreadingSMTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """
+    SMTP-приемник, сохраняющий полученные письма в памяти.
+
+    Умеет имитировать медленный релей (latency/jitter) и отказы (failure_rate).
+    Порт 0 означает выбор свободного порта; фактический порт доступен в `port`
+    после вызова `start()`.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                 failure_rate=0.0, max_messages=None, hostname='localhost', seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.max_messages = max_messages
+        self.hostname = hostname
+        self.stats = SinkStats()
+        self.messages = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._received = threading.Condition(self._lock)
+        self._server = None
+        self._thread = None
+        self.on_message = None
+
+    def start(self):
+        """Запуск приемника в фоновом потоке"""
+        self._server = _ThreadingSMTPServer((self.host, self.port), _SMTPHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='smtp-sink', daemon=True)
+        self._thread.start()
+        logger.info(f"SMTP-приемник запущен на {self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        """Остановка приемника"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def serve_forever(self):
+        """Запуск приемника в текущем потоке (для CLI)"""
+        self._server = _ThreadingSMTPServer((self.host, self.port), _SMTPHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address[:2]
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._server = None
+
+    def clear(self):
+        """Очистка сохраненных писем и счетчиков"""
+        with self._lock:
+            self.messages.clear()
+            self.stats = SinkStats()
+
+    def wait_for(self, count, timeout=10.0):
+        """
+        Ожидание получения заданного числа писем
+        :return: True, если письма получены до истечения таймаута
+        """
+        deadline = time.monotonic() + timeout
+        with self._received:
+            while len(self.messages) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._received.wait(remaining)
+        return True
+
+    def _on_connect(self):
+        with self._lock:
+            self.stats.connections += 1
+
+    def _accept(self, mail_from, rcpt_tos, data, peer):
+        """Прием письма с учетом имитации задержки и отказов; возвращает SMTP-ответ"""
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            with self._lock:
+                self.stats.rejected += 1
+            return '451 4.3.0 Simulated failure'
+
+        received = ReceivedMessage(
+            mail_from=mail_from,
+            rcpt_tos=list(rcpt_tos),
+            data=data,
+            received_at=time.time(),
+            peer=peer
+        )
+        with self._received:
+            self.messages.append(received)
+            if self.max_messages and len(self.messages) > self.max_messages:
+                del self.messages[:len(self.messages) - self.max_messages]
+            self.stats.accepted += 1
+            self._received.notify_all()
+
+        if self.on_message is not None:
+            self.on_message(received)
+        return '250 OK: queued'
+
+
+@contextmanager
+def running_smtp_sink(**kwargs):
+    """
+    Контекстный менеджер для запуска приемника, удобен как pytest-фикстура:
+
+        @pytest.fixture
+        def smtp_sink(app):
+            with running_smtp_sink() as sink:
+                app.config.update(SMTP_SERVER=sink.host, SMTP_PORT=sink.port, SMTP_USE_TLS=False)
+                yield sink
+    """
+    sink = SMTPSink(**kwargs).start()
+    try:
+        yield sink
+    finally:
+        sink.stop()
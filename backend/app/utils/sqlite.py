@@ -0,0 +1,87 @@
+"""
+Профиль SQLite для продакшена: WAL, PRAGMA при подключении и сериализация записи
+"""
+import logging
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session
+
+logger = logging.getLogger(__name__)
+
+# PRAGMA, выполняемые на каждом новом соединении: параметр конфигурации -> имя PRAGMA
+CONNECTION_PRAGMAS = (
+    ('SQLITE_JOURNAL_MODE', 'journal_mode'),
+    ('SQLITE_SYNCHRONOUS', 'synchronous'),
+    ('SQLITE_BUSY_TIMEOUT', 'busy_timeout'),
+    ('SQLITE_MMAP_SIZE', 'mmap_size'),
+    ('SQLITE_CACHE_SIZE', 'cache_size'),
+)
+
+# Опция выполнения, задающая режим BEGIN для транзакции соединения
+BEGIN_MODE_OPTION = 'sqlite_begin'
+
+
+def _is_memory_database(engine):
+    return engine.url.database in (None, '', ':memory:')
+
+
+def configure_sqlite_engine(engine, config):
+    """
+    Подключение профиля SQLite к engine (для остальных СУБД ничего не делает)
+    :param engine: экземпляр Engine
+    :param config: конфигурация Flask приложения
+    :return: True, если профиль применен
+    """
+    if engine.dialect.name != 'sqlite' or not config.get('SQLITE_TUNING', True):
+        return False
+
+    pragmas = []
+    for option, pragma in CONNECTION_PRAGMAS:
+        value = str(config.get(option) or '').strip()
+        if not value:
+            continue
+        if pragma == 'journal_mode' and _is_memory_database(engine):
+            # База в памяти не поддерживает WAL
+            continue
+        pragmas.append(f"PRAGMA {pragma}={value}")
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        # Транзакции начинаются явно в on_begin, а не неявно драйвером pysqlite
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in pragmas:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def on_begin(connection):
+        mode = connection.get_execution_options().get(BEGIN_MODE_OPTION)
+        connection.exec_driver_sql(f"BEGIN {mode}" if mode else "BEGIN")
+
+    logger.info(f"Профиль SQLite применен: {', '.join(pragmas) or 'без PRAGMA'}")
+    return True
+
+
+def begin_write(session):
+    """
+    Начало пишущей транзакции до первого изменения в запросе.
+
+    В SQLite транзакция, начатая чтением, при попытке записи после коммита другого
+    писателя получает "database is locked" сразу, без ожидания busy_timeout. Поэтому
+    читающая транзакция завершается, а новая начинается с BEGIN IMMEDIATE: блокировка
+    записи берется сразу, конкурирующие писатели ждут ее в пределах busy_timeout.
+    Для остальных СУБД ничего не делает.
+    :param session: сессия SQLAlchemy (или db.session) без несохраненных изменений
+    """
+    if isinstance(session, scoped_session):
+        session = session()
+    if not current_app.config.get('SQLITE_TUNING', True):
+        return
+    if session.get_bind().dialect.name != 'sqlite':
+        return
+    if session.in_transaction():
+        session.commit()
+    session.connection(execution_options={BEGIN_MODE_OPTION: 'IMMEDIATE'})
@@ -0,0 +1,128 @@
+"""
+Спецификация OpenAPI (/api/swagger.json), собранная и сериализованная один раз на процесс.
+
+flask-restx кэширует словарь спецификации, но сериализует его в JSON на каждый запрос
+и не отвечает на условные запросы. Здесь JSON и его gzip-версия готовятся при первом
+запросе, ответ отдается с ETag: повторные запросы Swagger UI получают 304 без тела.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from flask import current_app, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+# Эндпоинт спецификации, регистрируемый flask-restx
+SPEC_ENDPOINT = 'specs'
+# Клиент может использовать ответ, только проверив ETag
+SPEC_CACHE_CONTROL = 'public, no-cache'
+
+_lock = threading.Lock()
+
+
+def get_spec_schema(app, api):
+    """
+    Словарь спецификации OpenAPI. Вне запроса (CLI) создается тестовый контекст
+    запроса: flask-restx строит basePath и ссылки через url_for
+    :param app: экземпляр Flask приложения
+    :param api: экземпляр flask_restx.Api
+    :return: словарь спецификации
+    """
+    if has_request_context():
+        return api.__schema__
+    with app.test_request_context():
+        return api.__schema__
+
+
+def render_spec(schema, indent=None):
+    """
+    Сериализация спецификации
+    :param schema: словарь спецификации
+    :param indent: отступ JSON (None - компактно)
+    :return: JSON в UTF-8
+    """
+    separators = None if indent else (',', ':')
+    return json.dumps(schema, ensure_ascii=False, indent=indent, separators=separators).encode('utf-8')
+
+
+def build_spec_cache(app, api):
+    """
+    Сборка кэша спецификации: тело, gzip-версия и ETag
+    :param app: экземпляр Flask приложения
+    :param api: экземпляр flask_restx.Api
+    :return: словарь с body, gzip_body, etag или None, если спецификацию собрать не удалось
+    """
+    started = time.perf_counter()
+    schema = get_spec_schema(app, api)
+    if 'error' in schema:
+        # flask-restx не кэширует ошибку сборки - повторим при следующем запросе
+        return None
+
+    body = render_spec(schema)
+    cache = {
+        'body': body,
+        # mtime=0 - одинаковые байты (и ETag) во всех воркерах
+        'gzip_body': gzip.compress(body, compresslevel=9, mtime=0),
+        'etag': hashlib.sha256(body).hexdigest()[:32],
+    }
+    logger.info(
+        f"Спецификация API собрана за {(time.perf_counter() - started) * 1000:.1f} мс: "
+        f"{len(body) // 1024} КиБ, gzip {len(cache['gzip_body']) // 1024} КиБ"
+    )
+    return cache
+
+
+def get_spec_cache(app, api):
+    """
+    Кэш спецификации процесса (собирается один раз)
+    :param app: экземпляр Flask приложения
+    :param api: экземпляр flask_restx.Api
+    :return: словарь кэша или None
+    """
+    cache = app.extensions.get('swagger_spec')
+    if cache is None:
+        with _lock:
+            cache = app.extensions.get('swagger_spec')
+            if cache is None:
+                cache = build_spec_cache(app, api)
+                if cache is not None:
+                    app.extensions['swagger_spec'] = cache
+    return cache
+
+
+def spec_view():
+    """GET /api/swagger.json из кэша с ETag и gzip"""
+    from app.extensions import api
+
+    app = current_app._get_current_object()
+    cache = get_spec_cache(app, api)
+    if cache is None:
+        return {'error': 'Unable to render schema'}, 500
+
+    use_gzip = request.accept_encodings['gzip'] > 0
+    # Разные представления - разные ETag
+    etag = cache['etag'] + ('-gzip' if use_gzip else '')
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(
+            cache['gzip_body'] if use_gzip else cache['body'], mimetype='application/json'
+        )
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = SPEC_CACHE_CONTROL
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_spec_cache(app):
+    """
+    Замена обработчика /api/swagger.json из flask-restx на кэшированный
+    :param app: экземпляр Flask приложения
+    """
+    if SPEC_ENDPOINT in app.view_functions:
+        app.view_functions[SPEC_ENDPOINT] = spec_view
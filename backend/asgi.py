@@ -0,0 +1,10 @@
+"""
+Точка входа ASGI: uvicorn asgi:app (из директории backend)
+"""
+import os
+from dotenv import load_dotenv
+from app.asgi import create_asgi_app
+
+load_dotenv()
+
+app = create_asgi_app(os.environ.get('FLASK_CONFIG', 'production'))
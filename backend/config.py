@@ -8,7 +8,23 @@ from dotenv import load_dotenv
 
 # Загрузка переменных окружения из .env файла
 load_dotenv()
-print(f"DEV_DATABASE_URL: {os.environ.get('DEV_DATABASE_URL')}")
+
+
+def _engine_options():
+    """Параметры пула соединений SQLAlchemy из переменных окружения"""
+    options = {
+        'pool_pre_ping': os.environ.get('SQLALCHEMY_POOL_PRE_PING', 'True').lower() == 'true',
+        'pool_recycle': int(os.environ.get('SQLALCHEMY_POOL_RECYCLE', 1800)),
+    }
+    # Размеры пула задаются только явно, иначе используются значения SQLAlchemy по умолчанию
+    for env_name, option in (
+        ('SQLALCHEMY_POOL_SIZE', 'pool_size'),
+        ('SQLALCHEMY_MAX_OVERFLOW', 'max_overflow'),
+        ('SQLALCHEMY_POOL_TIMEOUT', 'pool_timeout'),
+    ):
+        if os.environ.get(env_name):
+            options[option] = int(os.environ[env_name])
+    return options
 
 
 class Config:
@@ -25,23 +41,102 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES', 3600)))
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(seconds=int(os.environ.get('JWT_REFRESH_TOKEN_EXPIRES', 2592000)))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options()
+    # prepare_threshold для psycopg 3 (postgresql+psycopg://): пусто - значение драйвера (5),
+    # 0 - готовить сразу, off - отключить (нужно для PgBouncer в режиме transaction)
+    SQLALCHEMY_PREPARE_THRESHOLD = os.environ.get('SQLALCHEMY_PREPARE_THRESHOLD', '').strip().lower()
+    
+    # Схема БД создается миграциями (flask db upgrade). DB_CREATE_ALL - создание таблиц при старте (только для разработки),
+    # DB_SCHEMA_CHECK - проверка при старте, что БД находится на последней миграции (off/warn/error)
+    DB_CREATE_ALL = os.environ.get('DB_CREATE_ALL', 'False').lower() == 'true'
+    DB_SCHEMA_CHECK = os.environ.get('DB_SCHEMA_CHECK', 'off').lower()
+    
+    # Профиль SQLite (применяется только к SQLite): PRAGMA при подключении и BEGIN IMMEDIATE для пишущих запросов.
+    # Пустое значение PRAGMA - оставить значение SQLite по умолчанию
+    SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'True').lower() == 'true'
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT = os.environ.get('SQLITE_BUSY_TIMEOUT', '5000')  # миллисекунд ожидания блокировки
+    SQLITE_MMAP_SIZE = os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))  # байт
+    SQLITE_CACHE_SIZE = os.environ.get('SQLITE_CACHE_SIZE', '-65536')  # отрицательное - в КиБ (64 МиБ)
+    
+    # Реплики для чтения: список URL через запятую; пусто - все запросы идут на основную БД
+    SQLALCHEMY_REPLICA_URIS = [uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()]
+    REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 5))  # секунд, при большем отставании чтение идет с основной БД
+    REPLICA_LAG_CHECK_INTERVAL = float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 5))
+    
+    # Swagger UI (/api/docs) и спецификация (/api/swagger.json); False - не регистрируются
+    API_DOCS = os.environ.get('API_DOCS', 'True').lower() == 'true'
+    
+    # Метрики Prometheus (/metrics); METRICS_DIR - общий каталог значений воркеров Gunicorn/Uvicorn,
+    # пусто - значения в памяти процесса. При заданном METRICS_TOKEN нужен заголовок Authorization: Bearer <токен>
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_DIR = os.environ.get('METRICS_DIR', '')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+    
+    # Профилирование запросов: доля случайных запросов и/или запросы с заголовком X-Profile-Token = PROFILER_TOKEN
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0) or 0)
+    PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN', '')
+    PROFILER_MODE = os.environ.get('PROFILER_MODE', 'sampler').lower()  # sampler или cprofile
+    PROFILER_INTERVAL = float(os.environ.get('PROFILER_INTERVAL', 0.005))  # секунд между снимками стека
+    PROFILER_DIR = os.environ.get('PROFILER_DIR', os.path.join('logs', 'profiles'))
+    PROFILER_MAX_FILES = int(os.environ.get('PROFILER_MAX_FILES', 100))  # профилей на маршрут
+    
+    # Счетчик SQL-запросов за HTTP-запрос: заголовки X-DB-Query-* (по умолчанию в development),
+    # запись в лог при превышении порогов не чаще раза в QUERY_LOG_INTERVAL секунд на маршрут
+    QUERY_COUNTER_HEADERS = os.environ.get('QUERY_COUNTER_HEADERS', 'False').lower() == 'true'
+    QUERY_COUNT_WARN = int(os.environ.get('QUERY_COUNT_WARN', 50))  # запросов за HTTP-запрос (0 - не проверять)
+    QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', 5))  # повторов одной формы запроса - N+1
+    QUERY_LOG_INTERVAL = int(os.environ.get('QUERY_LOG_INTERVAL', 300))
+    
+    # ASGI-режим (asgi.py, run_prod_asgi.py): /login, /refresh и /me обслуживаются асинхронно,
+    # остальные маршруты - Flask в пуле потоков
+    ASGI_NATIVE_ROUTES = os.environ.get('ASGI_NATIVE_ROUTES', 'True').lower() == 'true'
+    # URL асинхронного драйвера; пусто - выводится из URL основной БД (sqlite+aiosqlite, postgresql+psycopg)
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL', '')
+    ASGI_HASH_WORKERS = int(os.environ.get('ASGI_HASH_WORKERS') or os.cpu_count() or 1)  # потоков хеширования паролей
+    ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 20))  # потоков для синхронных маршрутов Flask
     
     # Настройки для отправки email
     SMTP_SERVER = os.environ.get('SMTP_SERVER')
     SMTP_PORT = int(os.environ.get('SMTP_PORT', 465))
     SMTP_USERNAME = os.environ.get('SMTP_USERNAME')
     SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD')
+    SMTP_USE_TLS = os.environ.get('SMTP_USE_TLS', 'True').lower() == 'true'  # STARTTLS для портов, отличных от 465
+    SMTP_TIMEOUT = int(os.environ.get('SMTP_TIMEOUT', 10))
+    # Транспорт писем: thread (поток на письмо) или asyncio (общий цикл событий и пул соединений)
+    MAIL_TRANSPORT = os.environ.get('MAIL_TRANSPORT', 'thread').lower()
+    SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', 4))
+    SMTP_POOL_IDLE_TIMEOUT = int(os.environ.get('SMTP_POOL_IDLE_TIMEOUT', 30))
+    SMTP_MAX_PENDING = int(os.environ.get('SMTP_MAX_PENDING', 10000))
     SENDER_EMAIL = os.environ.get('SENDER_EMAIL')
     FRONTEND_URL = os.environ.get('FRONTEND_URL')
     
+    # Логирование: уровень, файл (пусто - только stderr), формат json/text. Запись выполняет
+    # отдельный поток; при переполнении очереди (LOG_QUEUE_SIZE) сообщения отбрасываются
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_FILE = os.environ.get('LOG_FILE', 'logs/app.log')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    # Ограничение DEBUG/INFO на логгер: записей в секунду (0 - без ограничения) и запас
+    LOG_RATE_LIMIT = float(os.environ.get('LOG_RATE_LIMIT', 50))
+    LOG_RATE_BURST = int(os.environ.get('LOG_RATE_BURST', 200))
+    # Выборка DEBUG/INFO для шумных логгеров: 'логгер:доля,...'
+    LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', 'sqlalchemy.pool:0.01,app.utils.db_pool.InstrumentedQueuePool:0.01')
+    
     # Настройки для токенов
     TOKEN_SALT = os.environ.get('TOKEN_SALT')
     TOKEN_LIFETIME = int(os.environ.get('TOKEN_LIFETIME', 86400))
+    # Окно схлопывания повторных запросов сброса пароля на один email, секунд (0 - отключено)
+    PASSWORD_RESET_COALESCE_WINDOW = int(os.environ.get('PASSWORD_RESET_COALESCE_WINDOW', 300))
 
 class DevelopmentConfig(Config):
     """Конфигурация для разработки"""
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE_URL')
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+    QUERY_COUNTER_HEADERS = os.environ.get('QUERY_COUNTER_HEADERS', 'True').lower() == 'true'
 
 class ProductionConfig(Config):
     """Конфигурация для продакшена"""
@@ -0,0 +1,61 @@
+"""Password token tables
+
+Одноразовые nonce токенов установки пароля и окно схлопывания запросов сброса пароля.
+Их не было в схеме db.create_all() прежней версии, поэтому они создаются отдельно от
+0001_initial: БД, помеченная 'flask db stamp 0001_initial', получает их при upgrade.
+
+Revision ID: 0001a_password_tables
+Revises: 0001_initial
+Create Date: 2026-10-19 19:40:12.318540
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001a_password_tables'
+down_revision = '0001_initial'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('password_reset_throttle',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted', sa.Boolean(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key', name='password_reset_throttle_key_key')
+    )
+    with op.batch_alter_table('password_reset_throttle', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_password_reset_throttle_expires_at'), ['expires_at'], unique=False)
+
+    op.create_table('used_password_token',
+    sa.Column('nonce', sa.String(length=16), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('nonce', name='used_password_token_nonce_key')
+    )
+    with op.batch_alter_table('used_password_token', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_used_password_token_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('used_password_token', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_used_password_token_expires_at'))
+
+    op.drop_table('used_password_token')
+    with op.batch_alter_table('password_reset_throttle', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_password_reset_throttle_expires_at'))
+
+    op.drop_table('password_reset_throttle')
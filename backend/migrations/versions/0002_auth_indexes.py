@@ -0,0 +1,59 @@
+"""Indexes for auth hot paths
+
+Индексы для поиска сессий пользователя, очистки истекших сессий, фильтрации
+удаленных пользователей и внешних ключей таблиц истории.
+
+Revision ID: 0002_auth_indexes
+Revises: 0001a_password_tables
+Create Date: 2026-10-19 18:26:10.582421
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_auth_indexes'
+down_revision = '0001a_password_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('role_history', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_role_history_changed_by_id'), ['changed_by_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_role_history_role_id'), ['role_id'], unique=False)
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_deleted', ['deleted'], unique=False)
+
+    with op.batch_alter_table('user_history', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_history_changed_by_id'), ['changed_by_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_history_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('user_role', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_role_role_id'), ['role_id'], unique=False)
+
+    with op.batch_alter_table('user_session', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_session_expires_at'), ['expires_at'], unique=False)
+        batch_op.create_index('ix_user_session_user_id_is_active', ['user_id', 'is_active'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_session', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_session_user_id_is_active')
+        batch_op.drop_index(batch_op.f('ix_user_session_expires_at'))
+
+    with op.batch_alter_table('user_role', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_role_role_id'))
+
+    with op.batch_alter_table('user_history', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_history_user_id'))
+        batch_op.drop_index(batch_op.f('ix_user_history_changed_by_id'))
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_deleted')
+
+    with op.batch_alter_table('role_history', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_role_history_role_id'))
+        batch_op.drop_index(batch_op.f('ix_role_history_changed_by_id'))
+
@@ -0,0 +1,41 @@
+"""Partial unique indexes for live users
+
+Уникальность email и username проверяется только среди неудаленных пользователей:
+мягко удаленная учетная запись не блокирует повторную регистрацию, а поиск
+по email/username использует частичный индекс.
+
+Revision ID: 0003_soft_delete_unique
+Revises: 0002_auth_indexes
+Create Date: 2026-10-19 18:28:36.516992
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_soft_delete_unique'
+down_revision = '0002_auth_indexes'
+branch_labels = None
+depends_on = None
+
+# Имена, которые PostgreSQL назначает уникальным ограничениям по умолчанию. В SQLite, где таблицы
+# создал db.create_all(), ограничения безымянные: при пересоздании таблицы в batch-режиме
+# отраженные ограничения получают имена по этому шаблону и удаляются по ним
+NAMING_CONVENTION = {'uq': '%(table_name)s_%(column_0_name)s_key'}
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(batch_op.f('user_email_key'), type_='unique')
+        batch_op.drop_constraint(batch_op.f('user_username_key'), type_='unique')
+        batch_op.create_index('uq_user_email_live', ['email'], unique=True, postgresql_where=sa.text('deleted = false'), sqlite_where=sa.text('deleted = 0'), mssql_where=sa.text('deleted = 0'))
+        batch_op.create_index('uq_user_username_live', ['username'], unique=True, postgresql_where=sa.text('deleted = false'), sqlite_where=sa.text('deleted = 0'), mssql_where=sa.text('deleted = 0'))
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('uq_user_username_live', postgresql_where=sa.text('deleted = false'), sqlite_where=sa.text('deleted = 0'), mssql_where=sa.text('deleted = 0'))
+        batch_op.drop_index('uq_user_email_live', postgresql_where=sa.text('deleted = false'), sqlite_where=sa.text('deleted = 0'), mssql_where=sa.text('deleted = 0'))
+        batch_op.create_unique_constraint(batch_op.f('user_username_key'), ['username'])
+        batch_op.create_unique_constraint(batch_op.f('user_email_key'), ['email'])
@@ -0,0 +1,43 @@
+"""Allow system actor in history
+
+changed_by_id в таблицах истории допускает NULL: изменения без пользователя
+(CLI-команды, фоновые задачи) записываются как системные.
+
+Revision ID: 0004_history_system_actor
+Revises: 0003_soft_delete_unique
+Create Date: 2026-10-19 18:30:22.453746
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_history_system_actor'
+down_revision = '0003_soft_delete_unique'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('role_history', schema=None) as batch_op:
+        batch_op.alter_column('changed_by_id',
+               existing_type=sa.INTEGER(),
+               nullable=True)
+
+    with op.batch_alter_table('user_history', schema=None) as batch_op:
+        batch_op.alter_column('changed_by_id',
+               existing_type=sa.INTEGER(),
+               nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user_history', schema=None) as batch_op:
+        batch_op.alter_column('changed_by_id',
+               existing_type=sa.INTEGER(),
+               nullable=False)
+
+    with op.batch_alter_table('role_history', schema=None) as batch_op:
+        batch_op.alter_column('changed_by_id',
+               existing_type=sa.INTEGER(),
+               nullable=False)
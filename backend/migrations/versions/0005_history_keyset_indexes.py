@@ -0,0 +1,40 @@
+"""Composite indexes for history queries
+
+Составные индексы (субъект, timestamp) и (changed_by_id, timestamp) под выборки
+истории с keyset-пагинацией; одиночные индексы по тем же колонкам заменяются,
+так как покрываются ведущей колонкой составных. Новые индексы создаются до
+удаления старых, чтобы внешние ключи не оставались без индекса.
+
+Revision ID: 0005_history_keyset_indexes
+Revises: 0004_history_system_actor
+Create Date: 2026-10-19 18:31:53.901674
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_history_keyset_indexes'
+down_revision = '0004_history_system_actor'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, subject in (('role_history', 'role_id'), ('user_history', 'user_id')):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(f'ix_{table}_{subject}_timestamp', [subject, 'timestamp'], unique=False)
+            batch_op.create_index(f'ix_{table}_changed_by_id_timestamp', ['changed_by_id', 'timestamp'], unique=False)
+            batch_op.create_index(f'ix_{table}_timestamp', ['timestamp'], unique=False)
+            batch_op.drop_index(batch_op.f(f'ix_{table}_{subject}'))
+            batch_op.drop_index(batch_op.f(f'ix_{table}_changed_by_id'))
+
+
+def downgrade():
+    for table, subject in (('user_history', 'user_id'), ('role_history', 'role_id')):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(batch_op.f(f'ix_{table}_changed_by_id'), ['changed_by_id'], unique=False)
+            batch_op.create_index(batch_op.f(f'ix_{table}_{subject}'), [subject], unique=False)
+            batch_op.drop_index(f'ix_{table}_timestamp')
+            batch_op.drop_index(f'ix_{table}_changed_by_id_timestamp')
+            batch_op.drop_index(f'ix_{table}_{subject}_timestamp')
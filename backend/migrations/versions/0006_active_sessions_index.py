@@ -0,0 +1,31 @@
+"""Index for active session listing
+
+Индекс (user_id, is_active, expires_at) под список активных неистекших сессий
+с сортировкой по expires_at; заменяет (user_id, is_active). Новый индекс
+создается до удаления старого, чтобы внешний ключ user_id не оставался без индекса.
+
+Revision ID: 0006_active_sessions_index
+Revises: 0005_history_keyset_indexes
+Create Date: 2026-10-19 18:48:11.717243
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_active_sessions_index'
+down_revision = '0005_history_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_session', schema=None) as batch_op:
+        batch_op.create_index('ix_user_session_user_id_is_active_expires_at', ['user_id', 'is_active', 'expires_at'], unique=False)
+        batch_op.drop_index('ix_user_session_user_id_is_active')
+
+
+def downgrade():
+    with op.batch_alter_table('user_session', schema=None) as batch_op:
+        batch_op.create_index('ix_user_session_user_id_is_active', ['user_id', 'is_active'], unique=False)
+        batch_op.drop_index('ix_user_session_user_id_is_active_expires_at')
@@ -0,0 +1,43 @@
+"""
+Скрипт запуска приложения в production режиме через Uvicorn (ASGI)
+
+Параметры Uvicorn (bind, процессы, лимиты соединений) задаются профилем сервера:
+см. server_profile.py
+"""
+import os
+import uvicorn
+from dotenv import load_dotenv
+from server_profile import load_profile, print_profile
+
+if __name__ == '__main__':
+    # Загрузка переменных окружения
+    load_dotenv()
+    
+    # Установка переменных окружения для production
+    os.environ['FLASK_ENV'] = 'production'
+    os.environ['FLASK_DEBUG'] = '0'
+    os.environ.setdefault('FLASK_CONFIG', 'production')
+    # Значения метрик процессов Uvicorn собираются в общем каталоге
+    os.environ.setdefault('METRICS_DIR', os.path.join('logs', 'metrics'))
+    
+    profile, sources = load_profile('uvicorn')
+    print_profile('uvicorn', profile, sources)
+    host, _, port = profile['bind'].rpartition(':')
+    
+    # Значения метрик прошлого запуска удаляются до старта процессов
+    from app.utils.metrics import clear_metrics_dir
+    clear_metrics_dir(os.environ['METRICS_DIR'])
+    
+    # Приложение импортируется в каждом процессе Uvicorn (asgi.py)
+    uvicorn.run(
+        'asgi:app',
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=host or '0.0.0.0',
+        port=int(port),
+        workers=profile['workers'],
+        backlog=profile['backlog'],
+        timeout_keep_alive=profile['timeout_keep_alive'],
+        limit_concurrency=profile['limit_concurrency'] or None,
+        limit_max_requests=profile['limit_max_requests'] or None,
+        log_level=profile['loglevel'],
+    )
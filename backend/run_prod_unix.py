@@ -1,14 +1,37 @@
 """
 Скрипт запуска приложения в production режиме
+
+Параметры Gunicorn (bind, воркеры, потоки, таймауты) задаются профилем сервера:
+см. server_profile.py. Режим воркеров - GUNICORN_WORKER_CLASS:
+    sync    - процесс на запрос (по умолчанию)
+    gthread - несколько потоков в процессе
+    gevent  - гринлеты: ожидание SMTP и БД не блокирует процесс
 """
 import os
-import multiprocessing
+from dotenv import load_dotenv
+from server_profile import load_profile, print_profile
+
+# Загрузка переменных окружения и профиля до выбора режима воркеров
+load_dotenv()
+# Значения метрик воркеров собираются в общем каталоге (читается конфигурацией при импорте приложения)
+os.environ.setdefault('METRICS_DIR', os.path.join('logs', 'metrics'))
+PROFILE, PROFILE_SOURCES = load_profile('gunicorn')
+WORKER_CLASS = PROFILE['worker_class']
+
+if WORKER_CLASS == 'gevent':
+    # Патчинг стандартной библиотеки должен пройти до импорта приложения и его зависимостей,
+    # иначе при preload_app мастер успеет создать непропатченные сокеты и блокировки
+    from gevent import monkey
+    monkey.patch_all()
+
 from gunicorn.app.base import BaseApplication
 from app import create_app
+from app.utils.db_pool import dispose_engines
+from app.utils.metrics import clear_metrics_dir, mark_process_dead
 
 class GunicornApplication(BaseApplication):
     """Класс для настройки и запуска Gunicorn"""
-    
+
     def __init__(self, app, options=None):
         self.options = options or {}
         self.application = app
@@ -24,33 +47,47 @@ class GunicornApplication(BaseApplication):
         """Загрузка WSGI приложения"""
         return self.application
 
+def post_fork(server, worker):
+    """
+    Хук Gunicorn после fork воркера: пулы соединений, унаследованные от мастера
+    (db.create_all и проверки при preload_app), сбрасываются без закрытия сокетов родителя
+    """
+    dispose_engines(close=False)
+
+def child_exit(server, worker):
+    """Хук Gunicorn после завершения воркера: его датчики больше не входят в сумму /metrics"""
+    mark_process_dead(worker.pid)
+
 if __name__ == '__main__':
     # Установка переменных окружения для production
     os.environ['FLASK_ENV'] = 'production'
     os.environ['FLASK_DEBUG'] = '0'
-    
+
+    if WORKER_CLASS == 'gevent':
+        from app.utils.green import install_green_drivers
+        install_green_drivers()
+
+    # Значения метрик прошлого запуска (PID воркеров могли повториться) удаляются до старта
+    clear_metrics_dir(os.environ['METRICS_DIR'])
+
     # Создание экземпляра приложения
     app = create_app('production')
-    
-    # Настройки Gunicorn
+
+    # Настройки Gunicorn: профиль сервера и неизменяемые параметры запуска
     options = {
-        'bind': '0.0.0.0:7020',
-        'workers': multiprocessing.cpu_count() * 2 + 1,
-        'worker_class': 'sync',
-        'timeout': 120,
-        'keepalive': 5,
-        'max_requests': 1000,
-        'max_requests_jitter': 50,
-        'accesslog': 'logs/access.log',
-        'errorlog': 'logs/error.log',
-        'loglevel': 'info',
+        **PROFILE,
         'capture_output': True,
         'enable_stdio_inheritance': True,
-        'preload_app': True
+        'preload_app': True,
+        'post_fork': post_fork,
+        'child_exit': child_exit
     }
-    
+    print_profile('gunicorn', PROFILE, PROFILE_SOURCES)
+
     # Создание директории для логов
-    os.makedirs('logs', exist_ok=True)
-    
+    for log_path in (PROFILE['accesslog'], PROFILE['errorlog']):
+        if log_path and log_path != '-' and os.path.dirname(log_path):
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+
     # Запуск приложения через Gunicorn
     GunicornApplication(app, options).run()
@@ -1,12 +1,15 @@
 """
 Скрипт запуска приложения в production режиме для Windows
+
+Параметры Waitress (bind, потоки, лимит соединений, буферы) задаются профилем сервера:
+см. server_profile.py
 """
 import os
 import logging
-import multiprocessing
 from waitress import serve
 from app import create_app
 from dotenv import load_dotenv
+from server_profile import load_profile, print_profile
 
 class WaitressApplication:
     """Класс для настройки и запуска Waitress"""
@@ -53,17 +56,20 @@ class WaitressApplication:
             host, port = bind, 7020
         
         print(f"Запуск сервера на http://{host}:{port}")
-        print(f"Количество потоков: {self.options.get('workers', 4)}")
         
-        # Запуск приложения через Waitress
+        # Запуск приложения через Waitress: один процесс, конкурентность - потоки
         serve(
             self.application,
             host=host,
             port=port,
-            threads=self.options.get('workers', 4),
-            connection_limit=self.options.get('max_requests', 1000),
-            channel_timeout=self.options.get('timeout', 120),
-            cleanup_interval=30,
+            threads=self.options['threads'],
+            connection_limit=self.options['connection_limit'],
+            backlog=self.options['backlog'],
+            recv_bytes=self.options['recv_bytes'],
+            send_bytes=self.options['send_bytes'],
+            asyncore_use_poll=self.options['asyncore_use_poll'],
+            channel_timeout=self.options['timeout'],
+            cleanup_interval=self.options['cleanup_interval'],
             url_scheme='http'
         )
 
@@ -78,17 +84,9 @@ if __name__ == '__main__':
     # Создание экземпляра приложения
     app = create_app('production')
     
-    # Настройки (аналогично Gunicorn)
-    options = {
-        'bind': '0.0.0.0:7020',
-        'workers': multiprocessing.cpu_count() * 2 + 1,
-        'timeout': 120,
-        'max_requests': 1000,
-        'accesslog': 'logs/access.log',
-        'errorlog': 'logs/error.log',
-        'loglevel': 'info',
-        'capture_output': True,
-    }
+    # Настройки Waitress из профиля сервера
+    options, sources = load_profile('waitress')
+    print_profile('waitress', options, sources)
     
     # Создание директории для логов
     os.makedirs('logs', exist_ok=True)
@@ -0,0 +1,158 @@
+"""
+Нагрузочный замер почтового тракта: send_password_set_email -> локальный SMTP-приемник
+
+Пример:
+    python scripts/bench_email.py --rate 50 --duration 10 --latency 0.2 --failure-rate 0.05
+"""
+import sys
+import os
+import json
+import time
+import argparse
+
+# Добавляем путь к директории backend в sys.path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+from flask import Flask
+from config import config
+from app.utils.smtp_sink import running_smtp_sink
+from app.utils.email import send_password_set_email
+
+
+def percentile(values, pct):
+    """Перцентиль по отсортированному списку (nearest-rank)"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, int(round(pct / 100.0 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def build_app(sink, args):
+    """Минимальное Flask-приложение с конфигурацией проекта, направленной на приемник"""
+    app = Flask('bench_email')
+    app.config.from_object(config[args.config])
+    app.config.update(
+        SMTP_SERVER=sink.host,
+        SMTP_PORT=sink.port,
+        SMTP_USE_TLS=False,
+        SMTP_USERNAME='bench@localhost',
+        SMTP_PASSWORD='bench',
+        SENDER_EMAIL='bench@localhost',
+        SMTP_TIMEOUT=args.smtp_timeout,
+        MAIL_TRANSPORT=args.transport,
+        SMTP_POOL_SIZE=args.pool_size,
+        TOKEN_SALT=app.config.get('TOKEN_SALT') or 'bench-salt',
+        SECRET_KEY=app.config.get('SECRET_KEY') or 'bench-secret',
+        FRONTEND_URL='http://localhost:3000',
+    )
+    return app
+
+
+def run(args):
+    sink_options = dict(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate, seed=args.seed)
+    with running_smtp_sink(**sink_options) as sink:
+        app = build_app(sink, args)
+        total = int(args.rate * args.duration)
+        interval = 1.0 / args.rate
+        submitted_at = {}
+        submit_latencies = []
+        submit_failures = 0
+
+        started = time.perf_counter()
+        wall_started = time.time()
+        for i in range(total):
+            # Равномерная подача с заданной интенсивностью (open-loop)
+            target = started + i * interval
+            delay = target - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+            email = f"bench-{i}@example.test"
+            with app.test_request_context('/api/auth/reset-password', method='POST'):
+                t0 = time.perf_counter()
+                submitted_at[email] = time.time()
+                ok = send_password_set_email(email, f"Bench {i}", i + 1, is_reset=True)
+                submit_latencies.append(time.perf_counter() - t0)
+            if not ok:
+                submit_failures += 1
+        submit_elapsed = time.perf_counter() - started
+
+        # Ждем, пока фоновые отправки дойдут до приемника или будут отклонены
+        drain_deadline = time.monotonic() + args.drain_timeout
+        while time.monotonic() < drain_deadline:
+            if sink.stats.accepted + sink.stats.rejected >= total - submit_failures:
+                break
+            time.sleep(0.05)
+
+        delivered_latencies = []
+        last_received = wall_started
+        for received in list(sink.messages):
+            for rcpt in received.rcpt_tos:
+                if rcpt in submitted_at:
+                    delivered_latencies.append(received.received_at - submitted_at[rcpt])
+                    last_received = max(last_received, received.received_at)
+        delivered_latencies.sort()
+        submit_latencies.sort()
+        delivery_window = max(last_received - wall_started, 1e-9)
+
+        return {
+            'transport': args.transport,
+            'rate': args.rate,
+            'duration': args.duration,
+            'sink': sink_options,
+            'submitted': total,
+            'submit_failures': submit_failures,
+            'delivered': len(delivered_latencies),
+            'rejected_by_sink': sink.stats.rejected,
+            'lost': total - submit_failures - len(delivered_latencies) - sink.stats.rejected,
+            'smtp_connections': sink.stats.connections,
+            'achieved_submit_rate': total / submit_elapsed if submit_elapsed else None,
+            'delivered_per_sec': len(delivered_latencies) / delivery_window,
+            'delivery_latency_ms': {
+                name: (percentile(delivered_latencies, pct) or 0) * 1000
+                for name, pct in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))
+            },
+            'submit_latency_ms': {
+                name: (percentile(submit_latencies, pct) or 0) * 1000
+                for name, pct in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))
+            },
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер пропускной способности отправки писем')
+    parser.add_argument('--rate', type=float, default=20, help='Писем в секунду')
+    parser.add_argument('--duration', type=float, default=5, help='Длительность подачи, секунд')
+    parser.add_argument('--latency', type=float, default=0.0, help='Задержка приемника на DATA, секунд')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Случайная добавка к задержке, секунд')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Доля отклоняемых писем (0..1)')
+    parser.add_argument('--smtp-timeout', type=float, default=10, help='SMTP_TIMEOUT приложения, секунд')
+    parser.add_argument('--drain-timeout', type=float, default=30, help='Ожидание доставки после подачи, секунд')
+    parser.add_argument('--transport', choices=['thread', 'asyncio'], default='thread', help='Транспорт писем (MAIL_TRANSPORT)')
+    parser.add_argument('--pool-size', type=int, default=4, help='SMTP_POOL_SIZE для транспорта asyncio')
+    parser.add_argument('--config', default='development', help='Имя конфигурации приложения')
+    parser.add_argument('--seed', type=int, default=None, help='Seed для имитации отказов')
+    parser.add_argument('--json', dest='json_path', help='Сохранить результат в JSON-файл')
+    args = parser.parse_args()
+
+    result = run(args)
+
+    print(f"Транспорт: {result['transport']}")
+    print(f"Подано: {result['submitted']} писем за {args.duration} с "
+          f"({result['achieved_submit_rate']:.1f}/с, ошибок постановки: {result['submit_failures']})")
+    print(f"Доставлено: {result['delivered']} ({result['delivered_per_sec']:.1f}/с), "
+          f"отклонено приемником: {result['rejected_by_sink']}, потеряно: {result['lost']}")
+    print("Задержка доставки, мс: " + ', '.join(f"{k}={v:.1f}" for k, v in result['delivery_latency_ms'].items()))
+    print("Время вызова send_password_set_email, мс: "
+          + ', '.join(f"{k}={v:.2f}" for k, v in result['submit_latency_ms'].items()))
+    print(f"SMTP-соединений: {result['smtp_connections']}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"Результат сохранен в {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
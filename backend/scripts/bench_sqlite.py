@@ -0,0 +1,186 @@
+"""
+Нагрузочный замер входа в систему на SQLite: N процессов-воркеров одновременно
+вызывают POST /api/auth/login против одного файла БД
+
+Профили:
+    baseline - SQLITE_TUNING=False (журнал rollback, BEGIN DEFERRED)
+    tuned    - профиль SQLite приложения (WAL, PRAGMA, BEGIN IMMEDIATE)
+
+Пример:
+    python scripts/bench_sqlite.py --workers 8 --duration 10 --profile both
+"""
+import sys
+import os
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import multiprocessing
+
+# Добавляем путь к директории backend в sys.path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+PASSWORD = 'bench-password'
+
+
+def percentile(values, pct):
+    """Перцентиль по отсортированному списку (nearest-rank)"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, int(round(pct / 100.0 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def profile_env(profile, database_path):
+    """Переменные окружения приложения для профиля"""
+    return {
+        'DEV_DATABASE_URL': f'sqlite:///{database_path}',
+        'SECRET_KEY': os.environ.get('SECRET_KEY', 'bench-secret'),
+        'JWT_SECRET_KEY': os.environ.get('JWT_SECRET_KEY', 'bench-jwt-secret-' + '0' * 32),
+        'DB_CREATE_ALL': 'True',
+        'SQLITE_TUNING': 'True' if profile == 'tuned' else 'False',
+    }
+
+
+def _create_app(env):
+    os.environ.update(env)
+    from app import create_app
+    app = create_app('development')
+    # Замеряется работа с БД, а не запись отладочного лога
+    logging.disable(logging.WARNING)
+    return app
+
+
+def seed(env, users, hash_method):
+    """Создание схемы и пользователей (выполняется в отдельном процессе)"""
+    app = _create_app(env)
+    from werkzeug.security import generate_password_hash
+    from app.extensions import db
+    from app.models.auth import User
+
+    password_hash = generate_password_hash(PASSWORD, method=hash_method)
+    with app.app_context():
+        db.session.add_all([
+            User(email=f'bench-{i}@example.test', username=f'bench{i}', password_hash=password_hash, is_active=True)
+            for i in range(users)
+        ])
+        db.session.commit()
+
+
+def worker(env, index, users, barrier, duration, results):
+    """Цикл входов одного воркера"""
+    app = _create_app(env)
+    client = app.test_client()
+    latencies = []
+    statuses = {}
+    errors = {}
+
+    # Прогрев (разбор User-Agent, компиляция запросов), затем одновременный старт всех воркеров
+    client.post('/api/auth/login', json={'email': f'bench-{index % users}@example.test', 'password': PASSWORD})
+    barrier.wait()
+    deadline = time.time() + duration
+    i = index
+    while time.time() < deadline:
+        email = f'bench-{i % users}@example.test'
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            response = client.post('/api/auth/login', json={'email': email, 'password': PASSWORD})
+            status = response.status_code
+        except Exception as e:
+            # В режиме отладки исключения (например, "database is locked") пробрасываются в клиент
+            status = 500
+            key = str(e).splitlines()[0][:120]
+            errors[key] = errors.get(key, 0) + 1
+        latencies.append(time.perf_counter() - t0)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    results.put({'latencies': latencies, 'statuses': statuses, 'errors': errors})
+
+
+def run_profile(profile, args):
+    workdir = tempfile.mkdtemp(prefix='bench-sqlite-')
+    try:
+        env = profile_env(profile, os.path.join(workdir, 'bench.db'))
+        ctx = multiprocessing.get_context('spawn')
+
+        setup = ctx.Process(target=seed, args=(env, args.users, args.hash_method))
+        setup.start()
+        setup.join()
+        if setup.exitcode != 0:
+            raise RuntimeError('Не удалось подготовить БД')
+
+        results = ctx.Queue()
+        barrier = ctx.Barrier(args.workers)
+        processes = [
+            ctx.Process(target=worker, args=(env, index, args.users, barrier, args.duration, results))
+            for index in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = sorted(latency for result in collected for latency in result['latencies'])
+    statuses = {}
+    errors = {}
+    for result in collected:
+        for status, count in result['statuses'].items():
+            statuses[status] = statuses.get(status, 0) + count
+        for error, count in result['errors'].items():
+            errors[error] = errors.get(error, 0) + count
+
+    ok = statuses.get(200, 0)
+    return {
+        'profile': profile,
+        'workers': args.workers,
+        'duration': args.duration,
+        'requests': len(latencies),
+        'ok': ok,
+        'failed': len(latencies) - ok,
+        'logins_per_sec': ok / args.duration,
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'errors': errors,
+        'latency_ms': {
+            name: (percentile(latencies, pct) or 0) * 1000
+            for name, pct in (('p50', 50), ('p95', 95), ('p99', 99), ('max', 100))
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер входов в секунду на SQLite под N воркерами')
+    parser.add_argument('--workers', type=int, default=4, help='Количество процессов-воркеров')
+    parser.add_argument('--duration', type=float, default=10, help='Длительность замера, секунд')
+    parser.add_argument('--users', type=int, default=100, help='Количество пользователей в БД')
+    parser.add_argument('--hash-method', default='pbkdf2:sha256:1000',
+                        help='Метод хеширования паролей тестовых пользователей (дешевый - чтобы нагрузить БД)')
+    parser.add_argument('--profile', choices=['baseline', 'tuned', 'both'], default='both', help='Профиль SQLite')
+    parser.add_argument('--json', dest='json_path', help='Сохранить результат в JSON-файл')
+    args = parser.parse_args()
+
+    profiles = ['baseline', 'tuned'] if args.profile == 'both' else [args.profile]
+    results = []
+    for profile in profiles:
+        result = run_profile(profile, args)
+        results.append(result)
+        print(f"Профиль {result['profile']}: {result['workers']} воркеров, {result['duration']} с")
+        print(f"  Успешных входов: {result['ok']} ({result['logins_per_sec']:.1f}/с), ошибок: {result['failed']}")
+        print("  Задержка, мс: " + ', '.join(f"{k}={v:.1f}" for k, v in result['latency_ms'].items()))
+        for error, count in result['errors'].items():
+            print(f"  {count} x {error}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Результат сохранен в {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Бюджет времени старта: импорт и создание приложения в чистом процессе Python
+с `-X importtime`, самые дорогие пакеты и сравнение с бюджетом
+
+Цели:
+    app  - from app import create_app; create_app() (старт воркера)
+    cli  - flask --app app:create_app make-admin --help (старт CLI-команды)
+
+Пример:
+    python scripts/import_budget.py --target app --budget-ms 600
+    python scripts/import_budget.py --target cli --top 30 --json import.json
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import subprocess
+
+# Добавляем путь к директории backend в sys.path
+backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, backend_path)
+
+APP_CODE = (
+    "import time, sys; started = time.perf_counter(); "
+    "from app import create_app; imported = time.perf_counter(); "
+    "create_app({config!r}); "
+    "print('BOOT', imported - started, time.perf_counter() - imported, file=sys.stderr)"
+)
+
+
+def parse_importtime(stderr):
+    """
+    Разбор вывода -X importtime
+    :return: список (модуль, собственное время мкс, накопленное время мкс)
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def by_package(modules):
+    """Собственное время импорта, сгруппированное по пакету верхнего уровня, мкс"""
+    packages = {}
+    for name, self_us, _ in modules:
+        package = name.split('.')[0]
+        count, total = packages.get(package, (0, 0))
+        packages[package] = (count + 1, total + self_us)
+    return sorted(packages.items(), key=lambda item: -item[1][1])
+
+
+def run_target(args):
+    """Запуск цели в отдельном процессе, чтобы не было уже импортированных модулей"""
+    env = dict(os.environ)
+    env.setdefault('SECRET_KEY', 'import-budget')
+    env.setdefault('DEV_DATABASE_URL', 'sqlite://')
+    env.setdefault('DATABASE_URL', env['DEV_DATABASE_URL'])
+    # Логи старта не должны попадать в вывод importtime
+    env.setdefault('LOG_FILE', '')
+    env.setdefault('LOG_LEVEL', 'WARNING')
+    if args.target == 'app':
+        command = [sys.executable, '-X', 'importtime', '-c', APP_CODE.format(config=args.config)]
+    else:
+        command = [sys.executable, '-X', 'importtime', '-m', 'flask', '--app', f"app:create_app('{args.config}')",
+                   'make-admin', '--help']
+
+    started = time.perf_counter()
+    result = subprocess.run(command, cwd=backend_path, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"Команда завершилась с кодом {result.returncode}:\n{result.stderr[-2000:]}")
+
+    modules = parse_importtime(result.stderr)
+    boot = None
+    for line in result.stderr.splitlines():
+        if line.startswith('BOOT '):
+            _, import_s, create_s = line.split()
+            boot = {'import_ms': float(import_s) * 1000, 'create_app_ms': float(create_s) * 1000}
+    return {
+        'target': args.target,
+        'config': args.config,
+        'wall_ms': wall * 1000,
+        'import_ms': sum(self_us for _, self_us, _ in modules) / 1000,
+        'modules': len(modules),
+        'boot': boot,
+        'top': [
+            {'package': package, 'modules': count, 'self_ms': total / 1000}
+            for package, (count, total) in by_package(modules)[:args.top]
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Время импорта и старта приложения')
+    parser.add_argument('--target', choices=['app', 'cli'], default='app', help='Что запускать')
+    parser.add_argument('--config', default='production', help='Имя конфигурации приложения')
+    parser.add_argument('--top', type=int, default=20, help='Сколько самых дорогих пакетов показать')
+    parser.add_argument('--runs', type=int, default=3, help='Запусков (берется лучший)')
+    parser.add_argument('--budget-ms', type=float, help='Бюджет суммарного времени импорта; превышение - код выхода 1')
+    parser.add_argument('--json', dest='json_path', help='Сохранить результат в JSON-файл')
+    args = parser.parse_args()
+
+    result = min((run_target(args) for _ in range(args.runs)), key=lambda r: r['import_ms'])
+    print(f"Цель: {result['target']} ({result['config']}), модулей: {result['modules']}")
+    print(f"Импорт: {result['import_ms']:.0f} мс, процесс целиком: {result['wall_ms']:.0f} мс")
+    if result['boot']:
+        print(f"from app import: {result['boot']['import_ms']:.0f} мс, create_app: {result['boot']['create_app_ms']:.0f} мс")
+    print(f"{'пакет':<32}{'модулей':>10}{'импорт, мс':>14}")
+    for row in result['top']:
+        print(f"{row['package']:<32}{row['modules']:>10}{row['self_ms']:>14.1f}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"Результат сохранен в {args.json_path}")
+
+    if args.budget_ms is not None:
+        if result['import_ms'] > args.budget_ms:
+            print(f"Бюджет превышен: {result['import_ms']:.0f} мс > {args.budget_ms:.0f} мс")
+            sys.exit(1)
+        print(f"В пределах бюджета: {result['import_ms']:.0f} мс <= {args.budget_ms:.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Профиль production-сервера для run_prod_unix.py (Gunicorn), run_prod_windows.py (Waitress)
+и run_prod_asgi.py (Uvicorn).
+
+Значения берутся по возрастанию приоритета: значения по умолчанию, TOML-файл
+(SERVER_PROFILE_FILE, секции [server], [gunicorn], [waitress], [uvicorn]) и переменные окружения
+SERVER_<ПАРАМЕТР> для общих параметров, GUNICORN_/WAITRESS_/UVICORN_<ПАРАМЕТР> - для серверных.
+
+Модуль не импортирует приложение: run_prod_unix.py читает профиль до monkey-патчинга gevent.
+"""
+import os
+import multiprocessing
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+# Режимы воркеров Gunicorn
+WORKER_CLASSES = ('sync', 'gthread', 'gevent')
+
+# Параметры профиля: секция -> {параметр: значение по умолчанию}.
+# Тип значения по умолчанию задает приведение строк из окружения; None - целое число,
+# вычисляемое по режиму воркеров
+DEFAULTS = {
+    'server': {
+        'bind': '0.0.0.0:7020',
+        'timeout': 120,  # секунд: timeout воркера Gunicorn, channel_timeout Waitress
+        'accesslog': 'logs/access.log',
+        'errorlog': 'logs/error.log',
+        'loglevel': 'info',
+    },
+    'gunicorn': {
+        'worker_class': 'sync',
+        'workers': None,  # sync 2*CPU+1, gthread CPU+1, gevent CPU
+        'threads': None,  # gthread: 8
+        'worker_connections': None,  # gevent: 200
+        'backlog': 2048,
+        'keepalive': 5,
+        'graceful_timeout': 30,
+        'max_requests': 1000,  # перезапуск воркера после N запросов (0 - отключено)
+        'max_requests_jitter': 50,
+    },
+    'waitress': {
+        'threads': 8,  # потоков обработки запросов в единственном процессе
+        'connection_limit': 100,  # одновременных соединений, дальше - ожидание в backlog
+        'backlog': 1024,
+        'recv_bytes': 8192,
+        'send_bytes': 18000,
+        'asyncore_use_poll': True,  # poll() вместо select(): без ограничения в 512/1024 сокетов
+        'cleanup_interval': 30,
+    },
+    'uvicorn': {
+        'workers': 1,  # процессов; конкурентность внутри процесса - цикл событий
+        'backlog': 2048,
+        'timeout_keep_alive': 5,
+        'limit_concurrency': 0,  # одновременных соединений на процесс (0 - без ограничения)
+        'limit_max_requests': 0,  # перезапуск процесса после N запросов (0 - отключено)
+    },
+}
+
+# Серверы, для которых есть секция профиля
+SERVERS = ('gunicorn', 'waitress', 'uvicorn')
+
+
+def _coerce(value, default, name):
+    """Приведение строкового значения к типу значения по умолчанию"""
+    if not isinstance(value, str):
+        return value
+    if isinstance(default, bool):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    if isinstance(default, int) or default is None:
+        try:
+            return int(value)
+        except ValueError:
+            raise ValueError(f"Параметр {name} должен быть целым числом: {value!r}")
+    return value
+
+
+def _read_file(path):
+    """Чтение TOML-файла профиля"""
+    if tomllib is None:
+        raise RuntimeError("Для чтения SERVER_PROFILE_FILE нужен Python 3.11+ или пакет tomli")
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+
+def _gunicorn_concurrency(profile):
+    """Количество воркеров, потоков и соединений по режиму воркеров, если не заданы явно"""
+    cpu_count = multiprocessing.cpu_count()
+    worker_class = profile['worker_class']
+    if worker_class == 'gthread':
+        # Потоки делят пул соединений процесса: SQLALCHEMY_POOL_SIZE не меньше threads
+        profile['workers'] = profile['workers'] or cpu_count + 1
+        profile['threads'] = profile['threads'] or 8
+    elif worker_class == 'gevent':
+        # Один процесс на ядро; гринлеты ждут свободное соединение пула (SQLALCHEMY_POOL_TIMEOUT)
+        profile['workers'] = profile['workers'] or cpu_count
+        profile['worker_connections'] = profile['worker_connections'] or 200
+    else:
+        profile['workers'] = profile['workers'] or cpu_count * 2 + 1
+    # Неприменимые к режиму параметры не передаются серверу
+    return {key: value for key, value in profile.items() if value is not None}
+
+
+def load_profile(server, path=None, environ=None):
+    """
+    Загрузка профиля сервера
+    :param server: gunicorn, waitress или uvicorn
+    :param path: путь к TOML-файлу (по умолчанию SERVER_PROFILE_FILE)
+    :param environ: переменные окружения (по умолчанию os.environ)
+    :return: (словарь параметров, список источников значений)
+    """
+    if server not in SERVERS:
+        raise ValueError(f"Неизвестный сервер: {server}")
+    environ = os.environ if environ is None else environ
+    path = path or environ.get('SERVER_PROFILE_FILE')
+    data = _read_file(path) if path else {}
+
+    profile = {}
+    sources = ['defaults'] + ([path] if path else [])
+    env_used = False
+    for section in ('server', server):
+        file_section = data.get(section, {})
+        unknown = set(file_section) - set(DEFAULTS[section])
+        if unknown:
+            raise ValueError(f"Неизвестные параметры в [{section}] {path}: {', '.join(sorted(unknown))}")
+        for name, default in DEFAULTS[section].items():
+            value = file_section.get(name, default)
+            env_name = f"{section.upper()}_{name.upper()}"
+            if environ.get(env_name, '') != '':
+                value = environ[env_name]
+                env_used = True
+            profile[name] = _coerce(value, default, env_name)
+    if env_used:
+        sources.append('env')
+
+    if server == 'gunicorn':
+        profile['worker_class'] = str(profile['worker_class']).lower()
+        if profile['worker_class'] not in WORKER_CLASSES:
+            raise ValueError(f"Неизвестный режим воркеров: {profile['worker_class']} ({'/'.join(WORKER_CLASSES)})")
+        profile = _gunicorn_concurrency(profile)
+    return profile, sources
+
+
+def print_profile(server, profile, sources):
+    """
+    Вывод действующего профиля при запуске
+    :param server: gunicorn, waitress или uvicorn
+    :param profile: словарь параметров
+    :param sources: список источников значений
+    """
+    print(f"Профиль сервера {server} (источники: {', '.join(sources)}):")
+    for name in sorted(profile):
+        print(f"  {name} = {profile[name]}")
@@ -0,0 +1,64 @@
+"""
+Общие фикстуры тестов: приложение на временной БД SQLite и тестовый клиент (pytest-flask)
+"""
+import os
+import uuid
+import shutil
+import tempfile
+import pytest
+
+# Конфигурация читает окружение при импорте, поэтому переменные задаются до импорта приложения
+_workdir = tempfile.mkdtemp(prefix='authtemplate-tests-')
+os.environ['DEV_DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ['DB_CREATE_ALL'] = 'True'
+os.environ['LOG_FILE'] = ''
+os.environ['LOG_LEVEL'] = 'WARNING'
+os.environ['METRICS_DIR'] = ''
+os.environ.setdefault('SECRET_KEY', 'test-secret')
+os.environ.setdefault('JWT_SECRET_KEY', 'test-jwt-secret-' + '0' * 32)
+os.environ.setdefault('TOKEN_SALT', 'test-salt')
+
+from app import create_app
+
+PASSWORD = 'test-password'
+
+
+@pytest.fixture(scope='session')
+def app():
+    """Экземпляр приложения на временной БД (используется фикстурой client из pytest-flask)"""
+    app = create_app('development')
+    app.config['TESTING'] = True
+    yield app
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def _push_request_context():
+    """
+    pytest-flask держит контекст запроса открытым на время теста: запросы клиента
+    разделяли бы с ним g и сессию БД, и кэш сессии занижал бы число SQL-запросов
+    """
+    yield
+
+
+@pytest.fixture
+def user(client):
+    """Зарегистрированный пользователь: email, пароль и токены регистрации"""
+    name = f'user-{uuid.uuid4().hex[:12]}'
+    response = client.post('/api/auth/register', json={
+        'email': f'{name}@example.test', 'username': name, 'password': PASSWORD,
+    })
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+    return {
+        'id': body['user']['id'],
+        'email': f'{name}@example.test',
+        'password': PASSWORD,
+        'access_token': body['access_token'],
+        'refresh_token': body['refresh_token'],
+    }
+
+
+@pytest.fixture
+def auth_headers(user):
+    return {'Authorization': f"Bearer {user['access_token']}"}
@@ -0,0 +1,106 @@
+"""
+Нативные ASGI-обработчики (app.asgi.auth) отвечают так же, как ресурсы Flask через WSGI
+"""
+import asyncio
+import json
+import httpx
+import pytest
+from app.asgi import AsgiApplication
+from app.extensions import db
+from app.models.auth import User
+
+# Значения, различающиеся между двумя одинаковыми запросами
+VOLATILE_KEYS = {'access_token', 'refresh_token', 'last_login', 'updated_at'}
+
+JSON = {'Content-Type': 'application/json'}
+
+
+@pytest.fixture
+def asgi_app(app):
+    asgi_app = AsgiApplication(app)
+    yield asgi_app
+    asgi_app.hash_executor.shutdown()
+
+
+def normalize(value):
+    if isinstance(value, dict):
+        return {key: '<volatile>' if key in VOLATILE_KEYS else normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [normalize(item) for item in value]
+    return value
+
+
+def parse(status, body):
+    try:
+        return status, normalize(json.loads(body))
+    except ValueError:
+        return status, body
+
+
+def wsgi_response(client, method, path, headers, body):
+    response = client.open(path, method=method, headers=headers, data=body)
+    return parse(response.status_code, response.get_data())
+
+
+def asgi_response(asgi_app, method, path, headers, body):
+    async def run():
+        transport = httpx.ASGITransport(app=asgi_app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url='http://localhost') as client:
+                return await client.request(method, path, headers=headers, content=body)
+        finally:
+            # Соединения aiosqlite привязаны к циклу событий asyncio.run
+            await asgi_app.engine.dispose()
+    response = asyncio.run(run())
+    return parse(response.status_code, response.content)
+
+
+def assert_same(client, asgi_app, method, path, headers=None, body=None):
+    expected = wsgi_response(client, method, path, headers or {}, body)
+    actual = asgi_response(asgi_app, method, path, headers or {}, body)
+    assert actual == expected
+    return actual
+
+
+def login_body(email, password):
+    return json.dumps({'email': email, 'password': password}).encode()
+
+
+def test_login_success(client, asgi_app, user):
+    status, _ = assert_same(client, asgi_app, 'POST', '/api/auth/login', JSON,
+                            login_body(user['email'], user['password']))
+    assert status == 200
+
+
+def test_login_bad_password(client, asgi_app, user):
+    status, _ = assert_same(client, asgi_app, 'POST', '/api/auth/login', JSON,
+                            login_body(user['email'], 'wrong-password'))
+    assert status == 401
+
+
+def test_login_non_json_body(client, asgi_app):
+    status, _ = assert_same(client, asgi_app, 'POST', '/api/auth/login', JSON, b'not json')
+    assert status == 400
+
+
+def test_login_missing_body(client, asgi_app):
+    status, _ = assert_same(client, asgi_app, 'POST', '/api/auth/login')
+    assert status == 415
+
+
+def test_deleted_user(app, client, asgi_app, user):
+    with app.app_context():
+        db.session.get(User, user['id']).soft_delete()
+
+    status, _ = assert_same(client, asgi_app, 'POST', '/api/auth/login', JSON,
+                            login_body(user['email'], user['password']))
+    assert status == 401
+    status, _ = assert_same(client, asgi_app, 'GET', '/api/auth/me',
+                            {'Authorization': f"Bearer {user['access_token']}"})
+    assert status == 401
+
+
+def test_refresh_without_body(client, asgi_app, user):
+    status, _ = assert_same(client, asgi_app, 'POST', '/api/auth/refresh',
+                            {'Authorization': f"Bearer {user['refresh_token']}"})
+    assert status == 415
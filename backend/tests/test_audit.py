@@ -0,0 +1,39 @@
+"""
+Параметры периода в API истории изменений
+"""
+import pytest
+from app.helpers.create_default_roles import create_default_roles
+from app.helpers.make_admin import make_user_admin
+
+
+@pytest.fixture
+def admin_headers(app, user):
+    with app.app_context():
+        create_default_roles()
+        success, message = make_user_admin(user['email'], user['email'].split('@')[0])
+        assert success, message
+    return {'Authorization': f"Bearer {user['access_token']}"}
+
+
+def test_mixed_aware_and_naive_period(client, user, admin_headers):
+    response = client.get('/api/audit/users', headers=admin_headers, query_string={
+        'user_id': user['id'], 'since': '2020-01-01T00:00:00Z', 'until': '2030-01-01T00:00:00',
+    })
+    assert response.status_code == 200, response.get_json()
+    assert [item['action'] for item in response.get_json()['items']][-1] == 'create'
+
+
+def test_aware_period_converted_to_utc(client, user, admin_headers):
+    # Полночь 1 января 2020 по UTC+03:00 — это 21:00 31 декабря по UTC
+    response = client.get('/api/audit/users', headers=admin_headers, query_string={
+        'user_id': user['id'], 'since': '2019-12-31T22:00:00', 'until': '2020-01-01T00:00:00+03:00',
+    })
+    assert response.status_code == 400
+
+
+def test_since_after_until(client, admin_headers):
+    response = client.get('/api/audit/users', headers=admin_headers, query_string={
+        'since': '2030-01-01T00:00:00Z', 'until': '2020-01-01T00:00:00',
+    })
+    assert response.status_code == 400
+    assert 'since' in response.get_json()['errors']
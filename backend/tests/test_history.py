@@ -0,0 +1,52 @@
+"""
+Автор изменений в истории: JWT запроса, сама учетная запись или никто
+"""
+import uuid
+from flask_jwt_extended import verify_jwt_in_request
+from sqlalchemy import select
+from app.extensions import db
+from app.models.auth import User, UserHistory
+
+
+def last_change(user_id):
+    query = select(UserHistory).filter_by(user_id=user_id).order_by(UserHistory.id.desc()).limit(1)
+    return db.session.scalars(query).one()
+
+
+def test_register_attributed_to_user(app, user):
+    with app.app_context():
+        change = last_change(user['id'])
+        assert change.action == 'create'
+        assert change.changed_by_id == user['id']
+
+
+def test_change_outside_request_has_no_author(app):
+    # Без фикстуры client: pytest-flask держит контекст последнего запроса клиента до конца теста
+    name = f'script-{uuid.uuid4().hex[:12]}'
+    with app.app_context():
+        script_user = User(email=f'{name}@example.test', username=name)
+        script_user.set_password('script-password')
+        db.session.add(script_user)
+        db.session.commit()
+        script_user.first_name = 'Script'
+        db.session.commit()
+
+        query = select(UserHistory).filter_by(user_id=script_user.id).order_by(UserHistory.id)
+        changes = db.session.scalars(query).all()
+        assert [change.action for change in changes] == ['create', 'update']
+        assert [change.changed_by_id for change in changes] == [None, None]
+
+
+def test_change_in_jwt_request_attributed_to_actor(app, client, user):
+    other = client.post('/api/auth/register', json={
+        'email': f"actor-{user['email']}", 'username': f"actor-{user['id']}", 'password': user['password'],
+    }).get_json()
+    headers = {'Authorization': f"Bearer {other['access_token']}"}
+
+    with app.test_request_context(headers=headers):
+        verify_jwt_in_request()
+        db.session.get(User, user['id']).first_name = 'Edited'
+        db.session.commit()
+        change = last_change(user['id'])
+        assert change.action == 'update'
+        assert change.changed_by_id == other['user']['id']
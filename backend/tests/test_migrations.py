@@ -0,0 +1,169 @@
+"""
+Миграции: пустая БД и БД, созданная db.create_all() версии до перехода на миграции
+(путь из README: 'flask db stamp 0001_initial', затем 'flask db upgrade')
+"""
+import os
+import sys
+import sqlite3
+import subprocess
+import pytest
+
+BACKEND_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Схема SQLite, которую создавал db.create_all() прежней версии: уникальные ограничения без имен
+BASELINE_SCHEMA = """
+CREATE TABLE role (
+	name VARCHAR(100) NOT NULL,
+	description VARCHAR(255),
+	id INTEGER NOT NULL,
+	created_at DATETIME NOT NULL,
+	updated_at DATETIME NOT NULL,
+	deleted BOOLEAN NOT NULL,
+	PRIMARY KEY (id),
+	UNIQUE (name)
+);
+CREATE TABLE user (
+	username VARCHAR(50),
+	email VARCHAR(120) NOT NULL,
+	password_hash VARCHAR(128),
+	first_name VARCHAR(64),
+	last_name VARCHAR(64),
+	patronymic VARCHAR(64),
+	is_active BOOLEAN,
+	last_login DATETIME,
+	id INTEGER NOT NULL,
+	created_at DATETIME NOT NULL,
+	updated_at DATETIME NOT NULL,
+	deleted BOOLEAN NOT NULL,
+	PRIMARY KEY (id),
+	UNIQUE (username),
+	UNIQUE (email)
+);
+CREATE TABLE role_history (
+	role_id INTEGER NOT NULL,
+	action VARCHAR(50) NOT NULL,
+	changed_by_id INTEGER NOT NULL,
+	timestamp DATETIME NOT NULL,
+	changes JSON,
+	id INTEGER NOT NULL,
+	created_at DATETIME NOT NULL,
+	updated_at DATETIME NOT NULL,
+	deleted BOOLEAN NOT NULL,
+	PRIMARY KEY (id),
+	FOREIGN KEY(role_id) REFERENCES role (id),
+	FOREIGN KEY(changed_by_id) REFERENCES user (id)
+);
+CREATE TABLE user_history (
+	user_id INTEGER NOT NULL,
+	action VARCHAR(50) NOT NULL,
+	changed_by_id INTEGER NOT NULL,
+	timestamp DATETIME NOT NULL,
+	changes JSON,
+	id INTEGER NOT NULL,
+	created_at DATETIME NOT NULL,
+	updated_at DATETIME NOT NULL,
+	deleted BOOLEAN NOT NULL,
+	PRIMARY KEY (id),
+	FOREIGN KEY(user_id) REFERENCES user (id),
+	FOREIGN KEY(changed_by_id) REFERENCES user (id)
+);
+CREATE TABLE user_role (
+	user_id INTEGER NOT NULL,
+	role_id INTEGER NOT NULL,
+	id INTEGER NOT NULL,
+	created_at DATETIME NOT NULL,
+	updated_at DATETIME NOT NULL,
+	deleted BOOLEAN NOT NULL,
+	PRIMARY KEY (id),
+	CONSTRAINT uq_user_role UNIQUE (user_id, role_id),
+	FOREIGN KEY(user_id) REFERENCES user (id),
+	FOREIGN KEY(role_id) REFERENCES role (id)
+);
+CREATE TABLE user_session (
+	user_id INTEGER NOT NULL,
+	refresh_token VARCHAR(255),
+	user_agent VARCHAR(255),
+	ip_address VARCHAR(45),
+	browser_family VARCHAR(50),
+	browser_version VARCHAR(50),
+	os_family VARCHAR(50),
+	os_version VARCHAR(50),
+	device_family VARCHAR(50),
+	device_brand VARCHAR(50),
+	device_model VARCHAR(50),
+	is_mobile BOOLEAN,
+	is_tablet BOOLEAN,
+	is_pc BOOLEAN,
+	is_bot BOOLEAN,
+	expires_at DATETIME NOT NULL,
+	is_active BOOLEAN,
+	id INTEGER NOT NULL,
+	created_at DATETIME NOT NULL,
+	updated_at DATETIME NOT NULL,
+	deleted BOOLEAN NOT NULL,
+	PRIMARY KEY (id),
+	FOREIGN KEY(user_id) REFERENCES user (id),
+	UNIQUE (refresh_token)
+);
+"""
+
+
+def flask_db(database_path, *args):
+    """Команда 'flask db ...' в отдельном процессе (конфигурация читает окружение при импорте)"""
+    env = dict(os.environ)
+    env.update({
+        'DEV_DATABASE_URL': f'sqlite:///{database_path}',
+        'DB_CREATE_ALL': 'False',
+        'LOG_FILE': '',
+        'LOG_LEVEL': 'WARNING',
+    })
+    result = subprocess.run(
+        [sys.executable, '-m', 'flask', '--app', "app:create_app('development')", 'db', *args],
+        cwd=BACKEND_PATH, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-3000:]
+
+
+def schema_objects(database_path):
+    with sqlite3.connect(database_path) as connection:
+        rows = connection.execute("SELECT type, name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'").fetchall()
+    return {name for kind, name in rows if kind == 'table'}, {name for kind, name in rows if kind == 'index'}
+
+
+def expected_tables():
+    from app.models.auth import User
+    return set(User.metadata.tables) | {'alembic_version'}
+
+
+@pytest.fixture
+def database_path(tmp_path):
+    return str(tmp_path / 'migrations.db')
+
+
+def test_upgrade_empty_database(database_path):
+    flask_db(database_path, 'upgrade')
+    tables, indexes = schema_objects(database_path)
+    assert tables == expected_tables()
+    assert {'uq_user_email_live', 'uq_user_username_live'} <= indexes
+
+
+def test_upgrade_create_all_database(database_path):
+    with sqlite3.connect(database_path) as connection:
+        connection.executescript(BASELINE_SCHEMA)
+        connection.execute(
+            "INSERT INTO user (email, username, is_active, created_at, updated_at, deleted) "
+            "VALUES ('old@example.test', 'old', 1, '2025-01-01', '2025-01-01', 0)"
+        )
+
+    flask_db(database_path, 'stamp', '0001_initial')
+    flask_db(database_path, 'upgrade')
+
+    tables, indexes = schema_objects(database_path)
+    # Таблицы, которых не было в create_all(), создаются ревизиями после 0001_initial
+    assert tables == expected_tables()
+    assert {'uq_user_email_live', 'uq_user_username_live'} <= indexes
+    with sqlite3.connect(database_path) as connection:
+        assert connection.execute("SELECT email FROM user").fetchall() == [('old@example.test',)]
+        # Безымянные UNIQUE(email), UNIQUE(username) заменены частичными индексами
+        user_sql = connection.execute("SELECT sql FROM sqlite_master WHERE name = 'user'").fetchone()[0]
+    assert 'UNIQUE' not in user_sql
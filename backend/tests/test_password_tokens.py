@@ -0,0 +1,89 @@
+"""
+Одноразовые токены установки/сброса пароля: подпись, срок действия, действие и повторное использование
+"""
+import base64
+import time
+import pytest
+from app.extensions import db
+from app.models.auth import UsedPasswordToken
+from app.utils import password_tokens
+from app.utils.email import decode_token, encode_token
+
+NEW_PASSWORD = 'new-password'
+
+
+@pytest.fixture
+def make_token(app):
+    def make(user_id, action, **kwargs):
+        with app.app_context():
+            return encode_token(user_id, action, **kwargs)
+    return make
+
+
+def password_payload(token):
+    return {'token': token, 'password': NEW_PASSWORD, 'confirm_password': NEW_PASSWORD}
+
+
+def test_set_password_token_single_use(client, user, make_token):
+    token = make_token(user['id'], 'set_password')
+    assert client.get('/api/auth/set-password', query_string={'token': token}).status_code == 200
+
+    assert client.post('/api/auth/set-password', json=password_payload(token)).status_code == 200
+    assert client.post('/api/auth/set-password', json=password_payload(token)).status_code == 400
+    assert client.get('/api/auth/set-password', query_string={'token': token}).status_code == 400
+
+    response = client.post('/api/auth/login', json={'email': user['email'], 'password': NEW_PASSWORD})
+    assert response.status_code == 200
+
+
+def test_reset_password_token_single_use(client, user, make_token):
+    token = make_token(user['id'], 'reset_password')
+    assert client.put('/api/auth/reset-password', json=password_payload(token)).status_code == 200
+    assert client.put('/api/auth/reset-password', json=password_payload(token)).status_code == 400
+    assert client.get('/api/auth/reset-password', query_string={'token': token}).status_code == 400
+
+
+def test_token_rejected_by_other_action(client, user, make_token):
+    set_token = make_token(user['id'], 'set_password')
+    reset_token = make_token(user['id'], 'reset_password')
+
+    assert client.get('/api/auth/reset-password', query_string={'token': set_token}).status_code == 400
+    assert client.put('/api/auth/reset-password', json=password_payload(set_token)).status_code == 400
+    assert client.get('/api/auth/set-password', query_string={'token': reset_token}).status_code == 400
+    assert client.post('/api/auth/set-password', json=password_payload(reset_token)).status_code == 400
+
+    # Отклоненный токен не погашен и действует на своем эндпоинте
+    assert client.post('/api/auth/set-password', json=password_payload(set_token)).status_code == 200
+
+
+def test_tampered_signature(client, user, make_token):
+    raw = bytearray(base64.urlsafe_b64decode(make_token(user['id'], 'set_password') + '=='))
+    raw[-1] ^= 0x01
+    token = base64.urlsafe_b64encode(bytes(raw)).rstrip(b'=').decode('ascii')
+    assert client.get('/api/auth/set-password', query_string={'token': token}).status_code == 400
+    assert client.post('/api/auth/set-password', json=password_payload(token)).status_code == 400
+
+
+def test_expired_token(app, client, user, make_token):
+    issued_at = int(time.time()) - app.config['TOKEN_LIFETIME'] - 60
+    token = make_token(user['id'], 'reset_password', issued_at=issued_at)
+    assert client.get('/api/auth/reset-password', query_string={'token': token}).status_code == 400
+    assert client.put('/api/auth/reset-password', json=password_payload(token)).status_code == 400
+
+
+def test_consume_token_integrity_error(app, user, make_token, monkeypatch):
+    token = make_token(user['id'], 'set_password')
+    with app.app_context():
+        token_data = decode_token(token)
+        # Токен погашен другим процессом: записи нет в кэше этого процесса, есть только в БД
+        db.session.add(UsedPasswordToken(
+            nonce=token_data['nonce'], user_id=user['id'],
+            expires_at=password_tokens.datetime.utcfromtimestamp(token_data['expires_at']),
+        ))
+        db.session.commit()
+        monkeypatch.setattr(password_tokens, '_used_nonces', password_tokens.OrderedDict())
+
+        assert password_tokens.consume_token(token_data) is False
+        # Транзакция откачена, nonce запомнен процессом
+        assert db.session.query(UsedPasswordToken).filter_by(nonce=token_data['nonce']).count() == 1
+        assert password_tokens.is_token_used(token_data)
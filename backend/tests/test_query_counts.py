@@ -0,0 +1,38 @@
+"""
+Количество SQL-запросов горячих эндпоинтов авторизации. Рост числа запросов
+(например, N+1 при сериализации) роняет тест - пороги повышаются только осознанно.
+"""
+from app.utils.query_counter import assert_max_queries, statement_shape
+
+
+def test_me_queries(client, auth_headers):
+    with assert_max_queries(2, repeat_threshold=2):
+        response = client.get('/api/auth/me', headers=auth_headers)
+    assert response.status_code == 200
+
+
+def test_sessions_queries(client, user, auth_headers):
+    # Несколько сессий не должны давать запрос на каждую
+    for _ in range(3):
+        client.post('/api/auth/login', json={'email': user['email'], 'password': user['password']})
+    with assert_max_queries(3, repeat_threshold=2):
+        response = client.get('/api/auth/sessions', headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.get_json()['sessions']) == 4
+
+
+def test_login_queries(client, user):
+    with assert_max_queries(9, repeat_threshold=3):
+        response = client.post('/api/auth/login', json={'email': user['email'], 'password': user['password']})
+    assert response.status_code == 200
+
+
+def test_query_count_headers(client, auth_headers):
+    response = client.get('/api/auth/me', headers=auth_headers)
+    assert response.headers['X-DB-Query-Count'] == '2'
+    assert response.headers['X-DB-Query-Time'].endswith('ms')
+
+
+def test_statement_shape_collapses_in_lists():
+    assert statement_shape('SELECT * FROM user WHERE id IN (?, ?)') == \
+        statement_shape('SELECT *\n FROM user WHERE id IN (?, ?, ?, ?)')
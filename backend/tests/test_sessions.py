@@ -0,0 +1,53 @@
+"""
+Список активных сессий: keyset-пагинация, выбор полей и курсор
+"""
+import pytest
+
+
+@pytest.fixture
+def sessions(client, user):
+    """ID всех активных сессий пользователя: регистрация и четыре входа"""
+    for _ in range(4):
+        response = client.post('/api/auth/login', json={'email': user['email'], 'password': user['password']})
+        assert response.status_code == 200
+    return [session['id'] for session in list_sessions(client, user, limit=200)['sessions']]
+
+
+def list_sessions(client, user, **params):
+    response = client.get('/api/auth/sessions', query_string=params,
+                          headers={'Authorization': f"Bearer {user['access_token']}"})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_sessions_paging(client, user, sessions):
+    assert len(sessions) == 5
+
+    collected, pages, cursor = [], 0, None
+    while True:
+        params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+        body = list_sessions(client, user, **params)
+        collected.extend(session['id'] for session in body['sessions'])
+        pages += 1
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+
+    assert pages == 3
+    assert collected == sessions
+    assert len(set(collected)) == len(collected)
+
+
+def test_sessions_fields(client, user, auth_headers):
+    body = list_sessions(client, user, fields='id,ip_address')
+    assert all(set(session) == {'id', 'ip_address'} for session in body['sessions'])
+
+    response = client.get('/api/auth/sessions', query_string={'fields': 'refresh_token'}, headers=auth_headers)
+    assert response.status_code == 400
+    assert 'fields' in response.get_json()['errors']
+
+
+@pytest.mark.parametrize('cursor', ['garbage', 'eyJ4IjoxfQ'])
+def test_sessions_bad_cursor(client, auth_headers, cursor):
+    response = client.get('/api/auth/sessions', query_string={'cursor': cursor}, headers=auth_headers)
+    assert response.status_code == 400
@@ -0,0 +1,45 @@
+"""
+Мягкое удаление пользователя: вход, доступ по токену и повторная регистрация
+"""
+import pytest
+from sqlalchemy import select
+from app.extensions import db
+from app.models.auth import User
+
+
+@pytest.fixture
+def deleted_user(app, user):
+    with app.app_context():
+        db.session.get(User, user['id']).soft_delete()
+    return user
+
+
+def test_deleted_user_cannot_login(client, deleted_user):
+    response = client.post('/api/auth/login', json={
+        'email': deleted_user['email'], 'password': deleted_user['password'],
+    })
+    assert response.status_code == 401
+
+
+def test_deleted_user_token_rejected(client, deleted_user):
+    headers = {'Authorization': f"Bearer {deleted_user['access_token']}"}
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
+
+
+def test_deleted_email_can_register_again(app, client, deleted_user):
+    response = client.post('/api/auth/register', json={
+        'email': deleted_user['email'],
+        'username': deleted_user['email'].split('@')[0],
+        'password': deleted_user['password'],
+    })
+    assert response.status_code == 201, response.get_json()
+    assert response.get_json()['user']['id'] != deleted_user['id']
+
+    with app.app_context():
+        visible = db.session.scalars(select(User).filter_by(email=deleted_user['email'])).all()
+        assert [u.id for u in visible] == [response.get_json()['user']['id']]
+
+        query = select(User).filter_by(email=deleted_user['email']).execution_options(include_deleted=True)
+        rows = db.session.scalars(query).all()
+        assert {u.id for u in rows} == {deleted_user['id'], response.get_json()['user']['id']}
+        assert db.session.get(User, deleted_user['id'], execution_options={'include_deleted': True}).deleted